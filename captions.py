@@ -49,8 +49,44 @@ def caption_recording_started(title, channel, duration_sec, start_time_str):
         f"⏳ Initializing stream..."
     )
 
-def caption_recording_progress(title, channel, total_duration, start_time_str, elapsed_sec, remaining_sec, error_msg=None):
+def caption_recording_queued(title, channel, duration_sec, position, queue_length):
+    duration_display = "∞ Unlimited" if duration_sec == 0 else seconds_to_hms(duration_sec)
+    return (
+        f"⏸ **QUEUED** • `#{position}` of `{queue_length}`\n"
+        f"━━━━━━━━━━━━━━━━━━━\n\n"
+        f"📌 `{title}`\n"
+        f"📡 `{channel}`\n"
+        f"⏱ `{duration_display}`\n\n"
+        f"⏳ Waiting for a free recording slot..."
+    )
+
+def short_size(size):
+    """Sync compact size like '1.2 GB' for live captions"""
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} PB"
+
+def _telemetry_lines(stats, error_msg):
+    """Size/speed line and status line from ffmpeg -progress stats"""
+    if not stats:
+        return "", f"❌ {error_msg}" if error_msg else "🟢 Recording..."
+    line = f"💾 `{short_size(stats.get('total_size', 0))}` │ 🚀 `{stats.get('speed', 0):.2f}x`"
+    if stats.get('drop_frames'):
+        line += f" │ ⚠️ `{stats['drop_frames']}` dropped"
+    line += "\n"
+    if error_msg:
+        status = f"❌ {error_msg}"
+    elif stats.get('stalled'):
+        status = f"⚠️ Stalled — no data for {smart_duration(stats.get('stalled_for', 0))}"
+    else:
+        status = "🟢 Recording..."
+    return line, status
+
+def caption_recording_progress(title, channel, total_duration, start_time_str, elapsed_sec, remaining_sec, error_msg=None, stats=None):
     elapsed_hms = seconds_to_hms(elapsed_sec)
+    telemetry_line, status = _telemetry_lines(stats, error_msg)
     
     if total_duration == 0:
         # Unlimited recording
@@ -61,8 +97,9 @@ def caption_recording_progress(title, channel, total_duration, start_time_str, e
             f"📡 `{channel}`\n"
             f"⏱ `∞ Unlimited`\n"
             f"🕐 `{start_time_str}`\n\n"
-            f"▶️ Elapsed: **{smart_duration(elapsed_sec)}**\n\n"
-            f"{'❌ ' + error_msg if error_msg else '🟢 Recording...'}"
+            f"▶️ Elapsed: **{smart_duration(elapsed_sec)}**\n"
+            f"{telemetry_line}\n"
+            f"{status}"
         )
     
     progress = min(elapsed_sec / total_duration, 1)
@@ -71,8 +108,6 @@ def caption_recording_progress(title, channel, total_duration, start_time_str, e
     remaining_hms = seconds_to_hms(remaining_sec)
     total_hms = seconds_to_hms(total_duration)
     
-    status = f"❌ {error_msg}" if error_msg else "🟢 Recording..."
-    
     return (
         f"🔴 **RECORDING** • `{pct}%`\n"
         f"━━━━━━━━━━━━━━━━━━━\n\n"
@@ -81,7 +116,8 @@ def caption_recording_progress(title, channel, total_duration, start_time_str, e
         f"⏱ `{total_hms}`\n"
         f"🕐 `{start_time_str}`\n\n"
         f"{bar} **{pct}%**\n"
-        f"▶️ `{elapsed_hms}` │ ⏳ `{remaining_hms}` left\n\n"
+        f"▶️ `{elapsed_hms}` │ ⏳ `{remaining_hms}` left\n"
+        f"{telemetry_line}\n"
         f"{status}"
     )
 
@@ -100,6 +136,40 @@ def caption_recording_completed(title, channel, duration_sec, start_time_str):
     )
 
 
+# ━━━ Dashboard Lines ━━━
+
+def dashboard_recording_line(title, channel, total_duration, elapsed_sec, stats=None):
+    """Compact recording status for the per-chat live dashboard"""
+    if total_duration == 0:
+        head = f"🔴 `{title}` • `{channel}`\n   ▶️ `{seconds_to_hms(elapsed_sec)}` / `∞`"
+    else:
+        progress = min(elapsed_sec / total_duration, 1)
+        head = (
+            f"🔴 `{title}` • `{channel}`\n"
+            f"   {create_mini_bar(progress)} `{int(progress * 100)}%` • "
+            f"`{seconds_to_hms(elapsed_sec)}` / `{seconds_to_hms(total_duration)}`"
+        )
+    if not stats:
+        return head
+    line = f"{head}\n   💾 `{short_size(stats.get('total_size', 0))}` • 🚀 `{stats.get('speed', 0):.2f}x`"
+    if stats.get('stalled'):
+        line += f" • ⚠️ stalled `{smart_duration(stats.get('stalled_for', 0))}`"
+    return line
+
+def dashboard_upload_line(file_name, uploaded_size, total_size, speed_mbps):
+    """Compact upload status for the per-chat live dashboard"""
+    progress = uploaded_size / total_size if total_size else 0
+    return (
+        f"📤 `{file_name[:48]}`\n"
+        f"   {create_mini_bar(progress)} `{int(progress * 100)}%` • "
+        f"`{short_size(uploaded_size)}` / `{short_size(total_size)}` • 🚀 `{speed_mbps:.2f} MB/s`"
+    )
+
+def dashboard_upload_queued_line(file_name, position, queue_length):
+    """Compact queued-upload status for the per-chat live dashboard"""
+    return f"📤 `{file_name[:48]}`\n   ⏸ Upload queued • `#{position}` of `{queue_length}`"
+
+
 # ━━━ Upload Captions ━━━
 
 async def caption_uploading(title, uploaded_size, total_size, speed_bps):
@@ -9,6 +9,7 @@ import asyncio
 import aiohttp
 from telethon import events
 from config import BOT_TOKEN
+from utils.telegram_gateway import telegram_gateway
 
 # --- Configuration ---
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
@@ -171,4 +172,4 @@ async def handle_chat_message(event: events.NewMessage):
     async with event.client.action(event.chat_id, 'typing'):
         reply = await get_groq_response(user_id, user_message)
 
-    await event.reply(reply, parse_mode="Markdown", link_preview=False)
+    await telegram_gateway.reply(event, reply, parse_mode="Markdown", link_preview=False)
@@ -0,0 +1,246 @@
+import time
+import socket
+import asyncio
+from typing import Dict, List, Optional
+from pymongo import ReturnDocument
+from telethon.sync import TelegramClient
+from utils.database import get_database
+from utils.job_journal import job_journal
+from config import CLUSTER_ROLE, NODE_ID, CLUSTER_LEASE_SECONDS, CLUSTER_POLL_SECONDS, MAX_CONCURRENT_RECORDINGS
+from config import SCHEDULE_LEAD_SECONDS
+
+# Don't start a reclaimed recording with less than this left of its window
+MIN_RESUME_SECONDS = 30
+DEFAULT_NODE_CAPACITY = 6  # Recordings per node when MAX_CONCURRENT_RECORDINGS is 0
+
+
+def job_key(chat_id: int, message_id: int) -> str:
+    """Cluster-wide job id; message ids are only unique per chat."""
+    return f"{chat_id}:{message_id}"
+
+
+class ClusterStore:
+    """
+    Shared MongoDB job queue for multi-node recording.
+
+    The front-end inserts jobs into `recording_jobs`; recorder nodes claim
+    them with a lease (`lease_owner` + `lease_expires`) that they renew on
+    every heartbeat. A job whose lease expires (node crashed or lost its
+    network) is claimable again by any node. Nodes write progress and the
+    final state back to the job document and announce themselves in
+    `recording_nodes` for /status.
+    """
+
+    def __init__(self, node_id: str, lease_seconds: int = 30):
+        self.node_id = node_id
+        self.lease_seconds = lease_seconds
+
+    def _collection(self, name: str):
+        db = get_database()
+        if db is None:
+            raise RuntimeError("Cluster mode needs MongoDB (MONGO_URI)")
+        return db[name]
+
+    async def ensure_indexes(self):
+        jobs = self._collection("recording_jobs")
+        await jobs.create_index([("state", 1), ("start_at", 1)])
+        await jobs.create_index("lease_owner")
+
+    async def enqueue(self, key: str, url: str, duration_sec: int, channel: str, title: str,
+                      chat_id: int, message_id: int, user_id: int, start_at: float,
+                      split_duration_sec: Optional[int] = None, priority: int = 1):
+        now = time.time()
+        await self._collection("recording_jobs").update_one({"_id": key}, {"$set": {
+            "url": url, "duration_sec": duration_sec, "channel": channel, "title": title,
+            "chat_id": chat_id, "message_id": message_id, "user_id": user_id,
+            "split_duration_sec": split_duration_sec, "priority": priority,
+            "start_at": start_at, "started_at": None,
+            "state": "pending", "lease_owner": None, "lease_expires": 0, "attempts": 0,
+            "cancel_requested": False, "progress": None, "error": None,
+            "created_at": now, "updated_at": now,
+        }}, upsert=True)
+
+    async def request_cancel(self, key: str):
+        """Flags a job as cancelled; the node running it stops it on its next heartbeat."""
+        await self._collection("recording_jobs").update_one(
+            {"_id": key, "state": {"$in": ["pending", "claimed"]}},
+            {"$set": {"cancel_requested": True, "updated_at": time.time()}}
+        )
+        # Nobody is running it yet, so it can be closed right away
+        await self._collection("recording_jobs").update_one(
+            {"_id": key, "state": "pending", "lease_owner": None},
+            {"$set": {"state": "cancelled"}}
+        )
+
+    async def claim(self, lead: float = 0) -> Optional[Dict[str, any]]:
+        """Takes the next job due within `lead` seconds that nobody holds a live lease on."""
+        now = time.time()
+        return await self._collection("recording_jobs").find_one_and_update(
+            {
+                "state": {"$in": ["pending", "claimed"]},
+                "cancel_requested": False,
+                "start_at": {"$lte": now + lead},
+                "lease_expires": {"$lt": now},
+            },
+            {
+                "$set": {"state": "claimed", "lease_owner": self.node_id,
+                         "lease_expires": now + self.lease_seconds, "updated_at": now},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("priority", 1), ("start_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def renew(self, key: str, progress: Optional[Dict[str, any]] = None) -> Optional[Dict[str, any]]:
+        """Extends this node's lease on a job; None if the lease was lost to another node."""
+        now = time.time()
+        update = {"lease_expires": now + self.lease_seconds, "updated_at": now}
+        if progress is not None:
+            update["progress"] = progress
+        return await self._collection("recording_jobs").find_one_and_update(
+            {"_id": key, "lease_owner": self.node_id, "state": "claimed"},
+            {"$set": update},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def mark_started(self, key: str, started_at: float):
+        """Remembers when the capture really began, so a reclaim only records what's left."""
+        await self._collection("recording_jobs").update_one(
+            {"_id": key, "started_at": None}, {"$set": {"started_at": started_at}}
+        )
+
+    async def finish(self, key: str, state: str, error: Optional[str] = None):
+        await self._collection("recording_jobs").update_one(
+            {"_id": key, "lease_owner": self.node_id},
+            {"$set": {"state": state, "error": error, "lease_expires": 0, "updated_at": time.time()}}
+        )
+
+    async def heartbeat_node(self, running: int, capacity: int):
+        await self._collection("recording_nodes").update_one({"_id": self.node_id}, {"$set": {
+            "host": socket.gethostname(), "running": running, "capacity": capacity, "last_seen": time.time(),
+        }}, upsert=True)
+
+    async def nodes(self) -> List[Dict[str, any]]:
+        """Nodes seen within the last few leases."""
+        cursor = self._collection("recording_nodes").find({"last_seen": {"$gt": time.time() - 3 * self.lease_seconds}})
+        return await cursor.to_list(length=100)
+
+    async def states(self, keys: List[str]) -> Dict[str, str]:
+        cursor = self._collection("recording_jobs").find({"_id": {"$in": keys}}, {"state": 1})
+        return {doc["_id"]: doc["state"] for doc in await cursor.to_list(length=len(keys) or 1)}
+
+    async def counts(self) -> Dict[str, int]:
+        """Jobs per state among unfinished ones, for /status."""
+        pipeline = [{"$match": {"state": {"$in": ["pending", "claimed"]}}},
+                    {"$group": {"_id": "$state", "count": {"$sum": 1}}}]
+        cursor = self._collection("recording_jobs").aggregate(pipeline)
+        return {doc["_id"]: doc["count"] for doc in await cursor.to_list(length=10)}
+
+
+cluster_store = ClusterStore(NODE_ID, CLUSTER_LEASE_SECONDS)
+
+
+async def run_node(telethon_client: TelegramClient):
+    """
+    Recorder node loop: claim due jobs up to local capacity, run them with the
+    normal recording pipeline, renew leases with progress, and stop jobs that
+    were cancelled or whose lease was taken over.
+    """
+    from scheduler import start_recording_instantly, cancel_scheduled_recording, scheduled_jobs
+
+    running: Dict[str, Dict[str, any]] = {}
+    # A node needs a bound to leave work for the others, even when local admission is unlimited
+    capacity = MAX_CONCURRENT_RECORDINGS or DEFAULT_NODE_CAPACITY
+    await cluster_store.ensure_indexes()
+    print(f"[Cluster] [INFO] Node {NODE_ID} ready for up to {capacity} recording(s)")
+
+    while True:
+        try:
+            # Finished jobs: report the recorder's final state from the local journal
+            for key, entry in list(running.items()):
+                if entry['task'].done():
+                    journal_entry = job_journal.get(entry['chat_id'], entry['message_id'])
+                    state = journal_entry['state'] if journal_entry else 'failed'
+                    if state not in ('done', 'failed', 'cancelled'):
+                        state = 'failed'
+                    await cluster_store.finish(key, state, journal_entry.get('error') if journal_entry else None)
+                    del running[key]
+
+            # Heartbeat: renew leases with progress; drop jobs we no longer own
+            for key, entry in list(running.items()):
+                if not entry['started']:
+                    # The recorder journals the capture's start once it's past start_at and admission
+                    journal_entry = job_journal.get(entry['chat_id'], entry['message_id'])
+                    if journal_entry and journal_entry['started_at']:
+                        await cluster_store.mark_started(key, journal_entry['started_at'])
+                        entry['started'] = True
+                local = scheduled_jobs.get(entry['message_id'], {})
+                process = local.get('process')
+                progress = process.telemetry.snapshot() if process else None
+                doc = await cluster_store.renew(key, progress)
+                if doc is None or doc.get('cancel_requested'):
+                    reason = "cancelled" if doc else "lease lost"
+                    print(f"[Cluster] [INFO] Stopping {key}: {reason}")
+                    cancel_scheduled_recording(entry['message_id'])
+                    if doc:
+                        await cluster_store.finish(key, 'cancelled')
+                    del running[key]
+            await cluster_store.heartbeat_node(len(running), capacity)
+
+            # Claim new work while there is room
+            while len(running) < capacity:
+                job = await cluster_store.claim(lead=SCHEDULE_LEAD_SECONDS)
+                if job is None:
+                    break
+                key = job['_id']
+                # Capture starts a little ahead of start_at (pre-roll); the window doesn't
+                began = max(job.get('started_at') or 0, job['start_at'])
+                # Claimed ahead of its start: warm up now, capture from start_at
+                start_at = job['start_at'] if job['start_at'] > time.time() else None
+                remaining = 0
+                if job['duration_sec']:
+                    remaining = min(int(began + job['duration_sec'] - time.time()), job['duration_sec'])
+                    if remaining < MIN_RESUME_SECONDS:
+                        await cluster_store.finish(key, 'failed', 'Recording window passed before a node could run it')
+                        continue
+                if job['attempts'] > 1:
+                    print(f"[Cluster] [INFO] Reclaimed {key} (attempt {job['attempts']}), {remaining or 'unlimited'}s left")
+                task = await start_recording_instantly(
+                    telethon_client, job['url'], str(remaining), job['channel'], job['title'],
+                    job['chat_id'], job['message_id'], job['user_id'], job.get('split_duration_sec'),
+                    start_at=start_at
+                )
+                running[key] = {'task': task, 'chat_id': job['chat_id'], 'message_id': job['message_id'],
+                                'started': bool(job.get('started_at'))}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[Cluster] [ERROR] Node loop error: {e}")
+
+        await asyncio.sleep(CLUSTER_POLL_SECONDS)
+
+
+async def watch_frontend_jobs():
+    """Front-end: forget placeholder entries of cluster jobs once a node has finished them."""
+    from scheduler import scheduled_jobs
+
+    while True:
+        await asyncio.sleep(30)
+        try:
+            keys = {job['cluster']: message_id for message_id, job in scheduled_jobs.items() if job.get('cluster')}
+            if not keys:
+                continue
+            states = await cluster_store.states(list(keys))
+            for key, message_id in keys.items():
+                if states.get(key, 'done') in ('done', 'failed', 'cancelled'):
+                    scheduled_jobs.pop(message_id, None)
+        except Exception as e:
+            print(f"[Cluster] [WARNING] Could not refresh cluster job states: {e}")
+
+
+def is_frontend() -> bool:
+    return CLUSTER_ROLE == "frontend"
+
+
+def is_node() -> bool:
+    return CLUSTER_ROLE == "node"
@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 # Load environment variables with priority: .env.local > .env.production > .env
@@ -63,6 +64,110 @@ except ValueError:
 # --- Recording and Uploading ---
 RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", "recordings")
 MAX_PART_SIZE = 2 * 1024 * 1024 * 1024  # 2 GB
+# Upload each --split segment as soon as ffmpeg closes it instead of after the whole recording
+PIPELINE_UPLOADS = os.getenv("PIPELINE_UPLOADS", "true").lower() in ("1", "true", "yes")
+# Opt-in: upload single-file recordings while they're being written. Recordings are then
+# delivered as .ts (the FFmpeg engine writes MPEG-TS instead of MKV)
+TAIL_UPLOADS = os.getenv("TAIL_UPLOADS", "false").lower() in ("1", "true", "yes")
+# Split recordings roll to a new segment at the first keyframe past this size; `--split auto` splits by size alone
+SPLIT_AUTO_MB = int(os.getenv("SPLIT_AUTO_MB", 1900))
+SPLIT_AUTO = -1  # split_duration_sec value stored for `--split auto`
+# Parts whose thumbnail/ffprobe run at once (across recordings) while earlier parts upload
+POSTPROCESS_WORKERS = int(os.getenv("POSTPROCESS_WORKERS", 2))
+# Seconds without new media time from ffmpeg's -progress feed before a capture is flagged as stalled
+STALL_TIMEOUT_SECONDS = int(os.getenv("STALL_TIMEOUT_SECONDS", 20))
+# One pinned message per chat with the progress of all its jobs, instead of editing every job's message
+LIVE_DASHBOARD = os.getenv("LIVE_DASHBOARD", "true").lower() in ("1", "true", "yes")
+DASHBOARD_INTERVAL = float(os.getenv("DASHBOARD_INTERVAL", 5))  # Seconds between renders of a chat's dashboard
+DASHBOARD_MAX_INTERVAL = float(os.getenv("DASHBOARD_MAX_INTERVAL", 60))  # Slowest cadence after FloodWaits
+DASHBOARD_PIN = os.getenv("DASHBOARD_PIN", "true").lower() in ("1", "true", "yes")
+# Outgoing Telegram calls: token buckets per client and per chat (calls/second and burst size)
+GATEWAY_GLOBAL_RATE = float(os.getenv("GATEWAY_GLOBAL_RATE", 25))
+GATEWAY_GLOBAL_BURST = float(os.getenv("GATEWAY_GLOBAL_BURST", 30))
+GATEWAY_CHAT_RATE = float(os.getenv("GATEWAY_CHAT_RATE", 1))
+GATEWAY_CHAT_BURST = float(os.getenv("GATEWAY_CHAT_BURST", 3))
+GATEWAY_MAX_FLOOD_WAIT = int(os.getenv("GATEWAY_MAX_FLOOD_WAIT", 300))  # Longer FloodWaits fail the call instead of retrying
+
+# --- Capture Engine ---
+# "ffmpeg" spawns one ffmpeg per job; "native" fetches HLS segments in-process (falls back to ffmpeg when unsupported)
+RECORDER_ENGINE = os.getenv("RECORDER_ENGINE", "ffmpeg").lower()
+HLS_PREFETCH = int(os.getenv("HLS_PREFETCH", 4))  # Segments downloaded concurrently per capture
+HLS_SEGMENT_RETRIES = int(os.getenv("HLS_SEGMENT_RETRIES", 3))
+# Native captures write a keyframe/byte-offset sidecar (<file>.kfi) for instant lossless clipping
+KEYFRAME_INDEX = os.getenv("KEYFRAME_INDEX", "true").lower() in ("1", "true", "yes")
+# Pull each HLS channel once and fan it out to every concurrent recording of it
+SHARED_INGEST = os.getenv("SHARED_INGEST", "true").lower() in ("1", "true", "yes")
+# Resolved stream redirects are reused for this long, and never closer than the margin to their token expiry
+RESOLVE_CACHE_TTL = float(os.getenv("RESOLVE_CACHE_TTL", 300))
+RESOLVE_EXPIRY_MARGIN = float(os.getenv("RESOLVE_EXPIRY_MARGIN", 60))
+# Background health checks of every playlist channel; /rec picks the healthiest mirror of a channel
+CHANNEL_PROBER = os.getenv("CHANNEL_PROBER", "true").lower() in ("1", "true", "yes")
+PROBE_INTERVAL = float(os.getenv("PROBE_INTERVAL", 1800))  # Seconds between sweeps
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", 8))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", 10))
+# Reconnect a capture that drops before its end time instead of discarding it
+CAPTURE_MAX_RESTARTS = int(os.getenv("CAPTURE_MAX_RESTARTS", 10))
+CAPTURE_RESTART_DELAY = float(os.getenv("CAPTURE_RESTART_DELAY", 5))  # Seconds, doubled on each retry
+# Run captures in this many worker processes instead of the bot's event loop (0 = in-process)
+RECORDING_WORKERS = int(os.getenv("RECORDING_WORKERS", 0))
+WORKER_SOCKET_DIR = os.getenv("WORKER_SOCKET_DIR", os.path.join(BASE_DIR, "run"))
+# Keep the last TIMESHIFT_MINUTES of these channels (comma-separated names/ids) on disk for /clip
+raw_timeshift_channels = os.getenv("TIMESHIFT_CHANNELS", "")
+TIMESHIFT_CHANNELS = [name.strip() for name in raw_timeshift_channels.split(',') if name.strip()]
+TIMESHIFT_MINUTES = float(os.getenv("TIMESHIFT_MINUTES", 30))
+TIMESHIFT_DIR = os.getenv("TIMESHIFT_DIR", "timeshift")
+
+# --- Uploads ---
+# Big files are uploaded over several connections; the count adapts to measured throughput within the bounds
+UPLOAD_CONNECTIONS = int(os.getenv("UPLOAD_CONNECTIONS", 4))
+UPLOAD_MIN_CONNECTIONS = int(os.getenv("UPLOAD_MIN_CONNECTIONS", 1))
+UPLOAD_MAX_CONNECTIONS = int(os.getenv("UPLOAD_MAX_CONNECTIONS", 8))
+UPLOAD_PART_RETRIES = int(os.getenv("UPLOAD_PART_RETRIES", 5))
+# Acknowledged parts of big uploads are kept in JOB_JOURNAL_PATH for this long, so retries and restarts resume (0 = off)
+UPLOAD_RESUME_HOURS = float(os.getenv("UPLOAD_RESUME_HOURS", 24))
+# Upload pool: extra user sessions (comma-separated session strings) upload alongside SESSION_STRING,
+# each taking UPLOAD_SLOTS_PER_SESSION files at once; queued files are fair-shared between users
+raw_upload_sessions = os.getenv("UPLOAD_SESSION_STRINGS", "")
+UPLOAD_SESSION_STRINGS = [session.strip() for session in raw_upload_sessions.split(',') if session.strip()]
+UPLOAD_SLOTS_PER_SESSION = int(os.getenv("UPLOAD_SLOTS_PER_SESSION", 1))
+
+# --- Scheduling ---
+# Scheduled jobs wake this early to resolve and check the stream, then start capturing
+# SCHEDULE_PREROLL_SECONDS before the target; the pre-roll is trimmed at the keyframe before the start
+SCHEDULE_LEAD_SECONDS = float(os.getenv("SCHEDULE_LEAD_SECONDS", 30))
+SCHEDULE_PREROLL_SECONDS = float(os.getenv("SCHEDULE_PREROLL_SECONDS", 5))
+
+# --- Admission Control ---
+# Jobs beyond these limits wait in the queue instead of degrading running captures (0 = no limit)
+MAX_CONCURRENT_RECORDINGS = int(os.getenv("MAX_CONCURRENT_RECORDINGS", 0))
+MAX_INGEST_MBPS = float(os.getenv("MAX_INGEST_MBPS", 0))
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", 0))  # The upload pool already queues per free session
+# Assumed bitrate of a channel until its capture reports the real one
+ESTIMATED_STREAM_MBPS = float(os.getenv("ESTIMATED_STREAM_MBPS", 5))
+# Disk admission: reserve bitrate x duration per job and keep this much of RECORDINGS_DIR free
+DISK_HEADROOM_MB = int(os.getenv("DISK_HEADROOM_MB", 500))
+UNLIMITED_RESERVE_HOURS = float(os.getenv("UNLIMITED_RESERVE_HOURS", 1))  # Reservation for unlimited recordings
+DISK_PREALLOCATE = os.getenv("DISK_PREALLOCATE", "false").lower() in ("1", "true", "yes")
+CHANNEL_STATS_FILE = os.getenv("CHANNEL_STATS_FILE", "channel_stats.json")  # Measured per-channel bitrates
+# HLS rendition choice: max_bitrate, max_resolution, or fit (best rendition within uplink / concurrent jobs)
+HLS_VARIANT_POLICY = os.getenv("HLS_VARIANT_POLICY", "max_bitrate").lower()
+UPLINK_MBPS = float(os.getenv("UPLINK_MBPS", MAX_INGEST_MBPS))
+VARIANT_FIT_JOBS = int(os.getenv("VARIANT_FIT_JOBS", MAX_CONCURRENT_RECORDINGS or 1))
+VARIANT_BUDGET_MBPS = UPLINK_MBPS / max(VARIANT_FIT_JOBS, 1)
+# Step down to a lower rendition when downloads fall behind real time
+ADAPTIVE_VARIANTS = os.getenv("ADAPTIVE_VARIANTS", "true").lower() in ("1", "true", "yes")
+DOWNSHIFT_SPEED = float(os.getenv("DOWNSHIFT_SPEED", 0.9))  # Sustained ffmpeg speed below this triggers a step down
+# SQLite journal of every job's state, used to resume schedules and recordings after a restart
+# (relative paths are taken from the bot's directory; also holds the resumable-upload state)
+JOB_JOURNAL_PATH = os.path.join(BASE_DIR, os.getenv("JOB_JOURNAL_PATH", "jobs.db"))
+
+# --- Cluster ---
+# standalone: this process records; frontend: Telegram bot that only queues jobs in MongoDB;
+# node: recorder that claims queued jobs with heartbeated leases
+CLUSTER_ROLE = os.getenv("CLUSTER_ROLE", "standalone").lower()
+NODE_ID = os.getenv("NODE_ID") or socket.gethostname()
+CLUSTER_LEASE_SECONDS = int(os.getenv("CLUSTER_LEASE_SECONDS", 30))  # A node silent this long loses its jobs
+CLUSTER_POLL_SECONDS = float(os.getenv("CLUSTER_POLL_SECONDS", 5))
 
 # --- M3U Playlists ---
 # Load playlists from a comma-separated string in the environment variable
@@ -0,0 +1,169 @@
+import time
+import asyncio
+from typing import Dict, List, Optional
+from telethon import Button
+from telethon.errors.rpcerrorlist import FloodWaitError, MessageNotModifiedError
+from utils.telegram_gateway import telegram_gateway, NOTICE, PROGRESS
+from config import LIVE_DASHBOARD, DASHBOARD_INTERVAL, DASHBOARD_MAX_INTERVAL, DASHBOARD_PIN
+
+# Telegram's limit for a message text
+MAX_MESSAGE_LENGTH = 4096
+# Telegram rejects markups over 100 buttons (REPLY_MARKUP_TOO_LONG), and long ones before that
+MAX_BUTTONS = 50
+# Successful renders in a row before a slowed-down board speeds up again
+RECOVER_AFTER = 5
+
+
+class LiveDashboard:
+    """
+    One pinned status message per chat covering every active job in it.
+
+    Jobs push their current status line with `update()`, which only stores it
+    and marks the board dirty. A per-chat loop re-renders the message every
+    `interval` seconds, and only when something changed, so each chat costs at
+    most one edit per interval however many recordings and uploads run in it.
+    A FloodWait doubles that chat's interval (up to `max_interval`), and
+    consecutive successful edits bring it back down.
+    """
+
+    def __init__(self, interval: float = 5, max_interval: float = 60, pin: bool = True):
+        self.interval = interval
+        self.max_interval = max_interval
+        self.pin = pin
+        self._boards: Dict[int, Dict[str, any]] = {}
+
+    def update(self, client, chat_id: int, job_id: int, text: str, cancel_label: Optional[str] = None):
+        """
+        Sets the status line of a job, starting the chat's board if needed.
+
+        Args:
+            client: Bot client used to send and edit the board
+            chat_id: Chat the job reports to
+            job_id: Job key, the command's message id for cancellable jobs
+            text: Markdown status line(s) for this job
+            cancel_label: Adds a cancel button for the job with this label
+        """
+        board = self._boards.get(chat_id)
+        if board is None:
+            board = {
+                'client': client, 'jobs': {}, 'msg_id': None, 'dirty': False,
+                'interval': self.interval, 'successes': 0, 'edits': 0, 'floods': 0,
+            }
+            self._boards[chat_id] = board
+            board['task'] = asyncio.create_task(self._run(chat_id, board))
+        job = board['jobs'].setdefault(job_id, {'text': None, 'cancel_label': None})
+        if job['text'] != text or job['cancel_label'] != cancel_label:
+            job['text'] = text
+            job['cancel_label'] = cancel_label
+            board['dirty'] = True
+
+    def remove(self, chat_id: int, job_id: int):
+        """Drops a finished job from its chat's board."""
+        board = self._boards.get(chat_id)
+        if board and board['jobs'].pop(job_id, None) is not None:
+            board['dirty'] = True
+
+    def message_id(self, chat_id: int) -> Optional[int]:
+        board = self._boards.get(chat_id)
+        return board['msg_id'] if board else None
+
+    def _render(self, board: Dict[str, any]):
+        jobs = board['jobs']
+        if not jobs:
+            return "✅ **All recordings finished**", None
+
+        header = f"📺 **LIVE DASHBOARD** • `{len(jobs)}` job(s)\n━━━━━━━━━━━━━━━━━━━\n"
+        text = header
+        shown = []
+        for job_id, job in jobs.items():
+            block = f"\n{job['text']}\n"
+            more = f"\n…and `{len(jobs) - len(shown)}` more"
+            if len(text) + len(block) + len(more) > MAX_MESSAGE_LENGTH:
+                text += more
+                break
+            text += block
+            shown.append((job_id, job))
+        text += f"\n🕐 `{time.strftime('%H:%M:%S')}`"
+
+        # Only jobs listed in the text get a button, so the markup stays as bounded as the text
+        buttons = [
+            [Button.inline(f"❌ {job['cancel_label'][:32]}", data=f"cancel_recording_{job_id}")]
+            for job_id, job in shown if job['cancel_label']
+        ][:MAX_BUTTONS]
+        return text, buttons or None
+
+    async def _publish(self, chat_id: int, board: Dict[str, any]):
+        text, buttons = self._render(board)
+        client = board['client']
+        if board['msg_id'] is None:
+            message = await telegram_gateway.send_message(client, chat_id, text, parse_mode="Markdown",
+                                                          buttons=buttons, priority=NOTICE)
+            board['msg_id'] = message.id
+            if self.pin:
+                try:
+                    await telegram_gateway.call(client, chat_id,
+                                                lambda: client.pin_message(chat_id, message.id, notify=False))
+                except Exception as e:
+                    # Needs pin rights in groups; the board still works unpinned
+                    print(f"[Dashboard] [WARNING] Could not pin dashboard in {chat_id}: {e}")
+        else:
+            await telegram_gateway.edit_message(client, chat_id, board['msg_id'], text=text, parse_mode="Markdown",
+                                                buttons=buttons, priority=PROGRESS)
+        board['edits'] += 1
+
+    async def _run(self, chat_id: int, board: Dict[str, any]):
+        """Render loop of one chat; ends after the last job has left the board."""
+        try:
+            while True:
+                await asyncio.sleep(board['interval'])
+                if not board['dirty']:
+                    continue
+                board['dirty'] = False
+                finished = not board['jobs']
+                try:
+                    await self._publish(chat_id, board)
+                    board['successes'] += 1
+                    if board['successes'] >= RECOVER_AFTER and board['interval'] > self.interval:
+                        board['interval'] = max(self.interval, board['interval'] / 2)
+                        board['successes'] = 0
+                except MessageNotModifiedError:
+                    pass
+                except FloodWaitError as fwe:
+                    board['floods'] += 1
+                    board['successes'] = 0
+                    board['interval'] = min(max(board['interval'] * 2, fwe.seconds), self.max_interval)
+                    board['dirty'] = True
+                    print(f"[Dashboard] [WARNING] FloodWait {fwe.seconds}s in {chat_id}, "
+                          f"rendering every {board['interval']:g}s")
+                    await asyncio.sleep(fwe.seconds)
+                    continue
+                except Exception as e:
+                    print(f"[Dashboard] [ERROR] Could not update dashboard in {chat_id}: {e}")
+
+                if finished and not board['jobs']:
+                    if self.pin and board['msg_id'] is not None:
+                        try:
+                            msg_id = board['msg_id']
+                            await telegram_gateway.call(board['client'], chat_id,
+                                                        lambda: board['client'].unpin_message(chat_id, msg_id))
+                        except Exception:
+                            pass
+                    break
+        finally:
+            if self._boards.get(chat_id) is board:
+                del self._boards[chat_id]
+            # A job that arrived while the board was closing gets a fresh one
+            if board['jobs'] and chat_id not in self._boards:
+                for job_id, job in board['jobs'].items():
+                    self.update(board['client'], chat_id, job_id, job['text'], job['cancel_label'])
+
+    def stats(self) -> List[Dict[str, any]]:
+        """Per-chat job count, render interval and API usage, for /status."""
+        return [
+            {'chat_id': chat_id, 'jobs': len(board['jobs']), 'interval': board['interval'],
+             'edits': board['edits'], 'floods': board['floods']}
+            for chat_id, board in self._boards.items()
+        ]
+
+
+live_dashboard = LiveDashboard(DASHBOARD_INTERVAL, DASHBOARD_MAX_INTERVAL, DASHBOARD_PIN) if LIVE_DASHBOARD else None
@@ -7,6 +7,7 @@ from config import ADMIN_ID, LOG_CHANNEL, BOT_TOKEN
 from features.auto_responses import AUTO_RESPONSES
 from utils.database import get_database
 from utils.admin_checker import is_admin
+from utils.telegram_gateway import telegram_gateway, REPLY
 
 async def delete_after_delay(client, chat_id, message_id, delay=2):
     """Delete message after specified delay"""
@@ -33,7 +34,7 @@ async def handle_message(event: events.NewMessage):
     message_lower = message_text.lower()
     for keyword, response in AUTO_RESPONSES.items():
         if keyword in message_lower:
-            await event.reply(response)
+            await telegram_gateway.reply(event, response)
             return
 
     # Store message context in MongoDB
@@ -60,8 +61,8 @@ async def handle_message(event: events.NewMessage):
     if event.is_private:
         for admin_id in ADMIN_ID:
             try:
-                forwarded_message = await event.client.forward_messages(
-                    entity=admin_id,
+                forwarded_message = await telegram_gateway.forward_messages(
+                    event.client, admin_id,
                     messages=event.message
                 )
                 
@@ -78,13 +79,13 @@ async def handle_message(event: events.NewMessage):
 
         # Log and confirm
         if LOG_CHANNEL:
-            await event.client.send_message(
-                LOG_CHANNEL,
+            await telegram_gateway.send_message(
+                event.client, LOG_CHANNEL,
                 f"#Message\nFrom: {user.first_name} {user.last_name or ''} (@{user.username or 'None'})\n"
                 f"ID: {user.id}\nChat: {event.chat_id}\nMsg: {message_text}"
             )
         
-        confirmation = await event.reply("✅ Aapka message admin tak pahunch gaya hai!")
+        confirmation = await telegram_gateway.reply(event, "✅ Aapka message admin tak pahunch gaya hai!")
         asyncio.create_task(delete_after_delay(event.client, event.chat_id, confirmation.id))
 
 async def handle_reply(event: events.NewMessage):
@@ -116,22 +117,22 @@ async def handle_reply(event: events.NewMessage):
                 return
                 
             try:
-                await event.client.send_message(
-                    entity=original_context['chat_id'],
+                await telegram_gateway.send_message(
+                    event.client, original_context['chat_id'],
                     message=event.text,
                     reply_to=original_context['original_msg_id']
                 )
-                confirmation = await event.reply("✅ Reply bhej diya gaya hai!")
+                confirmation = await telegram_gateway.reply(event, "✅ Reply bhej diya gaya hai!")
                 asyncio.create_task(delete_after_delay(event.client, event.chat_id, confirmation.id))
                 
                 if LOG_CHANNEL:
-                    await event.client.send_message(
-                        LOG_CHANNEL,
+                    await telegram_gateway.send_message(
+                        event.client, LOG_CHANNEL,
                         f"#Reply\nAdmin: {event.sender.first_name} {event.sender.last_name or ''}\n"
                         f"To: {original_context['user_id']}\nMsg: {event.text}"
                     )
             except Exception as e:
-                await event.reply(f"❌ Reply bhejne mein error aaya: {str(e)}")
+                await telegram_gateway.reply(event, f"❌ Reply bhejne mein error aaya: {str(e)}")
         return
     
     # Handle user replies to bot messages
@@ -146,7 +147,7 @@ async def admin_reply(event: events.NewMessage):
 
     parts = event.text.split(maxsplit=2) # Split into command, user_id, message
     if len(parts) < 3:
-        error_msg = await event.reply("Usage:\n/reply <user_id> <message>")
+        error_msg = await telegram_gateway.reply(event, "Usage:\n/reply <user_id> <message>")
         asyncio.create_task(delete_after_delay(event.client, event.chat_id, error_msg.id))
         return
     
@@ -154,23 +155,23 @@ async def admin_reply(event: events.NewMessage):
         user_id = int(parts[1])
         message_text = parts[2]
     except ValueError:
-        error_msg = await event.reply("Invalid user ID.")
+        error_msg = await telegram_gateway.reply(event, "Invalid user ID.")
         asyncio.create_task(delete_after_delay(event.client, event.chat_id, error_msg.id))
         return
     
     try:
-        await event.client.send_message(user_id, message_text)
-        confirmation = await event.reply("✅ Reply bhej diya gaya hai!")
+        await telegram_gateway.send_message(event.client, user_id, message_text)
+        confirmation = await telegram_gateway.reply(event, "✅ Reply bhej diya gaya hai!")
         asyncio.create_task(delete_after_delay(event.client, event.chat_id, confirmation.id))
         
         if LOG_CHANNEL:
-            await event.client.send_message(
-                LOG_CHANNEL,
+            await telegram_gateway.send_message(
+                event.client, LOG_CHANNEL,
                 f"#Reply\nAdmin: {event.sender.first_name} {event.sender.last_name or ''}\n"
                 f"To: {user_id}\nMsg: {message_text}"
             )
     except Exception as e:
-        await event.reply(f"❌ Reply bhejne mein error aaya: {str(e)}")
+        await telegram_gateway.reply(event, f"❌ Reply bhejne mein error aaya: {str(e)}")
 
 async def user_info(event: events.NewMessage):
     """Handle /info command"""
@@ -178,12 +179,12 @@ async def user_info(event: events.NewMessage):
         return
     
     if not event.reply_to_msg_id:
-        error_msg = await event.reply("⚠️ Kisi forwarded message pe /info reply karein")
+        error_msg = await telegram_gateway.reply(event, "⚠️ Kisi forwarded message pe /info reply karein")
         return
     
     db = get_database()
     if db is None:
-        error_msg = await event.reply("MongoDB not connected, cannot retrieve message context.")
+        error_msg = await telegram_gateway.reply(event, "MongoDB not connected, cannot retrieve message context.")
         return
     message_context_collection = db["message_context"]
 
@@ -192,13 +193,13 @@ async def user_info(event: events.NewMessage):
     context_data = await message_context_collection.find_one({"_id": replied_msg_id})
     
     if not context_data:
-        error_msg = await event.reply("⚠️ Is message ka context nahi mila")
+        error_msg = await telegram_gateway.reply(event, "⚠️ Is message ka context nahi mila")
         return
     
     user_id = context_data['user_id']
     
     try:
-        user_entity = await event.client.get_entity(user_id)
+        user_entity = await telegram_gateway.call(event.client, None, lambda: event.client.get_entity(user_id), REPLY)
         # Create copy buttons
         keyboard = [
             [Button.inline("Name Copy Karein", data=f"copy_name_{user_entity.first_name} {user_entity.last_name or ''}".encode())],
@@ -214,12 +215,13 @@ async def user_info(event: events.NewMessage):
             f"Copy karne ke liye niche click karein:"
         )
         
-        await event.reply(
+        await telegram_gateway.reply(
+            event,
             response,
             buttons=keyboard
         )
     except Exception as e:
-        await event.reply(f"❌ User info fetch karne mein error aaya: {str(e)}")
+        await telegram_gateway.reply(event, f"❌ User info fetch karne mein error aaya: {str(e)}")
 
 async def handle_copy_button(event: events.CallbackQuery):
     """Handle copy button clicks"""
@@ -228,7 +230,8 @@ async def handle_copy_button(event: events.CallbackQuery):
     callback_data = event.data.decode('utf-8')
     if callback_data.startswith("copy_"):
         _, field, value = callback_data.split("_", 2)
-        await event.edit(f"✅ {field.capitalize()} copy ho gaya: {value}")
+        await telegram_gateway.call(event.client, event.chat_id,
+                                    lambda: event.edit(f"✅ {field.capitalize()} copy ho gaya: {value}"), REPLY)
 
 # No longer needed as handlers are registered directly in handler.py
 # def get_message_handlers():
@@ -4,9 +4,10 @@ import time
 import asyncio
 from telethon import events
 from telethon.sync import TelegramClient
-from config import ADMIN_ID, ACTIVE_RECORDINGS, RECORDINGS_DIR
+from config import ADMIN_ID, ACTIVE_RECORDINGS, RECORDINGS_DIR, CLUSTER_ROLE
 from datetime import datetime, timedelta
 from utils.admin_checker import is_admin
+from utils.telegram_gateway import telegram_gateway, BULK
 
 # Track bot start time for uptime
 _bot_start_time = time.time()
@@ -62,11 +63,12 @@ async def status_command(event: events.NewMessage):
     """Show enhanced system status dashboard"""
     user_id = event.sender_id
     if not await is_admin(user_id, event.chat_id):
-        await event.reply("❌ Only admin can use this command")
+        await telegram_gateway.reply(event, "❌ Only admin can use this command")
         return
 
     # System metrics
-    cpu = psutil.cpu_percent(interval=0.5)
+    # Sampling blocks for the interval, so keep it off the event loop
+    cpu = await asyncio.to_thread(psutil.cpu_percent, 0.5)
     ram = psutil.virtual_memory()
     disk = psutil.disk_usage('/')
 
@@ -120,12 +122,112 @@ async def status_command(event: events.NewMessage):
                 f"   ⏱ `{elapsed}` / `{duration_display}`\n"
                 f"   👤 `{rec['user_id']}`\n"
             )
+            stats = rec.get('stats')
+            if stats:
+                msg += f"   💾 `{_format_bytes(stats['total_size'])}` • 🚀 `{stats['speed']:.2f}x`"
+                if stats.get('stalled'):
+                    msg += f" • ⚠️ **STALLED** `{int(stats['stalled_for'])}s`"
+                msg += "\n"
         msg += "\n"
     else:
         msg += "🟢 **No active recordings**\n\n"
 
+    # Shared upstream pulls (one per channel, fanned out to its recordings)
+    from recorders.ingest_hub import ingest_hub
+    shared = ingest_hub.stats()
+    if shared:
+        msg += f"🔗 **Shared Ingest:** `{len(shared)}` upstream(s) • `{sum(shared.values())}` recording(s)\n"
+
+    from recorders.timeshift import timeshift
+    for buffer in timeshift.stats():
+        state = "🟢" if buffer['connected'] else f"🔴 `{buffer['error']}`"
+        msg += (
+            f"📼 **Time-shift** `{buffer['name']}`: `{int(buffer['seconds'] // 60)}` min • "
+            f"`{_format_bytes(buffer['bytes'])}` {state}\n"
+        )
+
+    from recorders.worker_pool import worker_pool
+    if worker_pool:
+        loads = " / ".join("–" if jobs < 0 else str(jobs) for jobs in worker_pool.stats())
+        msg += f"⚙️ **Workers:** `{loads}` job(s)\n"
+
+    from features.live_dashboard import live_dashboard
+    boards = live_dashboard.stats() if live_dashboard else []
+    if boards:
+        slowest = max(board['interval'] for board in boards)
+        msg += (
+            f"🖥 **Dashboards:** `{len(boards)}` chat(s) • `{sum(b['edits'] for b in boards)}` edit(s) • "
+            f"FloodWaits: `{sum(b['floods'] for b in boards)}` • Slowest: `{slowest:g}s`\n"
+        )
+
+    # Outgoing Telegram calls
+    gateway = telegram_gateway.stats()
+    queued = gateway['queued']
+    msg += (
+        f"📨 **API Queue:** replies `{queued['reply']}` • notices `{queued['notice']}` • "
+        f"progress `{queued['progress']}` • bulk `{queued['bulk']}` • in flight `{gateway['in_flight']}`\n"
+        f"   🔁 Coalesced: `{gateway['coalesced']}` • FloodWaits: `{gateway['flood_waits']}` "
+        f"(`{gateway['flood_seconds']}s`) • Blocked chats: `{gateway['blocked_chats']}`\n"
+    )
+
+    # Admission queue (capture slots and ingest budget)
+    from scheduler import scheduled_jobs, admission
+    queue = admission.stats()
+    slots = f"{queue['running']}/{queue['max_recordings']}" if queue['max_recordings'] else f"{queue['running']}"
+    msg += f"🎛 **Capture Slots:** `{slots}` • ⏸ Waiting: `{queue['waiting']}`\n"
+    if queue['max_ingest_mbps']:
+        msg += f"📶 **Ingest:** `{queue['ingest_mbps']}` / `{queue['max_ingest_mbps']:g}` Mbps\n"
+    disk_stats = admission.disk.stats() if admission.disk else None
+    if disk_stats and disk_stats['jobs']:
+        msg += (
+            f"🗄 **Disk Reserved:** `{_format_bytes(disk_stats['reserved'])}` • "
+            f"Written: `{_format_bytes(disk_stats['written'])}` • "
+            f"Free after jobs: `{_format_bytes(max(disk_stats['free'] - disk_stats['outstanding'], 0))}`\n"
+        )
+
+    # Upload session pool
+    from uploader import upload_manager
+    uploads = upload_manager.session_pool.stats()
+    msg += (
+        f"📤 **Uploads:** `{uploads['busy']}/{uploads['lanes']}` lanes over `{uploads['sessions']}` session(s) • "
+        f"⏸ Waiting: `{uploads['waiting']}`\n"
+    )
+
+    # Stream URL resolution cache
+    from recorders.recorder_utils import stream_resolver
+    resolver = stream_resolver.stats()
+    if resolver['hits'] or resolver['misses']:
+        msg += (
+            f"🔗 **Resolver:** `{resolver['cached']}` cached • Hits: `{resolver['hits']}` • "
+            f"Lookups: `{resolver['misses']}`\n"
+        )
+
+    # Channel health prober
+    from recorders.channel_prober import channel_prober
+    probes = channel_prober.stats() if channel_prober else None
+    if probes and probes['last_sweep']:
+        swept_ago = int(time.time() - probes['last_sweep'])
+        msg += (
+            f"🩺 **Channels:** `{probes['alive']}` alive • `{probes['dead']}` dead • "
+            f"Checked `{timedelta(seconds=swept_ago)}` ago\n"
+        )
+
+    # Recorder nodes sharing the MongoDB job queue
+    from cluster import cluster_store
+    if CLUSTER_ROLE != "standalone":
+        try:
+            nodes = await cluster_store.nodes()
+            counts = await cluster_store.counts()
+            msg += (
+                f"🛰 **Cluster:** `{len(nodes)}` node(s) • Pending: `{counts.get('pending', 0)}` • "
+                f"Claimed: `{counts.get('claimed', 0)}`\n"
+            )
+            for node in nodes:
+                msg += f"   🖥 `{node['_id']}` • `{node['running']}/{node['capacity']}`\n"
+        except Exception as e:
+            msg += f"🛰 **Cluster:** unavailable (`{e}`)\n"
+
     # Scheduled jobs info
-    from scheduler import scheduled_jobs
     pending = len(scheduled_jobs)
     if pending > 0:
         msg += f"📅 **Queued Jobs:** `{pending}`\n"
@@ -137,7 +239,7 @@ async def status_command(event: events.NewMessage):
         f"🕐 `{datetime.now().strftime('%d-%m-%Y %H:%M:%S IST')}`"
     )
 
-    await event.reply(msg, parse_mode="Markdown")
+    await telegram_gateway.reply(event, msg, parse_mode="Markdown")
 
 
 # ━━━ Broadcast Command ━━━
@@ -146,12 +248,13 @@ async def broadcast_command(event: events.NewMessage):
     """Broadcast message to all users with active recordings"""
     user_id = event.sender_id
     if not await is_admin(user_id, event.chat_id):
-        await event.reply("❌ Only admin can use this command")
+        await telegram_gateway.reply(event, "❌ Only admin can use this command")
         return
     
     args = event.text.split(maxsplit=1)
     if len(args) < 2:
-        await event.reply(
+        await telegram_gateway.reply(
+            event,
             "❌ **Usage:** `/broadcast <message>`",
             parse_mode="Markdown"
         )
@@ -167,7 +270,7 @@ async def broadcast_command(event: events.NewMessage):
     user_ids = {recording['user_id'] for recording in ACTIVE_RECORDINGS.values()}
     
     if not user_ids:
-        await event.reply("⚠️ No active users to broadcast to.")
+        await telegram_gateway.reply(event, "⚠️ No active users to broadcast to.")
         return
     
     success = 0
@@ -175,14 +278,16 @@ async def broadcast_command(event: events.NewMessage):
     
     for chat_id in user_ids:
         try:
-            await event.client.send_message(entity=chat_id, message=message_to_broadcast, parse_mode="Markdown")
+            # Bulk class: the gateway paces it and lets replies and progress go first
+            await telegram_gateway.send_message(event.client, chat_id, message=message_to_broadcast,
+                                                parse_mode="Markdown", priority=BULK)
             success += 1
         except Exception as e:
             print(f"Failed to send to {chat_id}: {e}")
             failed += 1
-        await asyncio.sleep(0.1)  # Rate limiting
     
-    await event.reply(
+    await telegram_gateway.reply(
+        event,
         f"📢 **Broadcast Complete**\n"
         f"━━━━━━━━━━━━━━━━━━━\n\n"
         f"✅ Sent: `{success}`\n"
@@ -207,6 +312,12 @@ def add_active_recording(details):
     }
     return recording_id
 
+def update_active_recording(recording_id, stats):
+    """Attach the latest ffmpeg telemetry (size, speed, stall state) to a tracked recording"""
+    from config import ACTIVE_RECORDINGS
+    if recording_id in ACTIVE_RECORDINGS:
+        ACTIVE_RECORDINGS[recording_id]['stats'] = stats
+
 def remove_active_recording(recording_id):
     """Remove a recording from tracking"""
     from config import ACTIVE_RECORDINGS
@@ -9,6 +9,7 @@ from config import (
     BOT_NAME,
     VERIFICATION_REWARD_MINUTES
 )
+from utils.telegram_gateway import telegram_gateway
 
 async def verify_command(event: events.NewMessage):
     """Send verification link to user"""
@@ -43,7 +44,8 @@ async def verify_command(event: events.NewMessage):
         [Button.inline("✅ I've Verified", data=f"verify_check_{token}".encode())]
     ]
     
-    await event.reply(
+    await telegram_gateway.reply(
+        event,
         f"To verify and get {VERIFICATION_REWARD_MINUTES} minutes recording access:\n\n"
         "1. Click the button below\n"
         "2. Complete the verification\n"
@@ -62,11 +64,11 @@ async def verify_callback(event: events.CallbackQuery):
         verification = VERIFICATION_LINKS.get(token)
         
         if not verification:
-            await event.edit("❌ Invalid or expired verification link")
+            await telegram_gateway.edit(event, "❌ Invalid or expired verification link")
             return
             
         if verification['used']:
-            await event.edit("⚠️ This link has already been used")
+            await telegram_gateway.edit(event, "⚠️ This link has already been used")
             return
             
         # Mark as used
@@ -80,7 +82,8 @@ async def verify_callback(event: events.CallbackQuery):
         # Implement your own user time tracking system here
         # Example: user_db[user_id]['recording_expiry'] = expiry_time
         
-        await event.edit(
+        await telegram_gateway.edit(
+            event,
             f"✅ Verification successful!\n\n"
             f"You can now record for {VERIFICATION_REWARD_MINUTES} minutes "
             f"(until {expiry_time.strftime('%H:%M')})"
@@ -12,6 +12,7 @@ from handlers.temp_admin_handler import add_temp_admin_command, remove_admin_com
 from handlers.group_admin_handler import add_group_admin_command, remove_group_admin_command
 from features.status_broadcast import status_command, broadcast_command
 from handlers.cancel_handler import handle_cancel, handle_cancel_button
+from handlers.clip_handler import handle_clip
 from handlers.file_handler import handle_list_files, handle_upload_file, handle_delete_file
 from chatbot.bot_app import handle_chat_message
 
@@ -34,6 +35,7 @@ def register_handlers(client: TelegramClient):
     client.add_event_handler(status_command, events.NewMessage(pattern='/status|/sts'))
     client.add_event_handler(broadcast_command, events.NewMessage(pattern='/broadcast|/bc'))
     client.add_event_handler(handle_cancel, events.NewMessage(pattern='/cancel'))
+    client.add_event_handler(handle_clip, events.NewMessage(pattern='/clip'))
     client.add_event_handler(handle_list_files, events.NewMessage(pattern='/files'))
     client.add_event_handler(handle_upload_file, events.NewMessage(pattern='/upload'))
     client.add_event_handler(handle_delete_file, events.NewMessage(pattern='/delete'))
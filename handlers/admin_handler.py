@@ -4,6 +4,7 @@ from config import ADMIN_ID
 from datetime import datetime, timedelta
 from utils.admin_checker import get_admin_expiry_time, add_temp_admin, is_temp_admin
 from telethon.errors.rpcerrorlist import PeerIdInvalidError
+from utils.telegram_gateway import telegram_gateway
 
 async def handle_admin_request(event: events.CallbackQuery):
     user = await event.get_sender()
@@ -30,8 +31,8 @@ async def handle_admin_request(event: events.CallbackQuery):
     # Only show admin status message if they actually are an admin
     if is_permanent_admin or is_temp:
         try:
-            await event.client.send_message(
-                entity=user.id,
+            await telegram_gateway.send_message(
+                event.client, user.id,
                 message=f"🌟 **Admin Status**\n\n"
                      f"You already have admin access!\n"
                      f"{'⏳ This is a permanent admin account' if is_permanent_admin else remaining_time}\n\n"
@@ -64,8 +65,8 @@ async def handle_admin_request(event: events.CallbackQuery):
     # Send to all admins
     for admin_chat_id in ADMIN_ID:
         try:
-            await event.client.send_message(
-                entity=admin_chat_id,
+            await telegram_gateway.send_message(
+                event.client, admin_chat_id,
                 message=request_msg,
                 parse_mode="Markdown",
                 # Telethon does not have disable_notification directly in send_message
@@ -94,8 +95,8 @@ async def handle_admin_request(event: events.CallbackQuery):
     keyboard = [[Button.url("Help / Contact Developer", "https://t.me/krinry")]]
 
     try:
-        await event.client.send_message(
-            entity=user.id,
+        await telegram_gateway.send_message(
+            event.client, user.id,
             message=user_response,
             parse_mode="Markdown",
             buttons=keyboard
@@ -105,7 +106,8 @@ async def handle_admin_request(event: events.CallbackQuery):
         bot_username = bot_entity.username
         bot_start_link = f"https://t.me/{bot_username}?start"
         
-        await event.edit(
+        await telegram_gateway.edit(
+            event,
             f"⚠️ **Admin Request Failed!**\n\n"
             f"Aapne abhi tak bot ke saath private chat start nahi ki hai.\n"
             f"Pehle yahan click karke bot ko start karein: [Start Bot]({bot_start_link})\n\n"
@@ -116,8 +118,8 @@ async def handle_admin_request(event: events.CallbackQuery):
         print(f"Could not send confirmation to user {user.id}. User has not started a conversation with the bot.")
         for admin_chat_id in ADMIN_ID:
             try:
-                await event.client.send_message(
-                    entity=admin_chat_id,
+                await telegram_gateway.send_message(
+                    event.client, admin_chat_id,
                     message=f"⚠️ User {user.first_name} ({user.id}) requested admin access but could not be messaged directly. They need to start a conversation with the bot first.",
                     parse_mode="Markdown"
                 )
@@ -143,15 +145,16 @@ async def handle_approval(event: events.CallbackQuery):
     await add_temp_admin(user_id, expiry_time)
     
     # Notify admin
-    await event.edit(
+    await telegram_gateway.edit(
+        event,
         text=f"✅ Temporary admin access granted to user `{user_id}` for {duration} hours.",
         parse_mode="Markdown"
     )
     
     # Notify user
     try:
-        await event.client.send_message(
-            entity=user.id,
+        await telegram_gateway.send_message(
+            event.client, user.id,
             message=f"🎉 **Admin Access Granted!**\n\n"
                  f"You have been granted temporary admin access for {duration} hours.\n\n"
                  f"Thank you for your patience! 😊",
@@ -161,8 +164,8 @@ async def handle_approval(event: events.CallbackQuery):
         print(f"Could not send admin access granted message to user {user.id}. User has not started a conversation with the bot.")
         for admin_chat_id in ADMIN_ID:
             try:
-                await event.client.send_message(
-                    entity=admin_chat_id,
+                await telegram_gateway.send_message(
+                    event.client, admin_chat_id,
                     message=f"⚠️ Admin access granted to user {user.first_name} ({user.id}) but could not be messaged directly. They need to start a conversation with the bot first.",
                     parse_mode="Markdown"
                 )
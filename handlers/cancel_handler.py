@@ -2,6 +2,7 @@ from telethon import events
 from scheduler import cancel_scheduled_recording, scheduled_jobs
 from utils.admin_checker import is_admin
 from config import ADMIN_ID
+from utils.telegram_gateway import telegram_gateway, REPLY
 
 async def handle_cancel(event: events.NewMessage):
     """Handle /cancel command — cancel a recording by reply or message ID"""
@@ -14,7 +15,8 @@ async def handle_cancel(event: events.NewMessage):
         reply_message = await event.get_reply_message()
         message_id = reply_message.id
     else:
-        await event.reply(
+        await telegram_gateway.reply(
+            event,
             "❌ **Usage:**\n"
             "`/cancel <message_id>` or reply to the recording message.",
             parse_mode="Markdown"
@@ -22,7 +24,7 @@ async def handle_cancel(event: events.NewMessage):
         return
 
     if message_id not in scheduled_jobs:
-        await event.reply("⚠️ Recording not found or already completed.")
+        await telegram_gateway.reply(event, "⚠️ Recording not found or already completed.")
         return
 
     job_user_id = scheduled_jobs[message_id].get('user_id')
@@ -32,9 +34,9 @@ async def handle_cancel(event: events.NewMessage):
         if cancel_scheduled_recording(message_id):
             # Edit the recording status message to show cancelled
             try:
-                await event.client.edit_message(
-                    entity=event.chat_id,
-                    message=job.get('status_msg_id') if job else None,
+                await telegram_gateway.edit_message(
+                    event.client, event.chat_id, job.get('status_msg_id') if job else None,
+                    priority=REPLY,
                     text=(
                         "⏹ **CANCELLED**\n"
                         "━━━━━━━━━━━━━━━━━━━\n\n"
@@ -46,11 +48,11 @@ async def handle_cancel(event: events.NewMessage):
                 )
             except Exception:
                 pass  # Status message might not exist
-            await event.reply("✅ Recording cancelled successfully.")
+            await telegram_gateway.reply(event, "✅ Recording cancelled successfully.")
         else:
-            await event.reply("❌ Could not cancel. It may have already completed.")
+            await telegram_gateway.reply(event, "❌ Could not cancel. It may have already completed.")
     else:
-        await event.reply("⚠️ You are not authorized to cancel this recording.")
+        await telegram_gateway.reply(event, "⚠️ You are not authorized to cancel this recording.")
 
 async def handle_cancel_button(event: events.CallbackQuery):
     """Handle inline ❌ Cancel button click on recording messages"""
@@ -64,11 +66,15 @@ async def handle_cancel_button(event: events.CallbackQuery):
     job_user_id = scheduled_jobs[message_id].get('user_id')
 
     if user_id == job_user_id or user_id in ADMIN_ID:
+        status_msg_id = scheduled_jobs[message_id].get('status_msg_id')
         if cancel_scheduled_recording(message_id):
             await event.answer("✅ Recording cancelled!", alert=True)
-            # Edit the recording message to show cancelled status
+            # Edit the recording message to show cancelled status; a click on the
+            # chat dashboard must not overwrite the dashboard, which drops the job itself
             try:
-                await event.edit(
+                await telegram_gateway.edit_message(
+                    event.client, event.chat_id, status_msg_id or event.message_id,
+                    priority=REPLY,
                     text=(
                         "⏹ **CANCELLED**\n"
                         "━━━━━━━━━━━━━━━━━━━\n\n"
@@ -0,0 +1,167 @@
+import os
+import re
+import shlex
+import asyncio
+from datetime import datetime, timedelta
+from pytz import timezone
+from telethon import events, Button
+from utils.admin_checker import is_admin
+from utils.telegram_gateway import telegram_gateway, NOTICE
+from recorders.timeshift import timeshift, TimeshiftError
+from recorders.recorder_utils import get_video_duration
+from scheduler import scheduled_jobs, admission
+from uploader import send_video
+from utils.utils import format_bytes
+from captions import seconds_to_hms
+from config import RECORDINGS_DIR
+
+IST = timezone("Asia/Kolkata")
+RELATIVE_TIME = re.compile(r'^([+-])(\d+)([smh]?)$')
+UNITS = {'s': 1, '': 60, 'm': 60, 'h': 3600}
+
+
+def parse_clip_time(text: str, now: datetime, base: datetime = None) -> datetime:
+    """
+    Parses a /clip time: `now`, `-10m` (ago), `+5m` (after `base`), or `HH:MM[:SS]` IST today.
+
+    Raises:
+        ValueError: If the text is none of those
+    """
+    text = text.lower()
+    if text == "now":
+        return now
+    match = RELATIVE_TIME.match(text)
+    if match:
+        sign, amount, unit = match.groups()
+        delta = timedelta(seconds=int(amount) * UNITS[unit])
+        return (base or now) + delta if sign == "+" else now - delta
+    parts = list(map(int, text.split(":")))
+    if len(parts) == 2:
+        parts.append(0)
+    if len(parts) != 3:
+        raise ValueError(f"Invalid time: {text}")
+    return now.replace(hour=parts[0], minute=parts[1], second=parts[2], microsecond=0)
+
+
+async def cut_and_deliver(event, buffer, start: datetime, end: datetime, title: str, status_msg):
+    """Cuts the clip from the buffer (following it live until `end`) and uploads it."""
+    message_id = event.message.id
+    temp_path = os.path.join(RECORDINGS_DIR, f"temp_clip_{message_id}{buffer.extension}")
+    output_path = thumbnail_path = None
+    try:
+        result = await buffer.clip(start.timestamp(), end.timestamp(), temp_path)
+        real_start = datetime.fromtimestamp(result['start'], IST)
+        real_end = datetime.fromtimestamp(result['end'], IST)
+
+        sanitized_title = re.sub(r'[<>:"/\\|?*]', '_', title)
+        sanitized_channel = re.sub(r'[<>:"/\\|?*]', '_', buffer.name)
+        final_filename = f"{sanitized_title}.{sanitized_channel}.{real_start.strftime('%H-%M-%S')}-{real_end.strftime('%H-%M-%S')}.{real_start.strftime('%d-%m-%Y')}.{int(real_start.timestamp())}.IPTV.WEB-DL.@Krinry{buffer.extension}"
+        output_path = os.path.join(RECORDINGS_DIR, final_filename)
+        os.replace(temp_path, output_path)
+
+        thumbnail_path = os.path.join(RECORDINGS_DIR, f"{final_filename}.jpg")
+        thumbnail_cmd = [
+            "ffmpeg", "-y", "-loglevel", "error", "-i", output_path,
+            "-ss", "00:00:01", "-vframes", "1", "-q:v", "2", "-vf", "scale=320:-1",
+            thumbnail_path
+        ]
+        await (await asyncio.create_subprocess_exec(*thumbnail_cmd)).wait()
+
+        actual_duration = await get_video_duration(output_path) or result['duration']
+        caption = f"`📁 Filename: {final_filename}\n⏱ Duration: {seconds_to_hms(actual_duration)}\n💾 File-Size: {await format_bytes(os.path.getsize(output_path))}`\n☎️ @krinry"
+        if result['missing']:
+            caption += f"\n⚠️ ~{seconds_to_hms(result['missing'])} missing from the buffer"
+
+        async with admission.upload_slot():
+            await send_video(
+                output_path, caption, thumbnail=thumbnail_path, duration=int(actual_duration),
+                chat_id=event.chat_id, user_msg_id=message_id,
+                bot_client=event.client, status_msg_id=status_msg.id, user_id=event.sender_id
+            )
+    except TimeshiftError as e:
+        await telegram_gateway.edit_message(event.client, event.chat_id, status_msg.id,
+                                            text=f"❌ **Clip failed:** {e}", parse_mode="Markdown",
+                                            buttons=None, priority=NOTICE)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"[Clip] [ERROR] {title}: {e}")
+        await telegram_gateway.edit_message(event.client, event.chat_id, status_msg.id,
+                                            text=f"❌ Error: `{e}`", parse_mode="Markdown",
+                                            buttons=None, priority=NOTICE)
+    finally:
+        scheduled_jobs.pop(message_id, None)
+        for path in (temp_path, output_path, thumbnail_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+async def handle_clip(event: events.NewMessage):
+    """Handle /clip — cut a recording out of a channel's time-shift buffer"""
+    user_id = event.sender_id
+    if not await is_admin(user_id, event.chat_id):
+        await telegram_gateway.reply(event, "⚠️ Unauthorized Access", parse_mode="Markdown")
+        return
+
+    parts = shlex.split(event.text)
+    if len(parts) < 3:
+        buffered = ", ".join(f"`{buffer['name']}`" for buffer in timeshift.stats()) or "none"
+        await telegram_gateway.reply(
+            event,
+            "❗ **Usage:**\n"
+            "`/clip <channel> <start> [end] [title]`\n"
+            "Times: `HH:MM[:SS]` (IST), `-10m` (ago), `now`, or `+30m` for the end\n"
+            "Ex: `/clip sony -15m now Last Over` or `/clip sony 20:55 +45m Finale`\n\n"
+            f"📼 Buffered channels: {buffered}",
+            parse_mode="Markdown"
+        )
+        return
+
+    buffer = timeshift.get(parts[1])
+    if buffer is None:
+        await telegram_gateway.reply(event, f"❌ `{parts[1]}` is not time-shift buffered.", parse_mode="Markdown")
+        return
+
+    now = datetime.now(IST)
+    try:
+        if parts[2].startswith("+"):
+            raise ValueError("Start can't be relative to itself")
+        start = parse_clip_time(parts[2], now)
+        title_parts = parts[3:]
+        end = now
+        if title_parts:
+            try:
+                end = parse_clip_time(title_parts[0], now, base=start)
+                title_parts = title_parts[1:]
+            except ValueError:
+                pass  # No end time given, the rest is the title
+    except ValueError:
+        await telegram_gateway.reply(event, "❌ Invalid time. Use `HH:MM[:SS]`, `-10m`, `now` or `+30m`.",
+                                     parse_mode="Markdown")
+        return
+    if start > now:
+        start -= timedelta(days=1)  # 23:50 asked for just after midnight
+    if end <= start:
+        end += timedelta(days=1)
+    title = " ".join(title_parts) or "Clip"
+
+    live_until = f"\n🔴 Continues live until `{end.strftime('%H:%M:%S')}`" if end > now else ""
+    status_msg = await telegram_gateway.reply(
+        event,
+        f"✂️ **CLIPPING**\n"
+        f"━━━━━━━━━━━━━━━━━━━\n\n"
+        f"📌 `{title}`\n"
+        f"📡 `{buffer.name}`\n"
+        f"🕐 `{start.strftime('%H:%M:%S')}` → `{end.strftime('%H:%M:%S')}`{live_until}",
+        parse_mode="Markdown",
+        buttons=[Button.inline("❌ Cancel", data=f"cancel_recording_{event.message.id}")]
+    )
+
+    task = asyncio.create_task(cut_and_deliver(event, buffer, start, end, title, status_msg))
+    scheduled_jobs[event.message.id] = {
+        'task': task,
+        'process': None,
+        'user_id': user_id,
+        'status_msg_id': status_msg.id,
+        'chat_id': event.chat_id,
+    }
@@ -2,6 +2,7 @@ from telethon import events
 from telethon.tl.custom import Button
 from config import ADMIN_ID
 from utils.admin_checker import is_admin, is_temp_admin
+from utils.telegram_gateway import telegram_gateway
 
 # --- Help Text Content ---
 
@@ -13,19 +14,27 @@ Select a category below to see the available commands."""
 def get_recording_help_text():
     return """🎥 **Recording Commands**
 
-`/rec <url/id> [duration] [title] [--split <time>]`
+`/rec <url/id> [duration] [title] [--split <time|auto>]`
 Aliases: `/rd`, `/record`
 ├ Records a stream.
 └ **Examples:**
   ├ `/rec http://... 10:00 MyStream`
   ├ `/rec sony 01:00:00 Movie`
-  └ `/rd news --split 30:00` (Splits every 30m)
+  ├ `/rd news --split 30:00` (Splits every 30m)
+  └ `/rd news --split auto` (Splits just under Telegram's 2 GB limit)
 
 **Shortcuts (Playlist Filtering):**
 `/p1`, `/p2`, `/p3` ...
 ├ Equivalent to `/rec` but filters by playlist.
 └ Ex: `/p1 sony 30` (Search 'sony' only in Playlist 1)
 
+**Clip From the Past:**
+`/clip <channel> <start> [end] [title]`
+├ Cuts from the time-shift buffer of buffered channels.
+└ **Examples:**
+  ├ `/clip sony -15m now Last Over`
+  └ `/clip sony 20:55 +45m Finale` (continues live)
+
 **Find Channels:**
 `/find <query> [.p1]`
 └ Search channel names/IDs.
@@ -109,14 +118,16 @@ async def send_help(event: events.NewMessage):
     user_id = event.sender_id
     
     if not await is_admin(user_id, event.chat_id):
-        await event.reply(
+        await telegram_gateway.reply(
+            event,
             "⚠️ **Unauthorized Access**\n\n"
             "You don't have permission to use this bot.",
             parse_mode="Markdown"
         )
         return
 
-    await event.reply(
+    await telegram_gateway.reply(
+        event,
         get_main_help_text(),
         buttons=get_main_keyboard(),
         parse_mode="Markdown",
@@ -146,7 +157,8 @@ async def help_callback(event: events.CallbackQuery):
     elif help_section == "file_management":
         text = get_file_management_help_text()
 
-    await event.edit(
+    await telegram_gateway.edit(
+        event,
         text=text,
         buttons=reply_markup,
         parse_mode="Markdown",
@@ -7,8 +7,10 @@ from telethon.sync import TelegramClient
 from utils.admin_checker import is_admin
 from scheduler import start_recording_instantly
 from utils.logging import log_to_channel
-from config import ADMIN_ID
+from config import ADMIN_ID, SPLIT_AUTO, SPLIT_AUTO_MB
 from m3u_manager import m3u_manager
+from recorders.channel_prober import channel_prober
+from utils.telegram_gateway import telegram_gateway, REPLY
 
 
 async def send_long_message(client: TelegramClient, chat_id: int, text: str, parse_mode: str = None):
@@ -16,7 +18,7 @@ async def send_long_message(client: TelegramClient, chat_id: int, text: str, par
     max_length = 4096
     for i in range(0, len(text), max_length):
         chunk = text[i:i + max_length]
-        await client.send_message(entity=chat_id, message=chunk, parse_mode=parse_mode)
+        await telegram_gateway.send_message(client, chat_id, message=chunk, parse_mode=parse_mode, priority=REPLY)
 
 def parse_time(time_str: str) -> int:
     """Parses a time string (seconds or HH:MM:SS) and returns seconds."""
@@ -35,7 +37,7 @@ async def handle_instant_record(event: events.NewMessage):
     user_id = event.sender_id
     
     if not await is_admin(user_id, event.chat_id):
-        await event.reply("⚠️ Unauthorized Access", parse_mode="Markdown")
+        await telegram_gateway.reply(event, "⚠️ Unauthorized Access", parse_mode="Markdown")
         return
 
     try:
@@ -48,9 +50,10 @@ async def handle_instant_record(event: events.NewMessage):
         
         parts = shlex.split(event.text)
         if len(parts) < 2:
-            await event.reply(
+            await telegram_gateway.reply(
+                event,
                 "❗ **Usage:**\n"
-                "`/rd <url/id> [duration] [title] [--split <time>]`\n"
+                "`/rd <url/id> [duration] [title] [--split <time|auto>]`\n"
                 "Example: `/rd http://... 10:00 My Recording`",
                 parse_mode="Markdown"
             )
@@ -68,15 +71,21 @@ async def handle_instant_record(event: events.NewMessage):
             split_index = remaining_args.index("--split")
             if split_index + 1 < len(remaining_args):
                 split_duration_str = remaining_args[split_index + 1]
-                try:
-                    split_duration_sec = parse_time(split_duration_str)
-                except ValueError:
-                    await event.reply("Invalid format for --split time. Use seconds or HH:MM:SS.")
-                    return
+                if split_duration_str.lower() == "auto":
+                    if SPLIT_AUTO_MB <= 0:
+                        await telegram_gateway.reply(event, "`--split auto` is disabled (SPLIT_AUTO_MB is 0).")
+                        return
+                    split_duration_sec = SPLIT_AUTO
+                else:
+                    try:
+                        split_duration_sec = parse_time(split_duration_str)
+                    except ValueError:
+                        await telegram_gateway.reply(event, "Invalid format for --split time. Use seconds, HH:MM:SS or auto.")
+                        return
                 # remove --split and its value
                 del remaining_args[split_index:split_index+2]
             else:
-                await event.reply("`--split` requires a time value.")
+                await telegram_gateway.reply(event, "`--split` requires a time value or `auto`.")
                 return
 
         # The first remaining arg could be duration or part of the title.
@@ -99,7 +108,8 @@ async def handle_instant_record(event: events.NewMessage):
             duration_sec = parse_time(duration_str)
             duration_display = str(timedelta(seconds=duration_sec))
         except (ValueError, TypeError):
-            await event.reply(
+            await telegram_gateway.reply(
+                event,
                 "❌ **Invalid duration format!**\n"
                 "Valid formats: 10, 00:10, 00:00:10",
                 parse_mode="Markdown"
@@ -137,7 +147,8 @@ async def handle_instant_record(event: events.NewMessage):
                     )
                     await send_long_message(event.client, chat_id, response, parse_mode="Markdown")
                 else:
-                    await event.reply(
+                    await telegram_gateway.reply(
+                        event,
                         f"❌ Channel not found: {identifier}\n"
                         "Use /find to search channels",
                         parse_mode="Markdown"
@@ -179,7 +190,8 @@ async def handle_find_channel(event: events.NewMessage):
         args = event.text.split()[1:] # Get arguments after the command
 
         if not args:
-            await event.reply(
+            await telegram_gateway.reply(
+                event,
                 "❗ **Usage:**\n"
                 "`/find <channel_name> [.p1|.p2|...]`\n"
                 "Example: `/find dd news .p1`",
@@ -223,7 +235,8 @@ async def handle_find_channel(event: events.NewMessage):
         results = {**exact_results, **partial_results}
 
         if not results:
-            await event.reply(
+            await telegram_gateway.reply(
+                event,
                 "❌ No channels found matching your search",
                 parse_mode="Markdown"
             )
@@ -235,8 +248,9 @@ async def handle_find_channel(event: events.NewMessage):
             playlist_id = info['playlist']
             if playlist_id not in grouped_results:
                 grouped_results[playlist_id] = []
+            badge = channel_prober.badge(info['url']) if channel_prober else ""
             grouped_results[playlist_id].append(
-                f"{info['name']} (ID: {info['original_id']})"
+                f"{info['name']} (ID: {info['original_id']})" + (f" {badge}" if badge else "")
             )
 
         # Send results with pagination (max 10 items per message)
@@ -246,19 +260,21 @@ async def handle_find_channel(event: events.NewMessage):
             
             for i, channel in enumerate(channels, 1):
                 if i % 10 == 0:  # Send every 10 channels
-                    await event.client.send_message(
-                        entity=event.chat_id,
+                    await telegram_gateway.send_message(
+                        event.client, event.chat_id,
                         message=message,
-                        parse_mode="Markdown"
+                        parse_mode="Markdown",
+                        priority=REPLY
                     )
                     message = header
                 message += f"{channel}\n"
             
             if message != header:  # Send remaining channels
-                await event.client.send_message(
-                    entity=event.chat_id,
+                await telegram_gateway.send_message(
+                    event.client, event.chat_id,
                     message=message,
-                    parse_mode="Markdown"
+                    parse_mode="Markdown",
+                    priority=REPLY
                 )
 
     except Exception as e:
@@ -276,5 +292,5 @@ async def show_help(event: events.NewMessage):
         "`30` (seconds)\n`1:30` (minutes:seconds)\n`1:00:00` (hours:minutes:seconds)\n\n"
         "🔍 Search channels with `/find name`"
     )
-    await event.reply(help_text, parse_mode="Markdown")
+    await telegram_gateway.reply(event, help_text, parse_mode="Markdown")
 
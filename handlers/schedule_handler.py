@@ -6,6 +6,7 @@ from utils.admin_checker import is_admin
 from scheduler import schedule_recording
 from utils.logging import log_to_channel
 from config import ADMIN_ID
+from utils.telegram_gateway import telegram_gateway
 
 async def handle_schedule(event: events.NewMessage):
     # Ensure the command is actually /schedule or /s
@@ -17,7 +18,8 @@ async def handle_schedule(event: events.NewMessage):
     
     # Check if the user is a permanent or temporary admin
     if not await is_admin(user_id, event.chat_id):
-        await event.reply(
+        await telegram_gateway.reply(
+            event,
             "⚠️ **Unauthorized Access**\n\n"
             "You do not have permission to use this bot.\n"
             "Please request admin access using the /start command.",
@@ -29,7 +31,8 @@ async def handle_schedule(event: events.NewMessage):
     try:
         parts = shlex.split(event.text)
         if len(parts) < 7:
-            await event.reply(
+            await telegram_gateway.reply(
+                event,
                 "❗ **Invalid Format!**\n\n"
                 "Use this format:\n"
                 "`/schedule \"url\" DD-MM-YYYY HH:MM:SS duration channel title`",
@@ -48,13 +51,15 @@ async def handle_schedule(event: events.NewMessage):
         try:
             datetime.strptime(start_time_str, "%d-%m-%Y %H:%M:%S")
         except ValueError:
-            await event.reply(
+            await telegram_gateway.reply(
+                event,
                 "❌ **Invalid date/time format!**\nUse `DD-MM-YYYY HH:MM:SS`",
                 parse_mode="Markdown"
             )
             return
 
-        await event.reply(
+        await telegram_gateway.reply(
+            event,
             f"**Recording Scheduled Successfully!**\n\n"
             f"**Title:** `{title}`\n"
             f"**Channel:** `{channel}`\n"
@@ -66,7 +71,7 @@ async def handle_schedule(event: events.NewMessage):
         username = event.sender.username or "Unknown"
         await log_to_channel(event.client, user_id, username, event.text, start_time_str, title)
         
-        await schedule_recording(event.client, url, start_time_str, duration, channel, title, event.chat_id, event.message.id)
+        await schedule_recording(event.client, url, start_time_str, duration, channel, title, event.chat_id, user_id, event.message.id)
 
     except Exception as e:
-        await event.reply(f"❌ Error: `{str(e)}`", parse_mode="Markdown")
+        await telegram_gateway.reply(event, f"❌ Error: `{str(e)}`", parse_mode="Markdown")
@@ -1,6 +1,7 @@
 import random
 from telethon import events
 from telethon.tl.custom import Button
+from utils.telegram_gateway import telegram_gateway
 
 async def start(event: events.NewMessage):
     user = await event.get_sender()
@@ -21,7 +22,8 @@ async def start(event: events.NewMessage):
         for image_file in image_files:
             try:
                 # Telethon's event.reply can send files directly
-                await event.reply(
+                await telegram_gateway.reply(
+                    event,
                     file=image_file,
                     message=welcome_text,
                     buttons=keyboard
@@ -36,7 +38,8 @@ async def start(event: events.NewMessage):
         
         # Fallback to text if no images worked
         if not sent:
-            await event.reply(
+            await telegram_gateway.reply(
+                event,
                 message=welcome_text,
                 buttons=keyboard
             )
@@ -44,7 +47,8 @@ async def start(event: events.NewMessage):
     except Exception as e:
         print(f"Error in start handler: {e}")
         # Final fallback
-        await event.reply(
+        await telegram_gateway.reply(
+            event,
             message=welcome_text,
             buttons=keyboard
         )
@@ -3,6 +3,7 @@ import re
 import os
 import time
 import json
+import asyncio
 import logging
 from typing import Dict, Optional, List
 import hashlib
@@ -13,12 +14,19 @@ logger = logging.getLogger(__name__)
 
 CACHE_DIR = "playlist_cache"
 CACHE_EXPIRY = 3600  # 1 hour in seconds
+REFRESH_REUSE_SECONDS = 15  # Restarts of several recordings share one re-fetch of their playlist
 
 class M3UManager:
     def __init__(self, playlist_urls: List[str]):
         self.playlists = {}
         self.channels = {}
         self.url_to_source = {}
+        # Same channel in several playlists, grouped by tvg-id and by name
+        self.mirrors_by_id: Dict[str, Dict[str, dict]] = {}
+        self.mirrors_by_name: Dict[str, Dict[str, dict]] = {}
+        # One refresh per playlist at a time, and when it last happened
+        self._refresh_locks: Dict[str, asyncio.Lock] = {}
+        self._refreshed_at: Dict[str, float] = {}
         
         os.makedirs(CACHE_DIR, exist_ok=True)
         
@@ -53,6 +61,20 @@ class M3UManager:
         except IOError as e:
             logger.error(f"Failed to write to cache for {url}: {e}")
 
+    def _write_cache(self, url: str, payload: str):
+        """Writes an already serialised cache entry (so it can run off the event loop)."""
+        try:
+            with open(self._get_cache_path(url), 'w') as f:
+                f.write(payload)
+        except IOError as e:
+            logger.error(f"Failed to write to cache for {url}: {e}")
+
+    @staticmethod
+    def _fetch(url: str) -> str:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        return response.text
+
     def add_playlist(self, playlist_url: str, playlist_num: int):
         playlist_id = f"p{playlist_num}"
         
@@ -80,6 +102,42 @@ class M3UManager:
         except requests.exceptions.RequestException as e:
             logger.error(f"Error loading playlist {playlist_url}: {e}")
 
+    async def refresh_channel_url(self, url: str) -> Optional[str]:
+        """
+        Re-fetches the playlist a channel URL came from, bypassing the cache,
+        and returns that channel's current URL (e.g. with a renewed token).
+
+        Only the download runs in a worker thread: the channel tables are read
+        by the prober and by searches on the event loop, so the playlist is
+        parsed and merged there. Refreshes of one playlist are serialised, and
+        one that just finished is reused instead of fetched again.
+        """
+        playlist_id = self.url_to_source.get(url)
+        playlist = self.playlists.get(playlist_id) if playlist_id else None
+        if not playlist:
+            return None
+
+        channel_key = next((cid for cid, info in playlist['channels'].items() if info['url'] == url), None)
+        if channel_key is None:
+            return None
+
+        async with self._refresh_locks.setdefault(playlist_id, asyncio.Lock()):
+            if time.time() - self._refreshed_at.get(playlist_id, 0) >= REFRESH_REUSE_SECONDS:
+                try:
+                    text = await asyncio.to_thread(self._fetch, playlist['url'])
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"Error refreshing playlist {playlist['url']}: {e}")
+                    return None
+                self._parse_and_add_channels(text, playlist_id)
+                self._refreshed_at[playlist_id] = time.time()
+                payload = json.dumps({'timestamp': time.time(), 'data': self.playlists[playlist_id]})
+                await asyncio.to_thread(self._write_cache, playlist['url'], payload)
+
+        fresh = self.playlists[playlist_id]['channels'].get(channel_key)
+        if fresh and fresh['url'] != url:
+            logger.info(f"Channel {fresh['name']} has a new stream URL")
+        return fresh['url'] if fresh else None
+
     def _parse_and_add_channels(self, playlist_text: str, playlist_id: str):
         channel_info = {}
         for line in playlist_text.splitlines():
@@ -114,6 +172,9 @@ class M3UManager:
                 self.channels[info['original_id']] = info
             self.channels[info['name'].lower()] = info
             self.url_to_source[info['url']] = playlist_id
+            if info.get('original_id'):
+                self.mirrors_by_id.setdefault(info['original_id'].lower(), {})[combined_id] = info
+            self.mirrors_by_name.setdefault(info['name'].lower(), {})[combined_id] = info
             
     def _clean_channel_id(self, channel_id: str) -> str:
         if not channel_id:
@@ -152,21 +213,47 @@ class M3UManager:
                         results[channel_id] = info
         return results
 
+    def mirrors(self, info: dict) -> List[dict]:
+        """Every playlist's entry for the same channel as `info` (matched by tvg-id or name), `info` first"""
+        found = {(info['playlist'], info['url']): info}
+        groups = [self.mirrors_by_name.get(info['name'].lower(), {})]
+        if info.get('original_id'):
+            groups.insert(0, self.mirrors_by_id.get(info['original_id'].lower(), {}))
+        for group in groups:
+            for mirror in group.values():
+                found.setdefault((mirror['playlist'], mirror['url']), mirror)
+        return list(found.values())
+
+    def _healthiest(self, info: dict) -> dict:
+        """Swaps `info` for the healthiest, fastest mirror the channel prober knows of"""
+        from recorders.channel_prober import channel_prober
+        if channel_prober is None:
+            return info
+        mirrors = self.mirrors(info)
+        if len(mirrors) < 2:
+            return info
+        best = channel_prober.rank(mirrors)[0]
+        if best is not info:
+            logger.info(f"Using {best['playlist']} mirror of {info['name']} ({channel_prober.badge(best['url'])})")
+        return best
+
     def get_channel_info(self, identifier: str) -> Optional[dict]:
         """Get complete channel info by ID, name, or partial match"""
         identifier = identifier.lower()
         
         # Try exact match first
         if identifier in self.channels:
-            return self.channels[identifier]
+            info = self.channels[identifier]
+            # A playlist-qualified id ("p2:...") asks for that exact entry
+            return info if ':' in identifier else self._healthiest(info)
         
         # Try partial ID match
         for channel_id, info in self.channels.items():
             if isinstance(channel_id, str) and ':' in channel_id:
                 if identifier in info['original_id'].lower():
-                    return info
+                    return self._healthiest(info)
                 if identifier in info['name'].lower():
-                    return info
+                    return self._healthiest(info)
         
         return None
 
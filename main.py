@@ -42,7 +42,9 @@ async def main():
         logger.info("Initializing bot...")
         
         # Initialize Telethon client (same as old working code)
-        client = TelegramClient(StringSession(SESSION_STRING), API_ID, API_HASH)
+        # flood_sleep_threshold=0: FloodWaits reach the gateway (which blocks the chat and drops stale
+        # progress edits) and the dashboard (which backs off) instead of stalling inside the call
+        client = TelegramClient(StringSession(SESSION_STRING), API_ID, API_HASH, flood_sleep_threshold=0)
         await client.start(bot_token=BOT_TOKEN)
 
         # Initialize uploader's own user session client
@@ -51,9 +53,44 @@ async def main():
         
         logger.info("Bot is running. Press Ctrl+C to stop.")
         
-        # Register handlers
-        from handler import register_handlers
-        register_handlers(client) # Pass the Telethon client to register handlers
+        from cluster import is_frontend, is_node, run_node, watch_frontend_jobs
+        if is_node():
+            # Recorder node: no commands, just claim jobs from the shared queue
+            logger.info("Running as a cluster recorder node")
+            asyncio.create_task(run_node(client))
+        else:
+            # Register handlers
+            from handler import register_handlers
+            register_handlers(client) # Pass the Telethon client to register handlers
+
+            # Health-check playlist channels so /rec picks a working mirror
+            from recorders.channel_prober import channel_prober
+            if channel_prober:
+                from m3u_manager import m3u_manager
+                channel_prober.start(m3u_manager)
+
+        if is_frontend():
+            # Recorder nodes own the jobs; only track them for /cancel and /status
+            asyncio.create_task(watch_frontend_jobs())
+        elif not is_node():
+            # Re-arm schedules and resume recordings interrupted by the last shutdown
+            from scheduler import recover_jobs
+            asyncio.create_task(recover_jobs(client))
+
+            # Rolling buffers of opted-in channels for /clip
+            from config import TIMESHIFT_CHANNELS
+            if TIMESHIFT_CHANNELS:
+                from m3u_manager import m3u_manager
+                from recorders.timeshift import timeshift
+                channels = []
+                for identifier in TIMESHIFT_CHANNELS:
+                    info = m3u_manager.get_channel_info(identifier)
+                    if info:
+                        channels.append(info)
+                    else:
+                        logger.warning(f"Time-shift channel not found in playlists: {identifier}")
+
+                timeshift.start(channels, m3u_manager.refresh_channel_url)
         
         # Run until disconnected
         await client.run_until_disconnected()
@@ -63,6 +100,21 @@ async def main():
     except Exception as e:
         logger.error(f"Fatal error: {e}") # Telethon handles markdown automatically
     finally:
+        # Recordings first, while their captures and uploads still work, so they're kept for resuming
+        from scheduler import interrupt_recordings
+        await interrupt_recordings()
+        from recorders.timeshift import timeshift
+        await timeshift.stop()
+        from recorders.channel_prober import channel_prober
+        if channel_prober:
+            await channel_prober.stop()
+        from uploader import upload_manager
+        await upload_manager.close()
+        from recorders.worker_pool import worker_pool
+        if worker_pool:
+            await worker_pool.close()
+        from recorders.recorder_utils import close_http_session
+        await close_http_session()
         logger.info("Clean shutdown complete")
 
 if __name__ == "__main__":
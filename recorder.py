@@ -3,32 +3,51 @@ import subprocess
 import asyncio
 import time
 import glob
+import shutil
+import contextlib
 from datetime import datetime, timedelta
 from pytz import timezone
 import aiohttp
 from typing import Optional, Dict
-from config import RECORDINGS_DIR, BOT_TOKEN, STORE_CHANNEL_ID
-from utils.utils import format_bytes, format_duration
-from uploader import send_video
+from config import RECORDINGS_DIR, BOT_TOKEN, STORE_CHANNEL_ID, PIPELINE_UPLOADS, TAIL_UPLOADS, SPLIT_AUTO, SPLIT_AUTO_MB, STALL_TIMEOUT_SECONDS, RECORDER_ENGINE, HLS_PREFETCH, HLS_SEGMENT_RETRIES, SHARED_INGEST, CAPTURE_MAX_RESTARTS, CAPTURE_RESTART_DELAY, SCHEDULE_PREROLL_SECONDS
+from utils.utils import format_bytes, format_duration, wait_until
+from uploader import send_video, upload_manager
 from telethon.sync import TelegramClient
 from telethon import events, Button
 from telethon.errors.rpcerrorlist import FloodWaitError
-from recorders.recorder_utils import resolve_stream, get_stream_quality, get_video_duration
-from features.status_broadcast import add_active_recording, remove_active_recording
+from recorders.recorder_utils import resolve_stream, get_stream_quality, get_video_duration, get_http_session
+from recorders.hls_engine import HLSError, fetch_playlist
+from recorders.segment_pipeline import watch_segments
+from recorders.keyframe_index import KeyframeIndex, is_index_file, move_index, remove_index, clip
+from recorders.capture import piece_base
+from recorders.post_process import post_process_pool
+from recorders.worker_pool import create_capture
+from m3u_manager import m3u_manager
+from utils.job_journal import job_journal
+from features.status_broadcast import add_active_recording, update_active_recording, remove_active_recording
+from features.live_dashboard import live_dashboard
+from utils.telegram_gateway import telegram_gateway, REPLY, NOTICE, PROGRESS
 import re
 
-from captions import create_progress_bar, seconds_to_hms, caption_recording_started, caption_recording_progress, caption_recording_completed
+from captions import create_progress_bar, seconds_to_hms, caption_recording_started, caption_recording_progress, caption_recording_completed, caption_recording_queued, dashboard_recording_line
 
-async def start_recording(telethon_client: TelegramClient, url: str, duration: str, channel: str, title: str, chat_id: int, message_id: int, scheduled_jobs: Dict[int, Dict[str, any]], split_duration_sec: int = None):
+async def start_recording(telethon_client: TelegramClient, url: str, duration: str, channel: str, title: str, chat_id: int, message_id: int, scheduled_jobs: Dict[int, Dict[str, any]], split_duration_sec: int = None, admission=None, user_id: int = None, start_at: Optional[float] = None):
     recording_message = None
     last_caption = ""
     process = None
-    start_ts = time.time()
-    error_occurred = False
+    # A pre-warmed scheduled job is called before its start time; its clock starts at the target
+    start_ts = max(start_at or 0, time.time())
+    lead_in = 0.0
+    progress_task = None
+    delivery_task = None
+    tail_task = None
+    recording_id = None
+    job_id = message_id or id(asyncio.current_task())
+    interrupted = False
     
     try:
         ist = timezone("Asia/Kolkata")
-        now = datetime.now(ist)
+        now = datetime.fromtimestamp(start_ts, ist)
 
         try:
             if ":" in duration:
@@ -37,7 +56,7 @@ async def start_recording(telethon_client: TelegramClient, url: str, duration: s
             else:
                 total_seconds = int(duration)
         except ValueError:
-            await telethon_client.send_message(chat_id, "⚠️ Invalid duration format. Use HH:MM:SS.")
+            await telegram_gateway.send_message(telethon_client, chat_id, "⚠️ Invalid duration format. Use HH:MM:SS.", priority=REPLY)
             return
         
         is_unlimited = total_seconds == 0
@@ -50,101 +69,126 @@ async def start_recording(telethon_client: TelegramClient, url: str, duration: s
         
         try:
             buttons = [Button.inline("❌ Cancel", data=f"cancel_recording_{message_id}")]
-            recording_message = await telethon_client.send_message(
-                entity=chat_id,
+            recording_message = await telegram_gateway.send_message(
+                telethon_client, chat_id,
                 message=initial_caption,
                 parse_mode="Markdown",
                 reply_to=message_id,
-                buttons=buttons
+                buttons=buttons,
+                priority=REPLY
             )
         except Exception as e:
             print(f"[Recorder] [ERROR] Error sending recording notification: {e}")
-            recording_message = await telethon_client.send_message(
-                entity=chat_id,
+            recording_message = await telegram_gateway.send_message(
+                telethon_client, chat_id,
                 message=initial_caption,
                 parse_mode="Markdown",
-                reply_to=message_id
+                reply_to=message_id,
+                priority=REPLY
             )
 
         # Register status_msg_id so cancel button can edit this message
         if message_id in scheduled_jobs:
             scheduled_jobs[message_id]['status_msg_id'] = recording_message.id
+        job_journal.transition(chat_id, message_id, 'queued')
 
-        async def update_caption(caption_text, buttons=None):
+        async def update_caption(caption_text, buttons=None, priority=NOTICE):
             nonlocal last_caption
             if caption_text != last_caption:
                 try:
-                    await telethon_client.edit_message(
-                        entity=chat_id,
-                        message=recording_message.id,
+                    await telegram_gateway.edit_message(
+                        telethon_client, chat_id, recording_message.id,
                         text=caption_text,
                         parse_mode="Markdown",
-                        buttons=buttons
+                        buttons=buttons,
+                        priority=priority
                     )
                     last_caption = caption_text
                 except FloodWaitError as fwe:
+                    # Progress edits are dropped on FloodWait; the next one carries newer numbers anyway
                     print(f"[Recorder] [WARNING] FloodWaitError while updating caption: {fwe}")
-                    await asyncio.sleep(fwe.seconds)
                 except Exception as e:
                     print(f"[Recorder] [ERROR] Error updating caption: {e}")
 
         async def update_progress_bar():
-            nonlocal last_caption, process, start_ts, error_occurred
-            last_update_time = start_ts
+            """Drives the status caption (or the chat dashboard) and ACTIVE_RECORDINGS stats from ffmpeg's -progress feed."""
+            last_update_time = 0
+            was_stalled = False
+            buttons = [Button.inline("❌ Cancel", data=f"cancel_recording_{message_id}")]
+
+            while True:
+                await asyncio.sleep(1)
+                if process is None or process.returncode is not None:
+                    continue
+
+                stats = telemetry.snapshot()
+                if lead_in:
+                    # The pre-roll before the scheduled start gets trimmed, so don't count it
+                    stats['out_time'] = max(0.0, stats['out_time'] - lead_in)
+                if recording_id:
+                    update_active_recording(recording_id, stats)
+                if admission:
+                    admission.update_progress(job_id, stats)
+
+                stalled = stats['stalled']
+                if stalled and not was_stalled:
+                    print(f"[Recorder] [WARNING] {title} stalled: no new data for {stats['stalled_for']}s (speed {stats['speed']}x)")
+                elif was_stalled and not stalled:
+                    print(f"[Recorder] [INFO] {title} recovered from stall")
+
+                if live_dashboard:
+                    # Only marks the chat's board dirty; it renders on its own cadence
+                    live_dashboard.update(
+                        telethon_client, chat_id, job_id,
+                        dashboard_recording_line(title, channel, total_seconds, stats['out_time'], stats),
+                        cancel_label=title if message_id else None
+                    )
 
-            while time.time() < end_ts:
                 current_time = time.time()
-                elapsed = current_time - start_ts
-                
-                if not is_unlimited:
-                    time_left = max(0, end_ts - current_time)
-                    if current_time - last_update_time >= 10:
-                        progress = min(elapsed / total_seconds, 1)
-                        print(f"[Recorder] [INFO] Recording {title} - {seconds_to_hms(elapsed)} / {seconds_to_hms(total_seconds)} ({progress:.1%})")
+                if stalled != was_stalled or current_time - last_update_time >= 10:
+                    # Media time actually captured, not wall-clock time since start
+                    elapsed = stats['out_time']
+                    time_left = max(0, total_seconds - elapsed) if not is_unlimited else 0
+                    if not is_unlimited:
+                        print(f"[Recorder] [INFO] Recording {title} - {seconds_to_hms(elapsed)} / {seconds_to_hms(total_seconds)} ({min(elapsed / total_seconds, 1):.1%}) @ {stats['speed']}x")
+                    if not live_dashboard:
                         caption_text = caption_recording_progress(
                             title, channel, total_seconds, start_time_str,
-                            elapsed, time_left
-                        )
-                        buttons = [Button.inline("❌ Cancel", data=f"cancel_recording_{message_id}")]
-                        await update_caption(caption_text, buttons)
-                        last_update_time = current_time
-                else: # Unlimited recording
-                    if current_time - last_update_time >= 10:
-                        caption_text = caption_recording_progress(
-                            title, channel, 0, start_time_str, elapsed, 0
+                            elapsed, time_left, stats=stats
                         )
-                        buttons = [Button.inline("❌ Cancel", data=f"cancel_recording_{message_id}")]
-                        await update_caption(caption_text, buttons)
-                        last_update_time = current_time
-
-                await asyncio.sleep(10)
-
-                if process and process.returncode is not None and process.returncode != 0:
-                    if not error_occurred:
-                        stderr = await process.stderr.read() if process.stderr else b'Unknown error'
-                        error_msg = stderr.decode().strip()[:100]
-                        if not is_unlimited:
-                            caption_text = caption_recording_progress(
-                                title, channel, total_seconds, start_time_str,
-                                elapsed, time_left, error_msg
-                            )
-                            await update_caption(caption_text)
-                        error_occurred = True
-                    return
-
-            if not is_unlimited:
-                final_caption = caption_recording_completed(title, channel, total_seconds, start_time_str)
-                await update_caption(final_caption)
-            
-            if process and process.returncode is None:
-                await process.wait()
+                        await update_caption(caption_text, buttons, priority=PROGRESS)
+                    last_update_time = current_time
+                was_stalled = stalled
+
+        if admission:
+            async def show_queue_position(position, queue_length):
+                cancel_buttons = [Button.inline("❌ Cancel", data=f"cancel_recording_{message_id}")]
+                await update_caption(caption_recording_queued(title, channel, total_seconds, position, queue_length), cancel_buttons)
+
+            await admission.admit(job_id, user_id or chat_id, url, total_seconds, on_wait=show_queue_position,
+                                  placeholder_path=os.path.join(RECORDINGS_DIR, f"temp_reserve_{job_id}"))
+            if last_caption != initial_caption:
+                # Waited in the queue: the recording really starts now
+                start_ts = max(start_at or 0, time.time())
+                now = datetime.fromtimestamp(start_ts, ist)
+                end_ts = start_ts + total_seconds if not is_unlimited else float('inf')
+                end_time = now + timedelta(seconds=total_seconds) if not is_unlimited else None
+                start_time_str = now.strftime("%d-%m-%Y %H:%M:%S")
+                await update_caption(caption_recording_started(title, channel, total_seconds, start_time_str),
+                                     [Button.inline("❌ Cancel", data=f"cancel_recording_{message_id}")])
 
         progress_task = asyncio.create_task(update_progress_bar())
 
         base_temp_filename = f"temp_recording_{now.timestamp()}"
-        temp_filename_pattern = f"{base_temp_filename}_%03d.mkv"
-        temp_path_for_split = os.path.join(RECORDINGS_DIR, temp_filename_pattern)
-        temp_path_single = os.path.join(RECORDINGS_DIR, f"{base_temp_filename}.mkv")
+        base_temp_path = os.path.join(RECORDINGS_DIR, base_temp_filename)
+        temp_path_single = None
+        segment_list_path = f"{base_temp_path}.segments.csv"
+        segment_glob = f"{base_temp_path}_[0-9]*"
+        pipelined = bool(split_duration_sec) and PIPELINE_UPLOADS
+        tail_following = not split_duration_sec and TAIL_UPLOADS
+        # `--split auto` cuts by size alone; timed splits also roll over early on a high-bitrate channel
+        split_seconds = split_duration_sec if split_duration_sec != SPLIT_AUTO else None
+        split_bytes = SPLIT_AUTO_MB * 1024 * 1024 if split_duration_sec and SPLIT_AUTO_MB > 0 else None
         
         os.makedirs(RECORDINGS_DIR, exist_ok=True)
 
@@ -156,73 +200,89 @@ async def start_recording(telethon_client: TelegramClient, url: str, duration: s
             'user_id': chat_id
         })
 
-        cmd = [
-            "ffmpeg", "-y", "-loglevel", "fatal",
-            "-headers", f"User-Agent: Mozilla/5.0\r\nReferer: https://www.tataplay.com/\r\nOrigin: https://www.tataplay.com",
-            "-i", stream_url,
-        ]
+        async def re_resolve_stream() -> str:
+            """Fresh URL for a restart: the playlist entry may carry a new token by now."""
+            fresh_url = await m3u_manager.refresh_channel_url(url) or url
+            return await resolve_stream(fresh_url, fresh=True)
 
-        if not is_unlimited:
-            cmd.extend(["-t", str(total_seconds)])
-
-        if split_duration_sec:
-            cmd.extend([
-                "-f", "segment",
-                "-segment_time", str(split_duration_sec),
-                "-reset_timestamps", "1",
-                "-c", "copy",
-                "-map", "0",
-                temp_path_for_split
-            ])
-        else:
-            cmd.extend([
-                "-map", "0:v?", "-map", "0:a?", "-map", "0:s?",
-                "-c", "copy",
-                temp_path_single
-            ])
+        if start_at and start_at - SCHEDULE_PREROLL_SECONDS > time.time():
+            # Woken early: make sure the stream answers (renewing its URL if not) before the target
+            try:
+                await fetch_playlist(get_http_session(), stream_url, timeout=10)
+            except HLSError:
+                pass  # Direct (non-HLS) stream, nothing to check up front
+            except Exception as e:
+                print(f"[Recorder] [WARNING] {title}: stream not answering before the scheduled start ({e}), re-resolving")
+                stream_url = await re_resolve_stream()
+            await wait_until(start_at - SCHEDULE_PREROLL_SECONDS)
+        if start_at:
+            lead_in = max(0.0, start_at - time.time())
+        capture_seconds = total_seconds + lead_in if total_seconds else 0
+
+        process = create_capture(
+            stream_url, base_temp_path, capture_seconds, re_resolve_stream,
+            engine=RECORDER_ENGINE, split_duration=split_seconds, split_bytes=split_bytes,
+            segment_list_path=segment_list_path if pipelined else None,
+            max_restarts=CAPTURE_MAX_RESTARTS, restart_delay=CAPTURE_RESTART_DELAY,
+            stall_timeout=STALL_TIMEOUT_SECONDS, shared=SHARED_INGEST,
+            prefetch=HLS_PREFETCH, retries=HLS_SEGMENT_RETRIES, stream_safe=tail_following
+        )
+        telemetry = process.telemetry
+        await process.start()
+        job_journal.transition(chat_id, message_id, 'recording', started_at=time.time(), temp_base=base_temp_path)
 
-        process = await asyncio.create_subprocess_exec(*cmd)
         if message_id in scheduled_jobs:
             scheduled_jobs[message_id]['process'] = process
 
-        return_code = await process.wait()
-        progress_task.cancel()
-        try:
-            await progress_task
-        except asyncio.CancelledError:
-            pass
-
-        if return_code != 0 and return_code != -15:
-            if not error_occurred:
-                error_msg = "❌ Recording failed (FFmpeg error)"
-                if not is_unlimited:
-                    caption_text = caption_recording_progress(
-                        title, channel, total_seconds, start_time_str,
-                        time.time() - start_ts, end_ts - time.time() if not is_unlimited else 0,
-                        error_msg
-                    )
-                    await update_caption(caption_text)
-            if split_duration_sec:
-                for f in glob.glob(os.path.join(RECORDINGS_DIR, f"{base_temp_filename}_*.mkv")):
-                    os.remove(f)
-            elif os.path.exists(temp_path_single):
-                os.remove(temp_path_single)
-            return
-
         sanitized_title = re.sub(r'[<>:"/\\|?*]', '_', title)
         sanitized_channel = re.sub(r'[<>:"/\\|?*]', '_', channel)
         time_format = "%H-%M-%S"
+        delivery_message = None
+        trim_pending = lead_in
+
+        def new_part(file_path: str, number: int, label: str,
+                     uploaded: Optional[Dict[str, any]] = None) -> Dict[str, any]:
+            """One recording file to deliver; the first one claims the pre-roll trim."""
+            nonlocal trim_pending
+            trim, trim_pending = trim_pending, 0.0
+            return {'file_path': file_path, 'number': number, 'label': label, 'trim': trim, 'uploaded': uploaded}
+
+        async def prepare_part(part: Dict[str, any]) -> Dict[str, any]:
+            """Trims, thumbnails and probes one finished recording file, still under its temp name."""
+            file_path = part['file_path']
+            if part['trim']:
+                # Capture began before the scheduled start: drop the pre-roll up to the keyframe before it
+                trimmed_path = f"{base_temp_path}.trim{os.path.splitext(file_path)[1]}"
+                try:
+                    await clip(file_path, part['trim'], None, trimmed_path)
+                    os.replace(trimmed_path, file_path)
+                    await asyncio.to_thread(move_index, trimmed_path, file_path)
+                except Exception as e:
+                    print(f"[Recorder] [WARNING] Could not trim {part['trim']:.1f}s pre-roll of {title}: {e}")
+                    if os.path.exists(trimmed_path):
+                        os.remove(trimmed_path)
+                    remove_index(trimmed_path)
 
-        files_to_upload = []
-        if split_duration_sec:
-            files_to_upload = sorted(glob.glob(os.path.join(RECORDINGS_DIR, f"{base_temp_filename}_*.mkv")))
-        elif os.path.exists(temp_path_single):
-            files_to_upload.append(temp_path_single)
+            # Kept next to the temp files (outside the segment glob) until the part is sent
+            thumbnail_path = f"{base_temp_path}.thumb{part['number']}.jpg"
+            thumbnail_cmd = [
+                "ffmpeg", "-y", "-loglevel", "error", "-i", file_path,
+                "-ss", "00:00:01", "-vframes", "1", "-q:v", "2", "-vf", "scale=320:-1",
+                thumbnail_path
+            ]
+            await (await asyncio.create_subprocess_exec(*thumbnail_cmd)).wait()
 
-        for i, file_path in enumerate(files_to_upload):
-            part_num = f" part {i+1}" if len(files_to_upload) > 1 else ""
-            final_filename = f"{sanitized_title}{part_num}.{sanitized_channel}.{now.strftime(time_format)}-{end_time.strftime(time_format) if not is_unlimited else 'UNLIMITED'}.{now.strftime('%d-%m-%Y')}.{int(now.timestamp())}.IPTV.WEB-DL.@Krinry.mkv"
+            actual_duration = await get_video_duration(file_path)
+            if actual_duration is None:
+                actual_duration = split_seconds if split_seconds else total_seconds
+            return {**part, 'thumbnail': thumbnail_path, 'duration': actual_duration}
+
+        async def upload_part(part: Dict[str, any], status_msg_id: int):
+            """Renames one prepared recording file and uploads it (unless `uploaded` live already)."""
+            file_path = part['file_path']
+            final_filename = f"{sanitized_title}{part['label']}.{sanitized_channel}.{now.strftime(time_format)}-{end_time.strftime(time_format) if not is_unlimited else 'UNLIMITED'}.{now.strftime('%d-%m-%Y')}.{int(now.timestamp())}.IPTV.WEB-DL.@Krinry{os.path.splitext(file_path)[1]}"
             output_path = os.path.join(RECORDINGS_DIR, final_filename)
+            thumbnail_path = part['thumbnail']
             
             # Remove target file if it already exists
             if os.path.exists(output_path):
@@ -232,36 +292,43 @@ async def start_recording(telethon_client: TelegramClient, url: str, duration: s
                     print(f"[Recorder] [WARNING] Could not remove existing file: {e}")
             
             # Use shutil.move instead of os.rename for cross-filesystem support (needed for Termux/Android)
-            import shutil
-            shutil.move(file_path, output_path)
+            await asyncio.to_thread(shutil.move, file_path, output_path)
+            # The keyframe index stays next to its recording for lossless clipping
+            await asyncio.to_thread(move_index, file_path, output_path)
+            job_journal.set_current_file(chat_id, message_id, output_path)
 
-            thumbnail_path = os.path.join(RECORDINGS_DIR, f"{final_filename}.jpg")
-            thumbnail_cmd = [
-                "ffmpeg", "-y", "-loglevel", "error", "-i", output_path,
-                "-ss", "00:00:01", "-vframes", "1", "-q:v", "2", "-vf", "scale=320:-1",
-                thumbnail_path
-            ]
-            await (await asyncio.create_subprocess_exec(*thumbnail_cmd)).wait()
-
-            actual_duration = await get_video_duration(output_path)
-            if actual_duration is None:
-                actual_duration = split_duration_sec if split_duration_sec else total_seconds
+            uploaded = part['uploaded']
+            if uploaded and uploaded['size'] != os.path.getsize(output_path):
+                print(f"[Recorder] [WARNING] {title}: live upload doesn't match the final file, uploading it again")
+                uploaded = None
 
+            actual_duration = part['duration']
             readable_duration = seconds_to_hms(actual_duration)
             readable_size = await format_bytes(os.path.getsize(output_path))
 
             caption = f"`📁 Filename: {final_filename}\n⏱ Duration: {readable_duration}\n💾 File-Size: {readable_size}`\n☎️ @krinry"
+            if process.gaps:
+                lost = sum(gap['seconds'] for gap in process.gaps)
+                caption += f"\n⚠️ Stream dropped {len(process.gaps)}x, ~{seconds_to_hms(lost)} missing"
+            if process.downshifts:
+                caption += "\n📉 Switched to a lower quality to keep up with the stream"
+            if process.truncated:
+                caption += "\n⚠️ Stream could not be recovered, recording ended early"
 
             max_retries = 3
             for attempt in range(max_retries):
                 try:
                     # Uploader uploads to store channel AND forwards to user automatically
-                    # bot_client + status_msg_id = uploader edits the SAME recording message
-                    new_message_id = await send_video(
-                        output_path, caption, thumbnail=thumbnail_path, duration=int(actual_duration),
-                        chat_id=chat_id, user_msg_id=message_id,
-                        bot_client=telethon_client, status_msg_id=recording_message.id
-                    )
+                    # bot_client + status_msg_id = uploader edits the given status message
+                    async with (admission.upload_slot() if admission else contextlib.nullcontext()):
+                        new_message_id = await send_video(
+                            output_path, caption, thumbnail=thumbnail_path, duration=int(actual_duration),
+                            chat_id=chat_id, user_msg_id=message_id,
+                            bot_client=telethon_client, status_msg_id=status_msg_id,
+                            dashboard_job=(job_id, 'upload') if live_dashboard else None,
+                            user_id=user_id or chat_id,
+                            uploaded_file=uploaded['file'] if uploaded and attempt == 0 else None
+                        )
                     if new_message_id:
                         break
                 except Exception as upload_error:
@@ -273,17 +340,158 @@ async def start_recording(telethon_client: TelegramClient, url: str, duration: s
             
             if os.path.exists(output_path): os.remove(output_path)
             if os.path.exists(thumbnail_path): os.remove(thumbnail_path)
+            remove_index(output_path)
+            job_journal.set_current_file(chat_id, message_id, None)
+
+        async def closed_segments():
+            """Segments as ffmpeg closes them, as parts to deliver."""
+            number = 0
+            async for segment_path in watch_segments(segment_list_path, segment_glob,
+                                                     lambda: process.returncode is not None):
+                number += 1
+                print(f"[Recorder] [INFO] Segment {number} of {title} closed: {segment_path}")
+                yield new_part(segment_path, number, f" part {number}")
+
+        async def deliver_segments_while_recording():
+            """Uploads each segment as soon as ffmpeg closes it, while the next one is being written."""
+            nonlocal delivery_message
+            async with contextlib.aclosing(post_process_pool.map_ordered(closed_segments(), prepare_part)) as ready:
+                async for part in ready:
+                    if delivery_message is None:
+                        # Separate message for uploads so they don't fight the recording progress edits
+                        delivery_message = await telegram_gateway.send_message(
+                            telethon_client, chat_id,
+                            message=f"📤 **Delivering parts of** `{title}` **while recording...**",
+                            parse_mode="Markdown",
+                            reply_to=message_id
+                        )
+                    print(f"[Recorder] [INFO] Uploading segment {part['number']} of {title}")
+                    await upload_part(part, delivery_message.id)
+
+        delivery_task = asyncio.create_task(deliver_segments_while_recording()) if pipelined else None
+
+        async def follow_single_file() -> Optional[Dict[str, any]]:
+            """Uploads the recording while it's written; None if it has to be uploaded afterwards."""
+            first_piece = None
+            while first_piece is None:
+                if process.returncode is not None:
+                    return None
+                first_piece = next((path for path in glob.glob(f"{piece_base(base_temp_path, 0)}.*")
+                                    if not is_index_file(path)), None)
+                if first_piece is None:
+                    await asyncio.sleep(1)
+
+            start_offset = prefix_size = 0
+            if trim_pending:
+                # Only send what the pre-roll trim keeps: the init segment, then from the keyframe before the start
+                give_up_at = time.time() + trim_pending + 60
+                while True:
+                    index = await asyncio.to_thread(KeyframeIndex.load, first_piece)
+                    if index and index.byte_copyable and index.entries and index.entries[-1][0] > trim_pending:
+                        first, _ = index.locate(trim_pending, None)
+                        start_offset, prefix_size = index.entries[first][1], index.init_size
+                        break
+                    if process.returncode is not None or time.time() > give_up_at:
+                        return None  # No byte-exact cut point (FFmpeg engine): upload after the trim
+                    await asyncio.sleep(1)
+
+            return await upload_manager.tail_upload(
+                first_piece, lambda: process.returncode is not None,
+                # A restart adds a second piece, and the pieces get stitched into a new file
+                should_abort=lambda: bool(glob.glob(f"{piece_base(base_temp_path, 1)}.*")),
+                start_offset=start_offset, prefix_size=prefix_size
+            )
 
-        remove_active_recording(recording_id)
+        tail_task = asyncio.create_task(follow_single_file()) if tail_following else None
 
-    except asyncio.CancelledError:
+        return_code = await process.wait()
+        temp_path_single = process.output_path
+        if admission:
+            # Capture is over; uploads are limited separately
+            admission.release(job_id)
         progress_task.cancel()
+        try:
+            await progress_task
+        except asyncio.CancelledError:
+            pass
+        if live_dashboard:
+            live_dashboard.remove(chat_id, job_id)
+
+        if return_code != 0 and return_code != -15:
+            error_msg = f"Recording failed: {telemetry.error_text()}"
+            print(f"[Recorder] [ERROR] {title}: {error_msg}")
+            caption_text = caption_recording_progress(
+                title, channel, total_seconds, start_time_str,
+                telemetry.stats['out_time'], max(0, total_seconds - telemetry.stats['out_time']) if not is_unlimited else 0,
+                error_msg
+            )
+            await update_caption(caption_text)
+            job_journal.transition(chat_id, message_id, 'failed', error=error_msg)
+            for task in (delivery_task, tail_task):
+                if task:
+                    task.cancel()
+                    try:
+                        await task
+                    except (asyncio.CancelledError, Exception):
+                        pass
+            if split_duration_sec:
+                for f in glob.glob(segment_glob):
+                    os.remove(f)
+            elif temp_path_single and os.path.exists(temp_path_single):
+                os.remove(temp_path_single)
+                remove_index(temp_path_single)
+            return
+
+        if not is_unlimited:
+            await update_caption(caption_recording_completed(title, channel, total_seconds, start_time_str))
+        job_journal.transition(chat_id, message_id, 'uploading')
+
+        if delivery_task:
+            # ffmpeg has exited, so the watcher flushes the last segments and stops
+            await delivery_task
+        else:
+            files_to_upload = []
+            if split_duration_sec:
+                files_to_upload = sorted(f for f in glob.glob(segment_glob) if not is_index_file(f))
+            elif temp_path_single and os.path.exists(temp_path_single):
+                files_to_upload.append(temp_path_single)
+
+            uploaded = None
+            if tail_task:
+                try:
+                    uploaded = await tail_task
+                except Exception as e:
+                    print(f"[Recorder] [WARNING] Live upload of {title} failed, uploading it now: {e}")
+
+            parts = [new_part(file_path, i + 1, f" part {i+1}" if len(files_to_upload) > 1 else "", uploaded)
+                     for i, file_path in enumerate(files_to_upload)]
+            # Thumbnails and probes of later parts run while earlier parts upload
+            async with contextlib.aclosing(post_process_pool.map_ordered(parts, prepare_part)) as ready:
+                async for part in ready:
+                    await upload_part(part, recording_message.id)
+        job_journal.transition(chat_id, message_id, 'done')
+
+    except asyncio.CancelledError:
+        # Still registered = not a user cancel but a shutdown; keep the files for recovery on restart
+        interrupted = bool(message_id) and message_id in scheduled_jobs
+        if progress_task:
+            progress_task.cancel()
+        if delivery_task:
+            delivery_task.cancel()
+        if tail_task:
+            tail_task.cancel()
         cancel_caption = (
             "⏹ **CANCELLED**\n"
             "━━━━━━━━━━━━━━━━━━━\n\n"
             f"📌 `{title}`\n"
             f"📡 `{channel}`\n\n"
             "🚫 Recording was cancelled."
+        ) if not interrupted else (
+            "⏸ **INTERRUPTED**\n"
+            "━━━━━━━━━━━━━━━━━━━\n\n"
+            f"📌 `{title}`\n"
+            f"📡 `{channel}`\n\n"
+            "♻️ Bot is restarting, the recording will resume."
         )
         await update_caption(cancel_caption)
         if process:
@@ -296,6 +504,7 @@ async def start_recording(telethon_client: TelegramClient, url: str, duration: s
     except Exception as e:
         error_msg = f"❌ Error: {str(e)}"
         print(f"[Recorder] [ERROR] {error_msg}")
+        job_journal.transition(chat_id, message_id, 'failed', error=str(e))
         if recording_message and 'start_ts' in locals() and 'total_seconds' in locals():
             if not is_unlimited:
                 caption_text = caption_recording_progress(
@@ -305,8 +514,19 @@ async def start_recording(telethon_client: TelegramClient, url: str, duration: s
                 )
                 await update_caption(caption_text)
     finally:
+        if admission:
+            admission.release(job_id)
+        if tail_task and not tail_task.done():
+            tail_task.cancel()
+        if recording_id:
+            remove_active_recording(recording_id)
+        if live_dashboard:
+            live_dashboard.remove(chat_id, job_id)
+            live_dashboard.remove(chat_id, (job_id, 'upload'))
+        if not interrupted:
+            scheduled_jobs.pop(message_id, None)
         # Cleanup any remaining temp files
-        if 'base_temp_filename' in locals():
+        if 'base_temp_filename' in locals() and not interrupted:
             for f in glob.glob(os.path.join(RECORDINGS_DIR, f"{base_temp_filename}*")):
                 try:
                     os.remove(f)
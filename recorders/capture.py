@@ -0,0 +1,546 @@
+import os
+import re
+import glob
+import time
+import shutil
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from recorders.ffmpeg_progress import CaptureTelemetry, FFmpegProgress, PROGRESS_ARGS
+from recorders.hls_engine import HLSCapture, HLSError, VariantPolicy, default_variant_policy, fetch_playlist
+from recorders.recorder_utils import get_http_session
+from recorders.ingest_hub import ingest_hub, feed_process
+from recorders.keyframe_index import move_index, remove_index
+from recorders.ts_splitter import TSPartWriter
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_HEADERS = "User-Agent: Mozilla/5.0\r\nReferer: https://www.tataplay.com/\r\nOrigin: https://www.tataplay.com"
+_SEGMENT_INDEX_RE = re.compile(r"_(\d+)\.[^.]+$")
+# ffmpeg errors meaning the input was cut off, as opposed to harmless warnings
+# ("Non-monotonous DTS", "PES packet size mismatch", ...) on a healthy run
+_CONNECTION_LOST_RE = re.compile(
+    r"connection (reset|refused|timed out)|timed out|end of file|input/output error|broken pipe"
+    r"|server returned [45]\d\d|http error [45]\d\d|failed to (reload playlist|open segment)"
+    r"|unable to open resource|keepalive request failed",
+    re.IGNORECASE
+)
+
+
+class FFmpegCapture:
+    """One ffmpeg capture process with its telemetry and optional shared-ingest feed."""
+
+    def __init__(self, process: asyncio.subprocess.Process, telemetry: FFmpegProgress,
+                 output_path: Optional[str], feed_task: Optional[asyncio.Task],
+                 splitter_task: Optional[asyncio.Task] = None):
+        self.process = process
+        self.telemetry = telemetry
+        self.output_path = output_path
+        self._telemetry_task = asyncio.create_task(telemetry.consume(process))
+        self._feed_task = feed_task
+        self._splitter_task = splitter_task
+
+    @classmethod
+    async def start(cls, stream_url: str, output_base: str, duration: float,
+                    split_duration: Optional[int], segment_list_path: Optional[str],
+                    segment_start: int, shared: bool, stall_timeout: float,
+                    program: Optional[int] = None, stream_safe: bool = False,
+                    split_bytes: Optional[int] = None) -> "FFmpegCapture":
+        """
+        Spawns ffmpeg for one capture piece.
+
+        Args:
+            program: Index of the master-playlist variant to record (ffmpeg exposes each
+                variant as a program); None records the input as-is
+            stream_safe: Write a single file as MPEG-TS, which is only ever appended to
+                (Matroska rewrites its header and cues on close), so it can be read while growing
+            split_bytes: Roll to a new segment at the first keyframe past this size. ffmpeg then
+                writes MPEG-TS to a pipe and a TSPartWriter cuts the parts (by size and, with
+                split_duration, by time), since the segment muxer can only cut by time
+        """
+        shared_feed = None
+        if shared:
+            try:
+                shared_feed = await ingest_hub.attach(stream_url)
+            except Exception as e:
+                logger.info(f"[Capture] Shared ingest unavailable ({e}), FFmpeg will pull the stream itself")
+
+        cmd = ["ffmpeg", "-y", "-loglevel", "error", *PROGRESS_ARGS]
+        if shared_feed:
+            # Segments come from the hub's single upstream pull for this channel
+            cmd.extend(["-i", "pipe:0"])
+        else:
+            cmd.extend(["-headers", FFMPEG_HEADERS, "-i", stream_url])
+
+        if duration:
+            cmd.extend(["-t", str(int(duration))])
+
+        output_path = None
+        part_writer = None
+        pipe_read = pipe_write = None
+        if split_bytes:
+            part_writer = TSPartWriter(output_base, segment_start, split_duration, split_bytes, segment_list_path)
+            pipe_read, pipe_write = os.pipe()
+            cmd.extend([
+                *(["-map", f"0:p:{program}"] if program is not None else ["-map", "0:v?", "-map", "0:a?", "-map", "0:s?"]),
+                "-c", "copy",
+                "-f", "mpegts",
+                f"pipe:{pipe_write}"
+            ])
+        elif split_duration:
+            cmd.extend([
+                "-f", "segment",
+                "-segment_time", str(split_duration),
+                "-segment_start_number", str(segment_start),
+                "-reset_timestamps", "1",
+            ])
+            if segment_list_path:
+                # ffmpeg appends a line here as soon as each segment file is closed
+                cmd.extend(["-segment_list", segment_list_path, "-segment_list_type", "csv"])
+            cmd.extend([
+                "-c", "copy",
+                *(["-map", f"0:p:{program}"] if program is not None else ["-map", "0"]),
+                f"{output_base}_%03d.mkv"
+            ])
+        else:
+            output_path = f"{output_base}.ts" if stream_safe else f"{output_base}.mkv"
+            cmd.extend([
+                *(["-map", f"0:p:{program}"] if program is not None else ["-map", "0:v?", "-map", "0:a?", "-map", "0:s?"]),
+                "-c", "copy",
+                *(["-f", "mpegts"] if stream_safe else []),
+                output_path
+            ])
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE if shared_feed else None,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                pass_fds=(pipe_write,) if part_writer else ()
+            )
+        except BaseException:
+            if part_writer:
+                os.close(pipe_read)
+                os.close(pipe_write)
+            raise
+        splitter_task = None
+        if part_writer:
+            os.close(pipe_write)  # ffmpeg holds the only write end, so its exit is the reader's EOF
+            reader = asyncio.StreamReader()
+            await asyncio.get_running_loop().connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(pipe_read, "rb", 0)
+            )
+            splitter_task = asyncio.create_task(part_writer.run(reader))
+        feed_task = asyncio.create_task(feed_process(*shared_feed, process)) if shared_feed else None
+        return cls(process, FFmpegProgress(stall_timeout=stall_timeout), output_path, feed_task, splitter_task)
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.process.returncode
+
+    async def wait(self) -> int:
+        return_code = await self.process.wait()
+        await self._telemetry_task
+        if self._splitter_task:
+            # Flushes and closes the last part (and its manifest line)
+            try:
+                await self._splitter_task
+            except Exception as e:
+                logger.error(f"[Capture] Splitting the FFmpeg output failed: {e}")
+        if self._feed_task:
+            self._feed_task.cancel()
+        return return_code
+
+    def terminate(self):
+        try:
+            self.process.terminate()
+        except ProcessLookupError:
+            pass
+
+
+async def concat_pieces(pieces: List[str], output_path: str) -> bool:
+    """
+    Losslessly joins capture pieces with ffmpeg's concat demuxer.
+
+    The demuxer keeps the first piece's codec parameters for the whole file,
+    so the pieces must all be of the same rendition (see `concat_pieces_ts`).
+    """
+    list_path = f"{output_path}.concat.txt"
+    with open(list_path, "w") as f:
+        for piece in pieces:
+            escaped = os.path.abspath(piece).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-map", "0", "-c", "copy", output_path
+    ]
+    try:
+        process = await asyncio.create_subprocess_exec(*cmd, stderr=asyncio.subprocess.PIPE)
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            logger.error(f"[Capture] Stitching failed: {stderr.decode().strip()[:200]}")
+            return False
+        return True
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+
+def _join_files(paths: List[str], output_path: str):
+    with open(output_path, "wb") as output:
+        for path in paths:
+            with open(path, "rb") as source:
+                shutil.copyfileobj(source, output, 1024 * 1024)
+
+
+async def concat_pieces_ts(pieces: List[str], output_path: str) -> bool:
+    """
+    Joins capture pieces of different renditions into one MPEG-TS file.
+
+    MPEG-TS carries the codec parameters (SPS/PPS) in-band at every
+    keyframe, so each piece keeps its own resolution and profile after the
+    join, where the concat demuxer would decode later pieces with the first
+    one's. Pieces that aren't MPEG-TS yet are remuxed first; the TS files
+    are then appended byte for byte.
+    """
+    remuxed = []
+    try:
+        parts = []
+        for piece in pieces:
+            if piece.endswith(".ts"):
+                parts.append(piece)
+                continue
+            part = f"{piece}.join.ts"
+            remuxed.append(part)
+            cmd = [
+                "ffmpeg", "-y", "-loglevel", "error", "-i", piece,
+                "-map", "0:v?", "-map", "0:a?", "-c", "copy", "-f", "mpegts", part
+            ]
+            process = await asyncio.create_subprocess_exec(*cmd, stderr=asyncio.subprocess.PIPE)
+            _, stderr = await process.communicate()
+            if process.returncode != 0:
+                logger.error(f"[Capture] Remuxing {os.path.basename(piece)} failed: {stderr.decode().strip()[:200]}")
+                return False
+            parts.append(part)
+        await asyncio.to_thread(_join_files, parts, output_path)
+        return True
+    except OSError as e:
+        logger.error(f"[Capture] Joining pieces failed: {e}")
+        return False
+    finally:
+        for part in remuxed:
+            if os.path.exists(part):
+                os.remove(part)
+
+
+def piece_base(output_base: str, index: int) -> str:
+    """Output base of a single-file recording's `index`-th capture piece (extension added by the engine)."""
+    return f"{output_base}.piece{index}"
+
+
+class SupervisedCapture:
+    """
+    Keeps a recording alive across upstream drops.
+
+    Runs an ffmpeg or native capture and, if it dies before the job's end
+    time, re-resolves the stream URL and starts a new piece for the
+    remaining time, recording the gap. Split recordings simply continue
+    the segment numbering; single-file recordings are stitched losslessly
+    at the end (as MPEG-TS when an adaptive step-down left pieces of
+    different renditions). Exposes the process-like `returncode` / `wait()` /
+    `terminate()` surface and one aggregated `telemetry` across pieces.
+
+    With `stream_safe`, a single-file recording's first piece can be read
+    while it's being written (see `piece_base`): it's only ever appended to,
+    and is renamed rather than rewritten when it's the only piece.
+
+    For the ffmpeg engine it also picks the master-playlist variant by
+    `variant_policy`, so only that rendition is downloaded, and steps down
+    to a lower one when ffmpeg keeps running slower than real time. (The
+    native engine's HLSSource adapts by itself.)
+    """
+
+    def __init__(self, stream_url: str, output_base: str, duration: float,
+                 resolve: Callable[[], Awaitable[str]], engine: str = "ffmpeg",
+                 split_duration: Optional[int] = None, segment_list_path: Optional[str] = None,
+                 max_restarts: int = 10, restart_delay: float = 5.0,
+                 stall_timeout: float = 20.0, shared: bool = False,
+                 prefetch: int = 4, retries: int = 3, variant_policy: Optional[VariantPolicy] = None,
+                 stream_safe: bool = False, split_bytes: Optional[int] = None):
+        self.stream_url = stream_url
+        self.output_base = output_base
+        self.duration = duration
+        self.resolve = resolve
+        self.engine = engine
+        self.split_duration = split_duration
+        self.split_bytes = split_bytes
+        self.segment_list_path = segment_list_path
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self.stall_timeout = stall_timeout
+        self.shared = shared
+        self.prefetch = prefetch
+        self.retries = retries
+        self.variant_policy = variant_policy or default_variant_policy
+        self.stream_safe = stream_safe
+
+        self.telemetry = CaptureTelemetry(stall_timeout=stall_timeout)
+        self.returncode: Optional[int] = None
+        self.output_path: Optional[str] = None
+        self.pieces: List[str] = []
+        self.piece_variants: List[Optional[Dict[str, any]]] = []  # Rendition of each piece
+        self.gaps: List[Dict[str, float]] = []
+        self.restarts = 0
+        self.truncated = False
+        self.variants: List[Dict[str, any]] = []
+        self.variant: Optional[Dict[str, any]] = None
+        self.downshifts = 0
+
+        self._current = None
+        self._deadline = None
+        self._offset_time = 0.0
+        self._offset_size = 0
+        self._task: Optional[asyncio.Task] = None
+        self._done = asyncio.Event()
+        self._downshift_to: Optional[Dict[str, any]] = None
+        self._piece_count = 0
+        self._piece_duration = 0.0
+
+    async def _select_variant(self):
+        """Reads the master playlist so ffmpeg records one rendition instead of every one."""
+        try:
+            playlist = await fetch_playlist(get_http_session(), self.stream_url, timeout=10)
+        except Exception as e:
+            logger.info(f"[Capture] Not selecting a variant ({e}), recording the input as-is")
+            return
+        if playlist['variants']:
+            self.variants = playlist['variants']
+            self.variant = self.variant_policy.select(self.variants)
+            logger.info(f"[Capture] Recording variant {self.variant['bandwidth'] // 1000} kbps "
+                        f"{self.variant['resolution'] or ''} ({self.variant_policy.mode})")
+
+    async def start(self):
+        """Starts the first piece; errors here (e.g. ffmpeg missing) propagate to the caller."""
+        if self.duration:
+            self._deadline = time.monotonic() + self.duration
+        if self.engine != "native" and not self.shared:
+            await self._select_variant()
+        self._current = await self._launch(self.stream_url, self.duration)
+        self._task = asyncio.create_task(self._supervise())
+
+    async def wait(self) -> int:
+        await self._done.wait()
+        return self.returncode
+
+    def terminate(self):
+        if self._current:
+            self._current.terminate()
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    @property
+    def splitting(self) -> bool:
+        """Whether the recording is written as numbered segments (by time, by size or both)."""
+        return bool(self.split_duration or self.split_bytes)
+
+    def _remaining(self) -> float:
+        return max(0.0, self._deadline - time.monotonic()) if self._deadline else 0.0
+
+    def _next_segment_start(self) -> int:
+        """Continues ffmpeg's segment numbering after every segment written or already delivered."""
+        names = [os.path.basename(p) for p in glob.glob(f"{self.output_base}_[0-9]*")]
+        if self.segment_list_path and os.path.exists(self.segment_list_path):
+            with open(self.segment_list_path) as f:
+                names.extend(line.split(",", 1)[0] for line in f if line.strip())
+        indexes = [int(m.group(1)) for m in map(_SEGMENT_INDEX_RE.search, names) if m]
+        return max(indexes) + 1 if indexes else 0
+
+    async def _launch(self, stream_url: str, duration: float):
+        segment_start = self._next_segment_start() if self.splitting else 0
+        output_base = self.output_base if self.splitting else piece_base(self.output_base, self._piece_count)
+        self._piece_count += 1
+        self._piece_duration = duration
+
+        if self.engine == "native":
+            capture = HLSCapture(
+                stream_url, output_base, duration=duration,
+                split_duration=self.split_duration, split_bytes=self.split_bytes,
+                segment_list_path=self.segment_list_path, prefetch=self.prefetch, retries=self.retries, stall_timeout=self.stall_timeout,
+                shared=self.shared, segment_start=segment_start
+            )
+            try:
+                await capture.start()
+                return capture
+            except HLSError as e:
+                logger.warning(f"[Capture] Native HLS engine can't capture this stream ({e}), falling back to FFmpeg")
+
+        program = self.variants.index(self.variant) if self.variant in self.variants else None
+        return await FFmpegCapture.start(
+            stream_url, output_base, duration, self.split_duration, self.segment_list_path,
+            segment_start, self.shared, self.stall_timeout, program, self.stream_safe, self.split_bytes
+        )
+
+    def _check_downshift(self, capture, slow_since: Optional[float]) -> Optional[float]:
+        """Stops an ffmpeg piece that has run slower than real time for too long; returns the new slow_since."""
+        policy = self.variant_policy
+        stats = capture.telemetry.stats
+        if not (policy.adaptive and self.variant and isinstance(capture, FFmpegCapture)) or self._downshift_to:
+            return None
+        # Give ffmpeg time to settle: it bursts through the playlist's back-buffer at first
+        if stats['out_time'] < 30 or stats['speed'] >= policy.downshift_speed:
+            return None
+        now = time.monotonic()
+        if slow_since is None:
+            return now
+        if now - slow_since >= self.stall_timeout:
+            lower = policy.lower(self.variants, self.variant)
+            if lower:
+                logger.warning(f"[Capture] Running at {stats['speed']}x, stepping down to "
+                               f"{lower['bandwidth'] // 1000} kbps")
+                self._downshift_to = lower
+                capture.terminate()
+            return None
+        return slow_since
+
+    async def _pump_telemetry(self):
+        """Mirrors the current piece's stats into the aggregated telemetry, offset by earlier pieces."""
+        slow_since = None
+        while True:
+            slow_since = self._check_downshift(self._current, slow_since)
+            current = self._current.telemetry
+            self.telemetry.advance(self._offset_time + current.stats['out_time'],
+                                   self._offset_size + current.stats['total_size'])
+            for key in ('speed', 'frame', 'dup_frames', 'drop_frames'):
+                self.telemetry.stats[key] = current.stats[key]
+            if current.stderr_tail and (not self.telemetry.stderr_tail or current.stderr_tail[-1] != self.telemetry.stderr_tail[-1]):
+                self.telemetry.log_error(current.stderr_tail[-1])
+            await asyncio.sleep(1)
+
+    def _collect_piece(self, capture):
+        stats = capture.telemetry.stats
+        self._offset_time += stats['out_time']
+        self._offset_size += stats['total_size']
+        if not self.splitting and capture.output_path and os.path.exists(capture.output_path) \
+                and os.path.getsize(capture.output_path) > 0:
+            self.pieces.append(capture.output_path)
+            self.piece_variants.append(self.variant)
+
+    def _ended_early(self, capture) -> bool:
+        """
+        Whether a piece that exited 0 stopped because the stream dropped rather than because it was done.
+
+        ffmpeg often exits 0 when its input connection dies. A piece with a
+        target duration dropped if it recorded noticeably less than that;
+        an unlimited one if ffmpeg's last messages report a lost connection.
+        """
+        if self._piece_duration:
+            return capture.telemetry.stats['out_time'] < self._piece_duration - self.restart_delay
+        return any(_CONNECTION_LOST_RE.search(line) for line in capture.telemetry.stderr_tail)
+
+    async def _supervise(self):
+        pump = asyncio.create_task(self._pump_telemetry())
+        try:
+            while True:
+                return_code = await self._current.wait()
+                self._collect_piece(self._current)
+
+                if self._downshift_to:
+                    # Planned switch to a lower rendition: no backoff, not counted as a restart
+                    self.variant, self._downshift_to = self._downshift_to, None
+                    self.downshifts += 1
+                    if self.duration and self._remaining() <= 0:
+                        break
+                    switched_at = time.monotonic()
+                    try:
+                        self._current = await self._launch(self.stream_url, self._remaining())
+                    except Exception as e:
+                        logger.error(f"[Capture] Switching variant failed: {e}")
+                        self.truncated = True
+                        break
+                    self.gaps.append({'at': round(self._offset_time, 1), 'seconds': round(time.monotonic() - switched_at, 1)})
+                    continue
+
+                unfinished = self.duration == 0 or self._remaining() > self.restart_delay
+                dropped = return_code not in (0, -15) or (return_code == 0 and self._ended_early(self._current))
+                if not dropped or not unfinished:
+                    break
+                if self.restarts >= self.max_restarts:
+                    logger.error(f"[Capture] Giving up after {self.restarts} restarts")
+                    self.truncated = True
+                    break
+
+                failed_at = time.monotonic()
+                self.restarts += 1
+                delay = min(self.restart_delay * 2 ** (self.restarts - 1), 60)
+                self.telemetry.log_error(f"Upstream lost ({self._current.telemetry.error_text(100)}), reconnecting in {delay:.0f}s")
+                logger.warning(f"[Capture] Piece ended with code {return_code}, restart {self.restarts}/{self.max_restarts} in {delay:.0f}s")
+                await asyncio.sleep(delay)
+
+                try:
+                    # Tokens in the URL may have expired; resolve it again from its source
+                    self.stream_url = await self.resolve() or self.stream_url
+                except Exception as e:
+                    logger.warning(f"[Capture] Re-resolving stream failed, reusing last URL: {e}")
+
+                if self.duration and self._remaining() <= 0:
+                    break
+                try:
+                    self._current = await self._launch(self.stream_url, self._remaining())
+                except Exception as e:
+                    logger.error(f"[Capture] Restart failed: {e}")
+                    self.telemetry.log_error(f"Restart failed: {e}")
+                    self.truncated = True
+                    break
+                self.gaps.append({'at': round(self._offset_time, 1), 'seconds': round(time.monotonic() - failed_at, 1)})
+
+            if self.splitting:
+                self.returncode = 0 if self._offset_size > 0 else 1
+            else:
+                self.returncode = await self._finish_single_file()
+        except asyncio.CancelledError:
+            if self._current:
+                self._current.terminate()
+            self.returncode = -15
+        finally:
+            pump.cancel()
+            if self._offset_time > self.telemetry.stats['out_time']:
+                # Final totals of every collected piece; the pump only samples once a second
+                self.telemetry.advance(self._offset_time, self._offset_size)
+            self.telemetry.finished = True
+            self._done.set()
+
+    async def _finish_single_file(self) -> int:
+        if not self.pieces:
+            return 1
+        if len(self.pieces) == 1:
+            self.output_path = f"{self.output_base}{os.path.splitext(self.pieces[0])[1]}"
+            os.replace(self.pieces[0], self.output_path)
+            move_index(self.pieces[0], self.output_path)
+            return 0
+        if all(variant == self.piece_variants[0] for variant in self.piece_variants):
+            self.output_path = f"{self.output_base}{os.path.splitext(self.pieces[0])[1]}"
+            logger.info(f"[Capture] Stitching {len(self.pieces)} pieces into {self.output_path}")
+            stitched = await concat_pieces(self.pieces, self.output_path)
+        else:
+            self.output_path = f"{self.output_base}.ts"
+            logger.info(f"[Capture] Stitching {len(self.pieces)} pieces of different renditions into {self.output_path}")
+            stitched = await concat_pieces_ts(self.pieces, self.output_path)
+        if stitched:
+            for piece in self.pieces:
+                # The stitched file is remuxed, so the pieces' offsets don't apply; it gets probed when needed
+                remove_index(piece)
+                if os.path.exists(piece):
+                    os.remove(piece)
+            return 0
+        # Keep the longest piece rather than losing everything
+        self.truncated = True
+        longest = max(self.pieces, key=os.path.getsize)
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+        self.output_path = f"{self.output_base}{os.path.splitext(longest)[1]}"
+        os.replace(longest, self.output_path)
+        move_index(longest, self.output_path)
+        return 0
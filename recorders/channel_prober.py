@@ -0,0 +1,186 @@
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from recorders.hls_engine import HLSError, fetch_playlist, default_variant_policy
+from recorders.recorder_utils import get_http_session, resolve_stream
+from config import CHANNEL_PROBER, PROBE_INTERVAL, PROBE_CONCURRENCY, PROBE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# A channel that hasn't answered for this many sweeps in a row is reported dead
+DEAD_AFTER_FAILURES = 2
+
+
+class ChannelProber:
+    """
+    Periodically checks every playlist channel and keeps a health record per URL.
+
+    Each probe fetches the channel's playlist (and the media playlist of the
+    rendition the recorder would pick), then the newest segment, recording
+    the time to its first byte (roughly what a recording waits before data
+    arrives) and the download throughput. Direct streams are read the same
+    way without the playlists. Probes run with bounded concurrency and read
+    at most `max_bytes` of each segment.
+
+    `rank()` orders mirrors of one channel healthiest-first, which is what
+    m3u_manager uses to pick between duplicate entries across playlists.
+    """
+
+    def __init__(self, interval: float = 1800, concurrency: int = 8, timeout: float = 10,
+                 max_bytes: int = 256 * 1024):
+        self.interval = interval
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.health: Dict[str, Dict[str, any]] = {}
+        self.sweeps = 0
+        self.last_sweep: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, manager):
+        """Starts sweeping the channels of an M3UManager in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(manager))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _read_first_bytes(self, url: str, started: float) -> Dict[str, float]:
+        """Downloads the start of `url`; returns time to first byte (since `started`) and throughput."""
+        session = get_http_session()
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+            response.raise_for_status()
+            received = 0
+            first_byte_at = None
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                if first_byte_at is None:
+                    first_byte_at = time.monotonic()
+                received += len(chunk)
+                if received >= self.max_bytes:
+                    break
+        if first_byte_at is None:
+            raise HLSError("Empty response")
+        elapsed = time.monotonic() - first_byte_at
+        return {
+            'ttfb': first_byte_at - started,
+            'throughput': received * 8 / elapsed if elapsed > 0 else 0.0,
+        }
+
+    async def probe(self, url: str) -> Dict[str, any]:
+        """
+        Checks one channel URL.
+
+        Returns:
+            Dict with `ok`, `ttfb` (seconds), `throughput` (bits/s) and `error`
+        """
+        started = time.monotonic()
+        try:
+            target = await resolve_stream(url)
+            try:
+                playlist = await fetch_playlist(get_http_session(), target, timeout=self.timeout)
+            except HLSError as e:
+                if str(e) != "Not an HLS playlist":
+                    raise
+                result = await self._read_first_bytes(target, started)  # Direct .ts/.mp4 stream
+            else:
+                if playlist['variants']:
+                    variant = default_variant_policy.select(playlist['variants'])
+                    playlist = await fetch_playlist(get_http_session(), variant['uri'], timeout=self.timeout)
+                if not playlist['segments']:
+                    raise HLSError("Playlist has no segments")
+                result = await self._read_first_bytes(playlist['segments'][-1]['uri'], started)
+            return {'ok': True, 'error': None, **result}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return {'ok': False, 'ttfb': None, 'throughput': None, 'error': str(e) or type(e).__name__}
+
+    async def _check(self, url: str, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            result = await self.probe(url)
+        previous = self.health.get(url, {})
+        record = {**result, 'last_checked': time.time(),
+                  'last_success': time.time() if result['ok'] else previous.get('last_success'),
+                  'failures': 0 if result['ok'] else previous.get('failures', 0) + 1}
+        self.health[url] = record
+
+    async def sweep(self, urls: List[str]):
+        """Probes every URL once, at most `concurrency` at a time."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._check(url, semaphore) for url in urls))
+        # Forget URLs that left the playlists (e.g. replaced by a renewed token)
+        for url in set(self.health) - set(urls):
+            del self.health[url]
+        self.sweeps += 1
+        self.last_sweep = time.time()
+
+    async def _run(self, manager):
+        while True:
+            urls = sorted({info['url'] for key, info in manager.channels.items()
+                           if isinstance(key, str) and ':' in key})
+            started = time.monotonic()
+            try:
+                await self.sweep(urls)
+                alive = sum(1 for url in urls if self.is_alive(url))
+                logger.info(f"[Prober] {alive}/{len(urls)} channels alive "
+                            f"({time.monotonic() - started:.0f}s sweep)")
+            except Exception as e:
+                logger.error(f"[Prober] Sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def is_alive(self, url: str) -> Optional[bool]:
+        """True/False once probed, None if the URL hasn't been checked yet."""
+        record = self.health.get(url)
+        if record is None:
+            return None
+        return record['ok'] or record['failures'] < DEAD_AFTER_FAILURES
+
+    def _sort_key(self, info: Dict[str, any]):
+        record = self.health.get(info['url'])
+        if record is None:
+            return (1, 0.0, 0.0)
+        if not record['ok']:
+            return (2, float(record['failures']), 0.0)
+        return (0, round(record['ttfb'], 1), -record['throughput'])
+
+    def rank(self, infos: List[Dict[str, any]]) -> List[Dict[str, any]]:
+        """
+        Orders channel entries healthiest first.
+
+        Working URLs come first, by time to first byte (to 0.1 s) and then
+        throughput; unprobed ones next; failing ones last. The sort is
+        stable, so the caller's order breaks ties.
+        """
+        return sorted(infos, key=self._sort_key)
+
+    def badge(self, url: str) -> str:
+        """Short health marker for channel listings."""
+        record = self.health.get(url)
+        if record is None:
+            return ""
+        if record['ok']:
+            return f"🟢 {record['ttfb']:.1f}s"
+        return "🔴" if not self.is_alive(url) else "🟡"
+
+    def stats(self) -> Dict[str, any]:
+        """Probed, alive and dead channel counts, for /status."""
+        alive = sum(1 for url in self.health if self.is_alive(url))
+        return {
+            'probed': len(self.health),
+            'alive': alive,
+            'dead': len(self.health) - alive,
+            'sweeps': self.sweeps,
+            'last_sweep': self.last_sweep,
+        }
+
+
+channel_prober = ChannelProber(PROBE_INTERVAL, PROBE_CONCURRENCY, PROBE_TIMEOUT) if CHANNEL_PROBER else None
@@ -0,0 +1,185 @@
+import os
+import json
+import shutil
+import logging
+from typing import Dict, Optional
+
+import aiohttp
+
+from recorders.recorder_utils import get_http_session
+from recorders.hls_engine import fetch_playlist
+
+logger = logging.getLogger(__name__)
+
+
+class DiskBudgetError(Exception):
+    """Raised when a job could never fit in RECORDINGS_DIR, even with nothing else running."""
+
+
+class DiskBudget:
+    """
+    Reservation ledger for the bytes that running captures are still going to write.
+
+    Each admitted job reserves `bitrate x duration` bytes up front. Free space
+    reported by the filesystem already includes what has been written, so the
+    ledger only holds back each job's outstanding part (reserved minus
+    written). A new job fits when free space minus every outstanding
+    reservation and the headroom still covers its own reservation.
+
+    Per-channel bitrates measured by finished captures are persisted to
+    `stats_file` and preferred over probing the stream next time.
+    """
+
+    def __init__(self, directory: str, stats_file: str, headroom_bytes: int = 500 * 1024 * 1024,
+                 default_mbps: float = 5.0, unlimited_horizon: float = 3600, preallocate: bool = False):
+        self.directory = directory
+        self.stats_file = stats_file
+        self.headroom_bytes = headroom_bytes
+        self.default_mbps = default_mbps
+        self.unlimited_horizon = unlimited_horizon
+        self.preallocate = preallocate
+        self._reservations: Dict[int, Dict[str, any]] = {}
+        self._channel_mbps: Dict[str, float] = self._load_stats()
+
+    def _load_stats(self) -> Dict[str, float]:
+        if not os.path.exists(self.stats_file):
+            return {}
+        try:
+            with open(self.stats_file, "r") as f:
+                return {str(k): float(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Disk Budget] Ignoring unreadable {self.stats_file}: {e}")
+            return {}
+
+    def _save_stats(self):
+        try:
+            with open(self.stats_file, "w") as f:
+                json.dump(self._channel_mbps, f, indent=2)
+        except OSError as e:
+            logger.warning(f"[Disk Budget] Could not save channel bitrates: {e}")
+
+    async def _probe_mbps(self, url: str) -> Optional[float]:
+        """Reads the bitrate from the playlist: BANDWIDTH of the best variant, or one segment's size."""
+        session = get_http_session()
+        playlist = await fetch_playlist(session, url, timeout=5)
+        if playlist['variants']:
+            bandwidth = max(v['bandwidth'] for v in playlist['variants'])
+            return bandwidth / 1_000_000 if bandwidth else None
+        segment = playlist['segments'][-1] if playlist['segments'] else None
+        if not segment or not segment['duration']:
+            return None
+        async with session.head(segment['uri'], timeout=aiohttp.ClientTimeout(total=5)) as response:
+            length = int(response.headers.get('Content-Length', 0))
+        return length * 8 / 1_000_000 / segment['duration'] if length else None
+
+    async def estimate_mbps(self, url: str) -> float:
+        """
+        Expected ingest bitrate of a channel.
+
+        Returns:
+            Mbps from history, else from a quick probe, else the configured default
+        """
+        if url in self._channel_mbps:
+            return self._channel_mbps[url]
+        try:
+            mbps = await self._probe_mbps(url)
+            if mbps:
+                return round(mbps, 2)
+        except Exception as e:
+            logger.info(f"[Disk Budget] Bitrate probe failed for {url}: {e}")
+        return self.default_mbps
+
+    def reservation_bytes(self, mbps: float, duration: float) -> int:
+        """Bytes to reserve for `duration` seconds at `mbps`; unlimited jobs reserve a fixed horizon."""
+        seconds = duration or self.unlimited_horizon
+        return int(mbps * 1_000_000 / 8 * seconds)
+
+    def _free_bytes(self) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+        return shutil.disk_usage(self.directory).free
+
+    def outstanding_bytes(self) -> int:
+        """Bytes running jobs will still write that the filesystem doesn't know about yet."""
+        return sum(max(r['reserved'] - r['written'] - r['held'], 0) for r in self._reservations.values())
+
+    def check(self, reserve_bytes: int) -> bool:
+        """
+        Whether a new reservation fits right now.
+
+        Raises:
+            DiskBudgetError: If it wouldn't fit even on an otherwise idle disk
+        """
+        free = self._free_bytes()
+        available = free - self.outstanding_bytes() - self.headroom_bytes
+        if reserve_bytes <= available:
+            return True
+        if not self._reservations:
+            raise DiskBudgetError(
+                f"Not enough disk space: needs ~{reserve_bytes / 1024**3:.1f} GB, "
+                f"{max(free - self.headroom_bytes, 0) / 1024**3:.1f} GB available"
+            )
+        return False
+
+    def reserve(self, job_id: int, reserve_bytes: int, channel_key: str, placeholder_path: Optional[str] = None):
+        """Adds a job to the ledger, optionally preallocating its reservation in a placeholder file."""
+        reservation = {
+            'reserved': reserve_bytes,
+            'written': 0,
+            'held': 0,
+            'out_time': 0.0,
+            'channel_key': channel_key,
+            'placeholder': None,
+        }
+        if self.preallocate and placeholder_path and hasattr(os, 'posix_fallocate'):
+            try:
+                fd = os.open(placeholder_path, os.O_WRONLY | os.O_CREAT, 0o644)
+                try:
+                    os.posix_fallocate(fd, 0, reserve_bytes)
+                finally:
+                    os.close(fd)
+                reservation['placeholder'] = placeholder_path
+                reservation['held'] = reserve_bytes
+            except OSError as e:
+                logger.warning(f"[Disk Budget] Preallocation failed, keeping a ledger-only reservation: {e}")
+                if os.path.exists(placeholder_path):
+                    os.remove(placeholder_path)
+        self._reservations[job_id] = reservation
+
+    def update(self, job_id: int, written_bytes: int, out_time: float = 0.0):
+        """Records how much a job has written; shrinks its placeholder by the same amount."""
+        reservation = self._reservations.get(job_id)
+        if not reservation:
+            return
+        reservation['written'] = written_bytes
+        reservation['out_time'] = out_time
+        if reservation['placeholder']:
+            held = max(reservation['reserved'] - written_bytes, 0)
+            if held < reservation['held']:
+                try:
+                    os.truncate(reservation['placeholder'], held)
+                    reservation['held'] = held
+                except OSError:
+                    pass
+
+    def release(self, job_id: int):
+        """Drops a job's reservation and remembers the channel's measured bitrate; safe to call twice."""
+        reservation = self._reservations.pop(job_id, None)
+        if not reservation:
+            return
+        if reservation['placeholder'] and os.path.exists(reservation['placeholder']):
+            os.remove(reservation['placeholder'])
+        if reservation['out_time'] >= 60:
+            mbps = round(reservation['written'] * 8 / 1_000_000 / reservation['out_time'], 2)
+            if mbps > 0:
+                self._channel_mbps[reservation['channel_key']] = mbps
+                self._save_stats()
+
+    def stats(self) -> Dict[str, int]:
+        """Reserved vs. written bytes across running jobs, for /status."""
+        return {
+            'jobs': len(self._reservations),
+            'reserved': sum(r['reserved'] for r in self._reservations.values()),
+            'written': sum(r['written'] for r in self._reservations.values()),
+            'outstanding': self.outstanding_bytes(),
+            'free': self._free_bytes(),
+        }
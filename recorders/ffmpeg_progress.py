@@ -0,0 +1,156 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg options that make it write machine-readable key=value telemetry to stdout
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats"]
+
+
+def _parse_float(value: str) -> Optional[float]:
+    """Parses ffmpeg numbers like '1.02x', '2345.6kbits/s' or 'N/A'."""
+    value = value.strip().rstrip("x")
+    if value.endswith("kbits/s"):
+        value = value[:-len("kbits/s")]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class CaptureTelemetry:
+    """
+    Live statistics for one capture, shared by the ffmpeg and native engines.
+
+    `stats` always holds the latest complete sample, and `last_advance` is
+    the monotonic time media time last moved forward, so a stalled upstream
+    (speed=0x, no new packets) is visible within seconds instead of being
+    hidden behind a wall-clock timer.
+    """
+
+    def __init__(self, stall_timeout: float = 20.0, stderr_lines: int = 50):
+        self.stall_timeout = stall_timeout
+        self.stderr_tail = deque(maxlen=stderr_lines)
+        self.stats: Dict[str, float] = {
+            'out_time': 0.0,
+            'total_size': 0,
+            'bitrate_kbps': 0.0,
+            'speed': 0.0,
+            'frame': 0,
+            'dup_frames': 0,
+            'drop_frames': 0,
+        }
+        self.finished = False
+        self.started_at = time.monotonic()
+        self.last_update = self.started_at
+        self.last_advance = self.started_at
+
+    def advance(self, out_time: float, total_size: int):
+        """Records new media time/bytes from an engine that has no -progress feed."""
+        now = time.monotonic()
+        if out_time > self.stats['out_time']:
+            self.last_advance = now
+        self.stats['out_time'] = out_time
+        self.stats['total_size'] = total_size
+        if out_time > 0:
+            self.stats['bitrate_kbps'] = round(total_size * 8 / 1000 / out_time, 1)
+        wall = now - self.started_at
+        self.stats['speed'] = round(out_time / wall, 2) if wall > 0 else 0.0
+        self.last_update = now
+
+    def log_error(self, text: str):
+        self.stderr_tail.append(text)
+
+    def stalled_for(self) -> float:
+        """Seconds since media time last advanced."""
+        return time.monotonic() - self.last_advance
+
+    def is_stalled(self) -> bool:
+        return not self.finished and self.stalled_for() >= self.stall_timeout
+
+    def error_text(self, limit: int = 200) -> str:
+        """Most recent error output, for error captions."""
+        if not self.stderr_tail:
+            return "Unknown error"
+        return self.stderr_tail[-1][:limit]
+
+    def snapshot(self) -> Dict[str, float]:
+        """Stats plus derived stall information, for ACTIVE_RECORDINGS and /status."""
+        snap = dict(self.stats)
+        snap['stalled'] = self.is_stalled()
+        snap['stalled_for'] = round(self.stalled_for(), 1)
+        return snap
+
+
+class FFmpegProgress(CaptureTelemetry):
+    """Consumes ffmpeg's `-progress pipe:1` output and a bounded stderr ring buffer."""
+
+    def __init__(self, stall_timeout: float = 20.0, stderr_lines: int = 50):
+        super().__init__(stall_timeout, stderr_lines)
+        self._block: Dict[str, str] = {}
+
+    def _apply_block(self):
+        block = self._block
+        self._block = {}
+        now = time.monotonic()
+
+        out_time_us = block.get('out_time_us') or block.get('out_time_ms')
+        if out_time_us and out_time_us.lstrip('-').isdigit():
+            out_time = max(0.0, int(out_time_us) / 1_000_000)
+            if out_time > self.stats['out_time']:
+                self.last_advance = now
+            self.stats['out_time'] = out_time
+
+        for key in ('total_size', 'frame', 'dup_frames', 'drop_frames'):
+            if block.get(key, '').isdigit():
+                self.stats[key] = int(block[key])
+
+        bitrate = _parse_float(block.get('bitrate', ''))
+        if bitrate is not None:
+            self.stats['bitrate_kbps'] = bitrate
+        speed = _parse_float(block.get('speed', ''))
+        self.stats['speed'] = speed if speed is not None else 0.0
+
+        self.last_update = now
+        if block.get('progress') == 'end':
+            self.finished = True
+
+    def feed_line(self, line: str):
+        """Feeds one line of `-progress` output; a `progress=` line closes a block."""
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return
+        self._block[key] = value.strip()
+        if key == 'progress':
+            self._apply_block()
+
+    async def _read_progress(self, stream: asyncio.StreamReader):
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            self.feed_line(line.decode(errors='replace'))
+
+    async def _read_stderr(self, stream: asyncio.StreamReader):
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            text = line.decode(errors='replace').strip()
+            if text:
+                self.stderr_tail.append(text)
+
+    async def consume(self, process: asyncio.subprocess.Process):
+        """Reads stdout telemetry and stderr until ffmpeg closes both pipes."""
+        readers = []
+        if process.stdout:
+            readers.append(self._read_progress(process.stdout))
+        if process.stderr:
+            readers.append(self._read_stderr(process.stderr))
+        try:
+            await asyncio.gather(*readers)
+        except Exception as e:
+            logger.warning(f"[FFmpeg Progress] Telemetry reader stopped: {e}")
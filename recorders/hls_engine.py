@@ -0,0 +1,598 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+import aiofiles
+
+from recorders.recorder_utils import get_http_session
+from recorders.ffmpeg_progress import CaptureTelemetry
+from recorders.keyframe_index import KeyframeIndexWriter
+from config import HLS_VARIANT_POLICY, VARIANT_BUDGET_MBPS, ADAPTIVE_VARIANTS, DOWNSHIFT_SPEED, KEYFRAME_INDEX
+
+logger = logging.getLogger(__name__)
+
+FMP4_EXTENSIONS = ('.m4s', '.mp4', '.m4v', '.cmfv')
+MAX_PLAYLIST_BYTES = 2 * 1024 * 1024
+
+
+class HLSError(Exception):
+    """Raised when a stream can't be captured natively; callers fall back to ffmpeg."""
+
+
+def _parse_attributes(attr_text: str) -> Dict[str, str]:
+    """Parses an HLS attribute list like `BANDWIDTH=1280000,RESOLUTION=1280x720,CODECS="a,b"`."""
+    attrs = {}
+    key, value, in_quotes = "", "", False
+    reading_key = True
+    for ch in attr_text + ",":
+        if reading_key:
+            if ch == "=":
+                reading_key = False
+            elif ch != ",":
+                key += ch
+        elif ch == '"':
+            in_quotes = not in_quotes
+        elif ch == "," and not in_quotes:
+            attrs[key.strip().upper()] = value
+            key, value, reading_key = "", "", True
+        else:
+            value += ch
+    return attrs
+
+
+def parse_playlist(text: str, base_url: str) -> Dict[str, any]:
+    """
+    Parses a master or media m3u8 playlist.
+
+    Args:
+        text: Playlist body
+        base_url: URL the playlist was fetched from, for resolving relative URIs
+
+    Returns:
+        Dict with `variants` (master playlists) or `segments`, `media_sequence`,
+        `target_duration`, `init_uri`, `endlist` and `encrypted` (media playlists)
+    """
+    if not text.lstrip("\ufeff \r\n\t").startswith("#EXTM3U"):
+        raise HLSError("Not an HLS playlist")
+
+    playlist = {
+        'variants': [],
+        'segments': [],
+        'media_sequence': 0,
+        'target_duration': 6.0,
+        'init_uri': None,
+        'endlist': False,
+        'encrypted': False,
+    }
+    pending_variant = None
+    pending_duration = None
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            attrs = _parse_attributes(line.split(":", 1)[1])
+            resolution = None
+            if "x" in attrs.get("RESOLUTION", ""):
+                w, h = attrs["RESOLUTION"].lower().split("x", 1)
+                if w.isdigit() and h.isdigit():
+                    resolution = (int(w), int(h))
+            pending_variant = {
+                'bandwidth': int(attrs.get("BANDWIDTH", "0") or 0),
+                'resolution': resolution,
+                'codecs': attrs.get("CODECS", ""),
+            }
+        elif line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            playlist['media_sequence'] = int(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-TARGETDURATION:"):
+            playlist['target_duration'] = float(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-MAP:"):
+            uri = _parse_attributes(line.split(":", 1)[1]).get("URI")
+            if uri:
+                playlist['init_uri'] = urljoin(base_url, uri)
+        elif line.startswith("#EXT-X-KEY:"):
+            method = _parse_attributes(line.split(":", 1)[1]).get("METHOD", "NONE")
+            if method.upper() != "NONE":
+                playlist['encrypted'] = True
+        elif line.startswith("#EXTINF:"):
+            pending_duration = float(line.split(":", 1)[1].split(",", 1)[0] or 0)
+        elif line.startswith("#EXT-X-ENDLIST"):
+            playlist['endlist'] = True
+        elif not line.startswith("#"):
+            uri = urljoin(base_url, line)
+            if pending_variant is not None:
+                pending_variant['uri'] = uri
+                playlist['variants'].append(pending_variant)
+                pending_variant = None
+            else:
+                playlist['segments'].append({
+                    'seq': playlist['media_sequence'] + len(playlist['segments']),
+                    'uri': uri,
+                    'duration': pending_duration or playlist['target_duration'],
+                })
+                pending_duration = None
+
+    return playlist
+
+
+async def fetch_playlist(session: aiohttp.ClientSession, url: str, timeout: float = 10) -> Dict[str, any]:
+    """Fetches and parses a playlist, resolving relative URIs against the final (redirected) URL."""
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        response.raise_for_status()
+        # Direct .ts/.mp4 live URLs never end, so don't read more than a playlist could be
+        body = b""
+        while len(body) <= MAX_PLAYLIST_BYTES:
+            chunk = await response.content.read(64 * 1024)
+            if not chunk:
+                break
+            body += chunk
+            head = body.lstrip(b"\xef\xbb\xbf \r\n\t")[:7]
+            if not b"#EXTM3U".startswith(head):
+                raise HLSError("Not an HLS playlist")
+        else:
+            raise HLSError("Playlist too large")
+        playlist = parse_playlist(body.decode(errors="replace"), str(response.url))
+        playlist['url'] = str(response.url)
+        return playlist
+
+
+class VariantPolicy:
+    """
+    Chooses a rendition from a master playlist and the next one down when the box can't keep up.
+
+    Modes:
+        max_bitrate: Highest BANDWIDTH (the previous behaviour)
+        max_resolution: Largest picture, highest bitrate among equals
+        fit: Highest bitrate within `budget_bps`, i.e. uplink / concurrent jobs;
+             the lowest rendition if none fits
+    """
+
+    MODES = ("max_bitrate", "max_resolution", "fit")
+
+    def __init__(self, mode: str = "max_bitrate", budget_bps: float = 0, adaptive: bool = True,
+                 max_lag_segments: int = 3, downshift_speed: float = 0.9):
+        if mode not in self.MODES:
+            logger.warning(f"[HLS Engine] Unknown variant policy '{mode}', using max_bitrate")
+            mode = "max_bitrate"
+        self.mode = mode
+        self.budget_bps = budget_bps
+        self.adaptive = adaptive
+        self.max_lag_segments = max_lag_segments
+        self.downshift_speed = downshift_speed
+
+    def select(self, variants: List[Dict[str, any]]) -> Dict[str, any]:
+        if self.mode == "max_resolution":
+            return max(variants, key=lambda v: ((v['resolution'] or (0, 0))[0] * (v['resolution'] or (0, 0))[1], v['bandwidth']))
+        if self.mode == "fit" and self.budget_bps:
+            fitting = [v for v in variants if v['bandwidth'] <= self.budget_bps]
+            if fitting:
+                return max(fitting, key=lambda v: v['bandwidth'])
+            return min(variants, key=lambda v: v['bandwidth'])
+        return max(variants, key=lambda v: v['bandwidth'])
+
+    def lower(self, variants: List[Dict[str, any]], current: Optional[Dict[str, any]]) -> Optional[Dict[str, any]]:
+        """Next rendition below `current` by bandwidth, or None if it is already the lowest."""
+        if not current:
+            return None
+        below = [v for v in variants if v['bandwidth'] < current['bandwidth']]
+        return max(below, key=lambda v: v['bandwidth']) if below else None
+
+
+async def load_media_playlist(session: aiohttp.ClientSession, url: str,
+                              policy: Optional[VariantPolicy] = None) -> Dict[str, any]:
+    """Fetches a playlist and, if it is a master playlist, the variant the policy picks."""
+    policy = policy or default_variant_policy
+    playlist = await fetch_playlist(session, url)
+    if playlist['variants']:
+        variants = playlist['variants']
+        variant = policy.select(variants)
+        playlist = await fetch_playlist(session, variant['uri'])
+        playlist['variant'] = variant
+        playlist['variants'] = variants
+    if not playlist['segments'] and not playlist['endlist']:
+        raise HLSError("Media playlist has no segments")
+    if playlist['encrypted']:
+        raise HLSError("Encrypted HLS is not supported by the native engine")
+    return playlist
+
+
+class HLSSource:
+    """
+    One upstream pull of an HLS media playlist, fanned out to any number of subscribers.
+
+    Segments are fetched concurrently (bounded by `prefetch`) with per-segment
+    retries over the shared pooled session and published strictly in
+    sequence order. Each subscriber gets its own queue of events:
+    `('segment', segment, data)`, `('gap', missing_segments, approx_duration)`
+    and finally `('end', error_text_or_None)`. A subscriber only sees segments
+    published after it subscribed, so every recording keeps its own window.
+    The pull stops as soon as the last subscriber leaves.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, playlist: Dict[str, any],
+                 prefetch: int = 4, retries: int = 3, policy: Optional["VariantPolicy"] = None):
+        self.session = session
+        self.media_url = playlist['url']
+        self.policy = policy or default_variant_policy
+        self.variant: Optional[Dict[str, any]] = playlist.get('variant')
+        self.variants: List[Dict[str, any]] = playlist['variants']
+        self.prefetch = max(1, prefetch)
+        self.retries = max(1, retries)
+        self.extension = ".ts"
+        self.init_data: Optional[bytes] = None
+        self.error: Optional[str] = None
+
+        self._playlist = playlist
+        self._semaphore = asyncio.Semaphore(self.prefetch)
+        self._subscribers: List[asyncio.Queue] = []
+        self._task: Optional[asyncio.Task] = None
+
+        first_uri = playlist['init_uri'] or (playlist['segments'][0]['uri'] if playlist['segments'] else "")
+        if os.path.splitext(urlparse(first_uri).path)[1].lower() in FMP4_EXTENSIONS:
+            self.extension = ".mp4"
+
+    @classmethod
+    async def open(cls, session: aiohttp.ClientSession, url: str, prefetch: int = 4, retries: int = 3,
+                   policy: Optional["VariantPolicy"] = None) -> "HLSSource":
+        """Loads the playlist (and fMP4 init segment); raises HLSError if the stream isn't supported."""
+        try:
+            playlist = await load_media_playlist(session, url, policy)
+        except aiohttp.ClientError as e:
+            raise HLSError(f"Playlist fetch failed: {e}") from e
+        source = cls(session, playlist, prefetch, retries, policy)
+        if playlist['init_uri']:
+            source.init_data = await source._fetch_bytes(playlist['init_uri'])
+            if source.init_data is None:
+                raise HLSError("Could not fetch fMP4 init segment")
+        return source
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def finished(self) -> bool:
+        return self._task is not None and self._task.done()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+        if not self._subscribers and self.running:
+            self._task.cancel()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _publish(self, event: tuple):
+        for queue in list(self._subscribers):
+            queue.put_nowait(event)
+
+    async def _fetch_bytes(self, url: str) -> Optional[bytes]:
+        """Fetches one segment with retries; returns None once retries are exhausted."""
+        async with self._semaphore:
+            for attempt in range(self.retries):
+                try:
+                    async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                        response.raise_for_status()
+                        return await response.read()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"[HLS Engine] Segment fetch failed ({attempt + 1}/{self.retries}): {e}")
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+        return None
+
+    def _downshift(self) -> bool:
+        """Switches the pull to the next lower rendition; False if there is none or it can't switch."""
+        # fMP4 renditions each have their own init segment, which subscribers already received
+        if not self.policy.adaptive or self.init_data is not None:
+            return False
+        lower = self.policy.lower(self.variants, self.variant)
+        if not lower:
+            return False
+        logger.warning(
+            f"[HLS Engine] Download falling behind real time, switching {self.media_url} "
+            f"from {self.variant['bandwidth'] // 1000} to {lower['bandwidth'] // 1000} kbps"
+        )
+        self.variant = lower
+        self.media_url = lower['uri']
+        return True
+
+    async def _pull(self):
+        playlist = self._playlist
+        in_flight = deque()
+        next_seq = playlist['segments'][-1]['seq'] if playlist['segments'] and not playlist['endlist'] else playlist['media_sequence']
+        playlist_failures = 0
+        next_poll = time.monotonic()
+        behind_polls = 0
+        switched = False
+
+        try:
+            while self._subscribers:
+                if playlist is not None:
+                    segments = playlist['segments']
+                    if switched and segments and next_seq > segments[-1]['seq'] + 1:
+                        # Renditions aren't sequence-aligned; rejoin the new one at its live edge
+                        next_seq = segments[-1]['seq']
+                    fell_off = bool(segments) and next_seq < segments[0]['seq']
+                    if fell_off:
+                        # Fell behind the live window; the skipped segments are gone upstream
+                        missing = segments[0]['seq'] - next_seq
+                        logger.warning(f"[HLS Engine] Missed {missing} segment(s) of {self.media_url}")
+                        self._publish(('gap', missing, missing * playlist['target_duration']))
+                        next_seq = segments[0]['seq']
+                    # Segments still downloading when new ones are listed = not keeping up with real time
+                    if fell_off and not switched:
+                        behind_polls = 3
+                    elif len(in_flight) > self.policy.max_lag_segments:
+                        behind_polls += 1
+                    else:
+                        behind_polls = 0
+                    switched = False
+                    if behind_polls >= 3 and self._downshift():
+                        # Re-fetch everything not yet downloaded from the lower rendition
+                        while in_flight and not all(task.done() for _, task in in_flight):
+                            segment, task = in_flight.pop()
+                            task.cancel()
+                            next_seq = segment['seq']
+                        behind_polls = 0
+                        switched = True
+                        next_poll = time.monotonic()
+                        playlist = None
+                        continue
+                    for segment in segments:
+                        if segment['seq'] >= next_seq:
+                            in_flight.append((segment, asyncio.create_task(self._fetch_bytes(segment['uri']))))
+                            next_seq = segment['seq'] + 1
+                    target_duration = playlist['target_duration']
+                    endlist = playlist['endlist']
+                    next_poll = time.monotonic() + (target_duration if segments else target_duration / 2)
+                    playlist = None
+
+                while in_flight and in_flight[0][1].done():
+                    segment, task = in_flight.popleft()
+                    data = task.result()
+                    if data is None:
+                        self._publish(('gap', 1, segment['duration']))
+                    else:
+                        self._publish(('segment', segment, data))
+
+                if endlist and not in_flight:
+                    return
+
+                timeout = max(0.0, next_poll - time.monotonic())
+                if in_flight:
+                    await asyncio.wait([in_flight[0][1]], timeout=timeout)
+                else:
+                    await asyncio.sleep(timeout)
+
+                if time.monotonic() >= next_poll and not endlist:
+                    try:
+                        playlist = await fetch_playlist(self.session, self.media_url)
+                        playlist_failures = 0
+                    except Exception as e:
+                        playlist_failures += 1
+                        logger.warning(f"[HLS Engine] Playlist refresh failed ({playlist_failures}): {e}")
+                        if playlist_failures >= self.retries * 3:
+                            raise HLSError(f"Playlist unavailable: {e}")
+                        next_poll = time.monotonic() + target_duration / 2
+        finally:
+            for _, task in in_flight:
+                task.cancel()
+
+    async def _run(self):
+        try:
+            await self._pull()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"[HLS Engine] Pull of {self.media_url} failed: {e}")
+            self.error = str(e)
+        finally:
+            self._publish(('end', self.error))
+
+
+class HLSCapture:
+    """
+    Native asyncio HLS recorder: consumes an HLSSource and appends segments to disk.
+
+    Segments are written strictly in sequence order without decoding. The
+    source is either private to this capture or shared through the ingest
+    hub so concurrent recordings of one channel pull it once. Exposes the
+    same `returncode` / `wait()` / `terminate()` surface as an ffmpeg
+    process so the recorder and cancel handler treat both engines alike,
+    and a `CaptureTelemetry` for captions.
+
+    Split recordings roll to a new part after `split_duration` seconds,
+    or before a segment that would take the part past `split_bytes`
+    (segments start on keyframes, so every part starts on one).
+    """
+
+    def __init__(self, playlist_url: str, output_base: str, duration: float = 0,
+                 split_duration: Optional[float] = None, segment_list_path: Optional[str] = None,
+                 prefetch: int = 4, retries: int = 3, stall_timeout: float = 20.0, shared: bool = False,
+                 segment_start: int = 0, split_bytes: Optional[int] = None):
+        self.playlist_url = playlist_url
+        self.output_base = output_base
+        self.duration = duration
+        self.split_duration = split_duration
+        self.split_bytes = split_bytes
+        self.segment_list_path = segment_list_path
+        self.prefetch = prefetch
+        self.retries = retries
+        self.shared = shared
+        self.telemetry = CaptureTelemetry(stall_timeout=stall_timeout)
+
+        self.extension = ".ts"
+        self.output_path: Optional[str] = None
+        self.returncode: Optional[int] = None
+        self.gaps: List[Dict[str, float]] = []
+
+        self._source: Optional[HLSSource] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._done = asyncio.Event()
+        self._file = None
+        self._current_path: Optional[str] = None
+        self._index: Optional[KeyframeIndexWriter] = None
+        self._part_index = segment_start - 1
+        self._part_media_time = 0.0
+        self._part_bytes = 0
+        self._media_time = 0.0
+        self._bytes_written = 0
+        self._segments_written = 0
+        self._part_segments = 0
+
+    # ── Process-like surface ──
+
+    async def start(self):
+        """Attaches to the stream and starts capturing; raises HLSError if the stream isn't supported."""
+        if self.shared:
+            from recorders.ingest_hub import ingest_hub
+            self._source, self._queue = await ingest_hub.attach(self.playlist_url)
+        else:
+            self._source = await HLSSource.open(get_http_session(), self.playlist_url, self.prefetch, self.retries)
+            self._queue = self._source.subscribe()
+
+        self.extension = self._source.extension
+        if not self._splitting:
+            self.output_path = f"{self.output_base}{self.extension}"
+        self._task = asyncio.create_task(self._run())
+
+    async def wait(self) -> int:
+        await self._done.wait()
+        return self.returncode
+
+    def terminate(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    # ── Output files ──
+
+    @property
+    def _splitting(self) -> bool:
+        return bool(self.split_duration or self.split_bytes)
+
+    def _should_roll(self, next_size: int) -> bool:
+        if self._file is None or not self._part_segments:
+            return False
+        if self.split_duration and self._part_media_time >= self.split_duration:
+            return True
+        return bool(self.split_bytes) and self._part_bytes + next_size > self.split_bytes
+
+    async def _open_part(self):
+        self._part_index += 1
+        if self._splitting:
+            path = f"{self.output_base}_{self._part_index:03d}{self.extension}"
+        else:
+            path = self.output_path
+        self._file = await aiofiles.open(path, "wb")
+        self._current_path = path
+        self._part_media_time = 0.0
+        self._part_bytes = 0
+        self._part_segments = 0
+        if self._source.init_data:
+            await self._file.write(self._source.init_data)
+            self._bytes_written += len(self._source.init_data)
+            self._part_bytes += len(self._source.init_data)
+        if KEYFRAME_INDEX:
+            self._index = KeyframeIndexWriter(path, self._part_bytes)
+            await self._index.open()
+
+    async def _close_part(self):
+        if self._file is None:
+            return
+        await self._file.close()
+        self._file = None
+        if self._index:
+            await self._index.close(self._part_media_time, self._part_bytes)
+            self._index = None
+        if self.segment_list_path:
+            # Same CSV manifest ffmpeg's segment muxer writes, so the upload pipeline can follow it
+            start = self._media_time - self._part_media_time
+            async with aiofiles.open(self.segment_list_path, "a") as manifest:
+                await manifest.write(f"{os.path.basename(self._current_path)},{start:.3f},{self._media_time:.3f}\n")
+
+    async def _write_segment(self, segment: Dict[str, any], data: bytes):
+        if self._should_roll(len(data)):
+            await self._close_part()
+        if self._file is None:
+            await self._open_part()
+        if self._index:
+            # Every HLS segment starts on a keyframe
+            await self._index.add(self._part_media_time, self._part_bytes)
+        await self._file.write(data)
+        self._bytes_written += len(data)
+        self._part_bytes += len(data)
+        self._media_time += segment['duration']
+        self._part_media_time += segment['duration']
+        self._part_segments += 1
+        self._segments_written += 1
+        self.telemetry.advance(self._media_time, self._bytes_written)
+
+    def _record_gap(self, missing_segments: int, approx_duration: float):
+        self.gaps.append({'at': round(self._media_time, 3), 'segments': missing_segments,
+                          'duration': round(approx_duration, 3)})
+        self.telemetry.log_error(f"Gap of {missing_segments} segment(s) (~{approx_duration:.1f}s) at {self._media_time:.1f}s")
+
+    # ── Capture loop ──
+
+    async def _capture(self):
+        while not (self.duration and self._media_time >= self.duration):
+            event = await self._queue.get()
+            kind = event[0]
+            if kind == 'segment':
+                await self._write_segment(event[1], event[2])
+            elif kind == 'gap':
+                self._record_gap(event[1], event[2])
+            elif kind == 'end':
+                if event[1]:
+                    raise HLSError(event[1])
+                return
+
+    async def _run(self):
+        try:
+            await self._capture()
+            self.returncode = 0 if self._segments_written else 1
+            if not self._segments_written:
+                self.telemetry.log_error("No segments could be downloaded")
+        except asyncio.CancelledError:
+            self.returncode = -15
+        except Exception as e:
+            logger.error(f"[HLS Engine] Capture failed: {e}")
+            self.telemetry.log_error(str(e))
+            self.returncode = 1
+        finally:
+            if self.shared:
+                from recorders.ingest_hub import ingest_hub
+                ingest_hub.detach(self._source, self._queue)
+            else:
+                self._source.unsubscribe(self._queue)
+            try:
+                await self._close_part()
+            except Exception as e:
+                logger.error(f"[HLS Engine] Error closing output: {e}")
+            self.telemetry.finished = True
+            self._done.set()
+
+
+default_variant_policy = VariantPolicy(
+    HLS_VARIANT_POLICY,
+    budget_bps=VARIANT_BUDGET_MBPS * 1_000_000,
+    adaptive=ADAPTIVE_VARIANTS,
+    downshift_speed=DOWNSHIFT_SPEED,
+)
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from typing import Dict, Tuple
+
+from recorders.recorder_utils import get_http_session
+from recorders.hls_engine import HLSSource
+from config import HLS_PREFETCH, HLS_SEGMENT_RETRIES
+
+logger = logging.getLogger(__name__)
+
+
+class IngestHub:
+    """
+    Shares one upstream HLS pull per resolved stream URL between every concurrent recording.
+
+    The first recording of a channel opens the HLSSource; later recordings
+    attach to it and receive segments from that moment on, each with its own
+    output and stop time. The pull is closed when the last recording detaches.
+    """
+
+    def __init__(self, prefetch: int = 4, retries: int = 3):
+        self.prefetch = prefetch
+        self.retries = retries
+        self._sources: Dict[str, HLSSource] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def attach(self, url: str) -> Tuple[HLSSource, asyncio.Queue]:
+        """
+        Subscribes to the shared pull for `url`, opening it if needed.
+
+        Raises:
+            HLSError: If the URL isn't an HLS stream the native engine can read
+        """
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            source = self._sources.get(url)
+            if source is None or source.finished:
+                source = await HLSSource.open(get_http_session(), url, self.prefetch, self.retries)
+                self._sources[url] = source
+                logger.info(f"[Ingest Hub] Opened upstream pull for {url}")
+            queue = source.subscribe()
+        logger.info(f"[Ingest Hub] {source.subscriber_count} recording(s) sharing {url}")
+        return source, queue
+
+    def detach(self, source: HLSSource, queue: asyncio.Queue):
+        source.unsubscribe(queue)
+        for url, shared in list(self._sources.items()):
+            if shared is source and source.subscriber_count == 0:
+                del self._sources[url]
+                self._locks.pop(url, None)
+                logger.info(f"[Ingest Hub] Closed upstream pull for {url}")
+
+    def stats(self) -> Dict[str, int]:
+        """Subscriber count per shared upstream, for /status."""
+        return {url: source.subscriber_count for url, source in self._sources.items()}
+
+
+async def feed_process(source: HLSSource, queue: asyncio.Queue, process: asyncio.subprocess.Process):
+    """
+    Pipes a shared segment feed into an ffmpeg process reading `-i pipe:0`.
+
+    Lets ffmpeg-engine recordings keep their muxing options (mkv output,
+    segment muxer) while the upstream is pulled only once per channel.
+    Detaches from the hub when ffmpeg exits, the feed ends or the task is cancelled.
+    """
+    try:
+        if source.init_data:
+            process.stdin.write(source.init_data)
+            await process.stdin.drain()
+        while process.returncode is None:
+            event = await queue.get()
+            if event[0] == 'segment':
+                process.stdin.write(event[2])
+                await process.stdin.drain()
+            elif event[0] == 'end':
+                break
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        ingest_hub.detach(source, queue)
+        try:
+            process.stdin.close()
+        except Exception:
+            pass
+
+
+ingest_hub = IngestHub(prefetch=HLS_PREFETCH, retries=HLS_SEGMENT_RETRIES)
@@ -0,0 +1,446 @@
+import os
+import shutil
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import aiofiles
+
+from recorders.recorder_utils import get_video_duration
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".kfi"
+INDEX_HEADER = "KFI1"
+# Keyframes closer together than this aren't worth an entry in a probed index
+MIN_SPACING = 1.0
+COPY_CHUNK = 1024 * 1024
+
+
+class ClipError(Exception):
+    """Raised when a range can't be cut out of a recording."""
+
+
+def index_path(media_path: str) -> str:
+    """Sidecar path of a media file's keyframe index."""
+    return f"{media_path}{INDEX_SUFFIX}"
+
+
+def is_index_file(path: str) -> bool:
+    return path.endswith(INDEX_SUFFIX)
+
+
+def remove_index(media_path: str):
+    """Deletes a file's sidecar, if it has one."""
+    try:
+        os.remove(index_path(media_path))
+    except OSError:
+        pass
+
+
+def move_index(media_path: str, new_media_path: str):
+    """Keeps a sidecar next to its file after the file is moved."""
+    if os.path.exists(index_path(media_path)):
+        shutil.move(index_path(media_path), index_path(new_media_path))
+
+
+class KeyframeIndex:
+    """
+    Keyframe positions of one media file, as (media seconds, byte offset) pairs.
+
+    Stored next to the file as a small text sidecar (`<file>.kfi`):
+
+        KFI1 <init segment bytes> <origin>
+        <seconds>,<offset>
+        ...
+        END <duration>,<file size>
+
+    The native engine writes it while capturing (origin `hls`): every HLS
+    segment starts on a keyframe with its own stream headers, so each segment
+    boundary is an entry and the bytes between two entries play on their own.
+    Files without one (ffmpeg engine, stitched pieces) get it from a single
+    demux-only ffprobe pass the first time it's needed (origin `probe`). An
+    index whose END size doesn't match the file any more (the file was
+    remuxed) is ignored and rebuilt.
+    """
+
+    def __init__(self, entries: Optional[List[Tuple[float, int]]] = None, init_size: int = 0,
+                 duration: Optional[float] = None, size: Optional[int] = None, origin: str = "probe"):
+        self.entries = entries or []
+        self.init_size = init_size
+        self.origin = origin
+        self.duration = duration
+        self.size = size
+
+    @classmethod
+    def load(cls, media_path: str) -> Optional["KeyframeIndex"]:
+        """Reads a file's sidecar; None if it's missing, unreadable or stale."""
+        try:
+            with open(index_path(media_path)) as f:
+                lines = f.read().splitlines()
+            size = os.path.getsize(media_path)
+        except OSError:
+            return None
+        if not lines or not lines[0].startswith(INDEX_HEADER):
+            return None
+
+        index = cls()
+        try:
+            header = lines[0].split()
+            index.init_size = int(header[1])
+            index.origin = header[2]
+            for line in lines[1:]:
+                if line.startswith("END "):
+                    duration, index_size = line[4:].split(",")
+                    index.duration, index.size = float(duration), int(index_size)
+                elif line:
+                    seconds, offset = line.split(",")
+                    index.entries.append((float(seconds), int(offset)))
+        except (IndexError, ValueError):
+            return None
+
+        if index.size is not None and index.size != size:
+            return None
+        # A capture that's still running (or died) has no END line yet; trust what's on disk
+        index.entries = [entry for entry in index.entries if entry[1] < size]
+        index.size = size
+        return index
+
+    def save(self, media_path: str):
+        lines = [f"{INDEX_HEADER} {self.init_size} {self.origin}"]
+        lines.extend(f"{seconds:.3f},{offset}" for seconds, offset in self.entries)
+        if self.duration is not None and self.size is not None:
+            lines.append(f"END {self.duration:.3f},{self.size}")
+        with open(index_path(media_path), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    @property
+    def byte_copyable(self) -> bool:
+        """Whether the bytes between two entries (after the init segment) form a playable file."""
+        return self.origin == "hls"
+
+    def locate(self, start: float, end: Optional[float]) -> Tuple[int, Optional[int]]:
+        """
+        Entry range covering [start, end] on keyframe boundaries.
+
+        Returns:
+            Index of the keyframe at or before `start`, and of the first one at
+            or after `end` (None when the range runs to the end of the file)
+        """
+        times = [seconds for seconds, _ in self.entries]
+        first = max(bisect_right(times, start) - 1, 0)
+        if end is None:
+            return first, None
+        last = bisect_left(times, end, lo=first + 1)
+        return first, last if last < len(self.entries) else None
+
+
+class KeyframeIndexWriter:
+    """Appends one entry per keyframe while a capture writes its output file."""
+
+    def __init__(self, media_path: str, init_size: int = 0):
+        self.path = index_path(media_path)
+        self.init_size = init_size
+        self._file = None
+
+    async def open(self):
+        self._file = await aiofiles.open(self.path, "w")
+        await self._file.write(f"{INDEX_HEADER} {self.init_size} hls\n")
+
+    async def add(self, seconds: float, offset: int):
+        # Flushed per entry so a recording can be clipped while it's still running
+        await self._file.write(f"{seconds:.3f},{offset}\n")
+        await self._file.flush()
+
+    async def close(self, duration: float, size: int):
+        if self._file is None:
+            return
+        await self._file.write(f"END {duration:.3f},{size}\n")
+        await self._file.close()
+        self._file = None
+
+
+async def build_index(media_path: str) -> Optional[KeyframeIndex]:
+    """
+    Indexes a file's keyframes with one demux-only ffprobe pass (no decoding).
+
+    Uses the first video stream, or the first audio stream of radio-style
+    channels. Entries are thinned to at most one per MIN_SPACING seconds.
+    """
+    for stream in ("v:0", "a:0"):
+        cmd = [
+            "ffprobe", "-v", "error", "-select_streams", stream,
+            "-show_entries", "packet=pts_time,pos,flags", "-of", "csv=p=0", media_path
+        ]
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        entries: List[Tuple[float, int]] = []
+        origin = None
+        async for raw in process.stdout:
+            fields = raw.decode(errors="ignore").strip().split(",")
+            if len(fields) < 3 or "K" not in fields[2]:
+                continue
+            try:
+                seconds, offset = float(fields[0]), int(fields[1])
+            except ValueError:
+                continue  # N/A timestamp or position
+            if origin is None:
+                origin = seconds
+            seconds -= origin
+            if not entries or seconds - entries[-1][0] >= MIN_SPACING:
+                entries.append((seconds, offset))
+        await process.wait()
+        if entries:
+            duration = await get_video_duration(media_path)
+            return KeyframeIndex(entries, duration=duration, size=os.path.getsize(media_path))
+    return None
+
+
+async def get_index(media_path: str) -> Optional[KeyframeIndex]:
+    """The file's keyframe index, probing (and caching in the sidecar) when there's none yet."""
+    index = await asyncio.to_thread(KeyframeIndex.load, media_path)
+    if index is not None and index.entries:
+        return index
+    index = await build_index(media_path)
+    if index is not None:
+        try:
+            await asyncio.to_thread(index.save, media_path)
+        except OSError as e:
+            logger.warning(f"[Keyframes] Could not save index of {media_path}: {e}")
+    return index
+
+
+def _copy_range(source_path: str, output_path: str, init_size: int, start: int, end: Optional[int]) -> int:
+    written = 0
+    with open(source_path, "rb") as source, open(output_path, "wb") as output:
+        if init_size:
+            written += output.write(source.read(init_size))
+        source.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            chunk = source.read(COPY_CHUNK if remaining is None else min(COPY_CHUNK, remaining))
+            if not chunk:
+                break
+            written += output.write(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return written
+
+
+async def clip(media_path: str, start: float, end: Optional[float], output_path: str) -> Dict[str, any]:
+    """
+    Cuts [start, end] out of a finished recording without re-encoding.
+
+    The cut is widened to the keyframe at or before `start` and the first
+    one at or after `end`. Native-engine recordings are cut by copying just
+    that byte range (plus the fMP4 init segment, if any), without ffmpeg;
+    anything else goes through a stream-copy ffmpeg run that input-seeks
+    straight to the keyframe. A byte-cut clip gets its own index sidecar.
+
+    Args:
+        media_path: Recording to cut from
+        start: Clip start, in media seconds from the beginning of the file
+        end: Clip end in media seconds, or None for the rest of the file
+        output_path: File to write
+
+    Returns:
+        Dict with the clip's real start and end (media seconds), duration, size and method
+
+    Raises:
+        ClipError: If the file can't be indexed or the range is empty
+    """
+    if end is not None and end <= start:
+        raise ClipError("Clip end must be after its start")
+    index = await get_index(media_path)
+    if index is None or not index.entries:
+        raise ClipError(f"No keyframes found in {os.path.basename(media_path)}")
+    if index.duration is not None and start >= index.duration:
+        raise ClipError(f"Recording is only {index.duration:.0f}s long")
+
+    first, last = index.locate(start, end)
+    clip_start, start_offset = index.entries[first]
+    clip_end = index.entries[last][0] if last is not None else index.duration
+    end_offset = index.entries[last][1] if last is not None else None
+
+    if index.byte_copyable:
+        method = "bytes"
+        size = await asyncio.to_thread(_copy_range, media_path, output_path, index.init_size,
+                                       start_offset, end_offset)
+        shift = index.init_size - start_offset
+        clip_entries = [(seconds - clip_start, offset + shift)
+                        for seconds, offset in index.entries[first:last]]
+        clip_index = KeyframeIndex(clip_entries, index.init_size,
+                                   clip_end - clip_start if clip_end is not None else None, size, index.origin)
+        try:
+            await asyncio.to_thread(clip_index.save, output_path)
+        except OSError:
+            pass
+    else:
+        method = "ffmpeg"
+        cmd = ["ffmpeg", "-y", "-loglevel", "error", "-ss", f"{clip_start:.3f}", "-i", media_path]
+        if clip_end is not None:
+            cmd.extend(["-t", f"{clip_end - clip_start:.3f}"])
+        cmd.extend(["-map", "0", "-c", "copy", "-avoid_negative_ts", "make_zero", output_path])
+        process = await asyncio.create_subprocess_exec(*cmd, stderr=asyncio.subprocess.PIPE)
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise ClipError(f"ffmpeg failed: {stderr.decode().strip()[:200]}")
+        size = os.path.getsize(output_path)
+
+    return {
+        'start': clip_start,
+        'end': clip_end,
+        'duration': (clip_end - clip_start) if clip_end is not None else None,
+        'size': size,
+        'method': method,
+    }
+
+
+# A part planned from the average bitrate aims this far under the size limit, since the bitrate varies
+BITRATE_SPLIT_MARGIN = 0.9
+
+
+def plan_split(index: KeyframeIndex, max_size: int) -> List[Tuple[int, Optional[int]]]:
+    """
+    Byte ranges of the parts of an indexed file, each starting on a keyframe.
+
+    Every part is the longest run of whole GOPs that fits in `max_size`
+    together with the init segment; a single GOP bigger than that becomes a
+    part of its own.
+
+    Returns:
+        (start offset, end offset) per part; the last one ends at None (end of file)
+    """
+    budget = max_size - index.init_size
+    offsets = [offset for _, offset in index.entries]
+    ranges = []
+    first = 0
+    while True:
+        start = offsets[first]
+        if index.size - start <= budget:
+            ranges.append((start, None))
+            return ranges
+        last = bisect_right(offsets, start + budget, lo=first + 1) - 1
+        if last <= first:
+            last = first + 1  # One oversized GOP
+        if last >= len(offsets):
+            ranges.append((start, None))
+            return ranges
+        ranges.append((start, offsets[last]))
+        first = last
+
+
+def _copy_ranges(source_path: str, output_paths: List[str], init_size: int,
+                 ranges: List[Tuple[int, Optional[int]]]) -> None:
+    """Writes each range (after the init segment) to its own file in one sequential read of the source."""
+    with open(source_path, "rb") as source:
+        init = source.read(init_size) if init_size else b""
+        for output_path, (start, end) in zip(output_paths, ranges):
+            source.seek(start)
+            remaining = None if end is None else end - start
+            with open(output_path, "wb") as output:
+                output.write(init)
+                while remaining is None or remaining > 0:
+                    chunk = source.read(COPY_CHUNK if remaining is None else min(COPY_CHUNK, remaining))
+                    if not chunk:
+                        break
+                    output.write(chunk)
+                    if remaining is not None:
+                        remaining -= len(chunk)
+
+
+async def _segment(media_path: str, output_pattern: str, cut_args: List[str]) -> List[str]:
+    """One stream-copy ffmpeg pass through the segment muxer; returns the parts written."""
+    extension = os.path.splitext(media_path)[1]
+    ffmpeg_pattern = output_pattern.replace("%", "%%").format(n="%d")
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error", "-i", media_path,
+        "-map", "0", "-c", "copy", "-f", "segment", *cut_args,
+        "-segment_start_number", "1", "-reset_timestamps", "1",
+        *(["-segment_format_options", "movflags=+faststart"] if extension == ".mp4" else []),
+        ffmpeg_pattern
+    ]
+    process = await asyncio.create_subprocess_exec(*cmd, stderr=asyncio.subprocess.PIPE)
+    _, stderr = await process.communicate()
+    parts = []
+    n = 1
+    while os.path.exists(output_pattern.format(n=n)):
+        parts.append(output_pattern.format(n=n))
+        n += 1
+    if process.returncode != 0:
+        for part in parts:
+            os.remove(part)
+        raise ClipError(f"ffmpeg failed: {stderr.decode().strip()[:200]}")
+    return parts
+
+
+async def split_by_size(media_path: str, max_size: int, output_pattern: str) -> List[str]:
+    """
+    Splits a file into parts of at most `max_size` bytes, cut on keyframes, in one pass.
+
+    With a native-engine index (already on disk) the parts are byte ranges
+    between keyframes, copied in a single sequential read without ffmpeg.
+    With any other existing index, one stream-copy ffmpeg pass cuts at the
+    keyframes the index picked. Without an index, the file isn't probed
+    (that would be a second full read): one ffmpeg pass cuts at the
+    keyframes nearest to equal durations sized from the average bitrate,
+    BITRATE_SPLIT_MARGIN under the limit, and is only rerun with shorter
+    parts in the rare case a bitrate spike still overflows one.
+
+    Args:
+        media_path: File to split
+        max_size: Size limit per part, in bytes
+        output_pattern: Part path with a `{n}` placeholder for the 1-based part number
+
+    Returns:
+        Part paths in order (just `media_path` if it's already small enough)
+
+    Raises:
+        ClipError: If ffmpeg fails or the file has no usable duration
+    """
+    size = os.path.getsize(media_path)
+    if size <= max_size:
+        return [media_path]
+
+    index = await asyncio.to_thread(KeyframeIndex.load, media_path)
+    if index is not None and index.entries:
+        ranges = plan_split(index, max_size)
+        if index.byte_copyable:
+            parts = [output_pattern.format(n=n) for n in range(1, len(ranges) + 1)]
+            try:
+                await asyncio.to_thread(_copy_ranges, media_path, parts, index.init_size, ranges)
+            except OSError as e:
+                for part in parts:
+                    if os.path.exists(part):
+                        os.remove(part)
+                raise ClipError(f"Could not write parts: {e}")
+            method = "bytes"
+        else:
+            positions = {offset: i for i, (_, offset) in enumerate(index.entries)}
+            # Halfway from the previous keyframe, so ffmpeg's cut lands on the planned one despite timestamp jitter
+            times = ",".join(
+                f"{(index.entries[positions[start] - 1][0] + index.entries[positions[start]][0]) / 2:.3f}"
+                for start, _ in ranges[1:]
+            )
+            parts = await _segment(media_path, output_pattern, ["-segment_times", times])
+            method = "ffmpeg"
+    else:
+        duration = await get_video_duration(media_path)
+        if not duration:
+            raise ClipError(f"Can't split {os.path.basename(media_path)}: unknown duration")
+        part_seconds = duration * max_size * BITRATE_SPLIT_MARGIN / size
+        for _ in range(3):
+            parts = await _segment(media_path, output_pattern, ["-segment_time", f"{part_seconds:.3f}"])
+            if all(os.path.getsize(part) <= max_size for part in parts):
+                break
+            for part in parts:
+                os.remove(part)
+            part_seconds *= BITRATE_SPLIT_MARGIN
+        else:
+            raise ClipError(f"Could not split {os.path.basename(media_path)} under {max_size / 1048576:.0f} MB")
+        method = "ffmpeg"
+
+    logger.info(f"[Keyframes] Split {os.path.basename(media_path)} into {len(parts)} parts ({method})")
+    return parts
@@ -0,0 +1,76 @@
+import asyncio
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, List, TypeVar, Union
+
+from config import POSTPROCESS_WORKERS
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class PostProcessPool:
+    """
+    Bounded pool for the per-part work after a recording (thumbnail, ffprobe, trims).
+
+    `map_ordered` prepares every part of a recording as soon as it's
+    available, at most `workers` at a time across all recordings, and hands
+    the results back in part order. The uploader works through ready parts
+    one by one while later ones are prepared, so the ffmpeg/ffprobe time of
+    part N+1 is hidden behind the upload of part N.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.workers = max(1, workers)
+        self._semaphore = asyncio.Semaphore(self.workers)
+
+    async def run(self, prepare: Callable[[T], Awaitable[R]], item: T) -> R:
+        """Runs one job once a worker is free."""
+        async with self._semaphore:
+            return await prepare(item)
+
+    async def map_ordered(self, items: Union[Iterable[T], AsyncIterable[T]],
+                          prepare: Callable[[T], Awaitable[R]]) -> AsyncIterator[R]:
+        """
+        Prepares items concurrently in the pool and yields the results in item order.
+
+        Args:
+            items: The parts to prepare; an async iterable (e.g. segments closing
+                while recording) is consumed as it produces them
+            prepare: Coroutine function preparing one item
+
+        Yields:
+            Each item's result, in order, as soon as it and all earlier ones are ready
+        """
+        ready: asyncio.Queue = asyncio.Queue()
+        started: List[asyncio.Task] = []
+
+        def schedule(item: T):
+            task = asyncio.create_task(self.run(prepare, item))
+            started.append(task)
+            ready.put_nowait(task)
+
+        async def feed():
+            try:
+                if hasattr(items, "__aiter__"):
+                    async for item in items:
+                        schedule(item)
+                else:
+                    for item in items:
+                        schedule(item)
+            finally:
+                ready.put_nowait(None)
+
+        feeder = asyncio.create_task(feed())
+        try:
+            while True:
+                task = await ready.get()
+                if task is None:
+                    break
+                yield await task
+            await feeder  # Re-raises a failure of the item source
+        finally:
+            feeder.cancel()
+            for task in started:
+                task.cancel()
+
+
+post_process_pool = PostProcessPool(POSTPROCESS_WORKERS)
@@ -1,37 +1,150 @@
+import re
+import time
 import aiohttp
 import asyncio
 import logging
-from typing import Optional
+from typing import Dict, Optional
+from config import RESOLVE_CACHE_TTL, RESOLVE_EXPIRY_MARGIN
 
 logger = logging.getLogger(__name__)
 
+# Headers the IPTV CDN expects on every playlist/segment request
+STREAM_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "*/*",
+    "Referer": "https://www.tataplay.com/",
+    "Origin": "https://www.tataplay.com"
+}
 
-async def resolve_stream(url: str) -> str:
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Returns the process-wide pooled aiohttp session, creating it on first use.
+
+    Sharing one session keeps TCP/TLS connections to the CDN alive across
+    playlist polls and segment fetches of every capture.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(limit=200, limit_per_host=50, ttl_dns_cache=300)
+        _http_session = aiohttp.ClientSession(connector=connector, headers=STREAM_HEADERS)
+    return _http_session
+
+
+async def close_http_session():
+    """Closes the pooled session on shutdown."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
+# Expiry timestamps CDNs put in signed URLs (query params or Akamai-style `hdnts=exp=...~` tokens)
+_EXPIRY_RE = re.compile(r"(?:^|[?&~/;])(?:exp|expires|expiry|validto)=(\d{10,13})", re.IGNORECASE)
+
+
+def token_expiry(url: str) -> Optional[float]:
+    """Epoch seconds at which a signed stream URL stops working, if it says so."""
+    match = _EXPIRY_RE.search(url)
+    if not match:
+        return None
+    expiry = int(match.group(1))
+    return expiry / 1000 if expiry > 10 ** 12 else float(expiry)
+
+
+class StreamResolver:
+    """
+    Follows stream URL redirects through the pooled session, with a TTL cache.
+
+    Resolved targets are kept for `ttl` seconds, or until `expiry_margin`
+    seconds before the token in the target URL expires, whichever is sooner.
+    Concurrent resolutions of one URL share a single request, so a batch of
+    jobs scheduled for the same minute costs one lookup per channel.
+    """
+
+    def __init__(self, ttl: float = 300, expiry_margin: float = 60, max_entries: int = 1024):
+        self.ttl = ttl
+        self.expiry_margin = expiry_margin
+        self.max_entries = max_entries
+        self._cache: Dict[str, Dict[str, any]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, url: str, fresh: bool = False) -> str:
+        """
+        Resolves a stream URL to its redirect target.
+
+        Args:
+            url: Stream URL to resolve
+            fresh: Skip the cache, e.g. when reconnecting because the last target stopped working
+
+        Returns:
+            Resolved URL string (the input URL if resolution failed)
+        """
+        if url.endswith(".m3u8"):
+            return url
+        if fresh:
+            self._cache.pop(url, None)
+        else:
+            entry = self._cache.get(url)
+            if entry and entry['expires'] > time.time():
+                self.hits += 1
+                return entry['target']
+
+        task = self._inflight.get(url)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._fetch(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # Shielded so one cancelled job doesn't cancel the lookup the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url: str) -> str:
+        try:
+            async with get_http_session().get(url, timeout=aiohttp.ClientTimeout(total=10),
+                                              allow_redirects=True) as response:
+                target = str(response.url)
+        except Exception as e:
+            logger.error(f"[Stream Resolver] Error resolving stream: {e}")
+            return url
+
+        expires = time.time() + self.ttl
+        expiry = token_expiry(target)
+        if expiry is not None:
+            expires = min(expires, expiry - self.expiry_margin)
+        if expires > time.time():
+            self._store(url, target, expires)
+        return target
+
+    def _store(self, url: str, target: str, expires: float):
+        if len(self._cache) >= self.max_entries:
+            now = time.time()
+            for key in [key for key, entry in self._cache.items() if entry['expires'] <= now]:
+                del self._cache[key]
+            while len(self._cache) >= self.max_entries:
+                del self._cache[next(iter(self._cache))]
+        self._cache[url] = {'target': target, 'expires': expires}
+
+    def stats(self) -> Dict[str, int]:
+        return {'cached': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+
+async def resolve_stream(url: str, fresh: bool = False) -> str:
     """
     Resolves stream URLs, follows redirects for m3u8 streams.
-    
+
     Args:
         url: Stream URL to resolve
-        
+        fresh: Bypass the resolution cache
+
     Returns:
         Resolved URL string
     """
-    if url.endswith(".m3u8"):
-        return url
-    
-    try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Accept": "*/*",
-            "Referer": "https://www.tataplay.com/",
-            "Origin": "https://www.tataplay.com"
-        }
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, timeout=10, allow_redirects=True) as response:
-                return str(response.url) if response.url != url else url
-    except Exception as e:
-        logger.error(f"[Stream Resolver] Error resolving stream: {e}")
-        return url
+    return await stream_resolver.resolve(url, fresh)
 
 
 async def get_video_duration(file_path: str) -> Optional[float]:
@@ -138,3 +251,6 @@ async def get_stream_quality(file_path: str) -> str:
     except Exception as e:
         logger.error(f"[FFprobe] Unexpected error getting stream quality: {e}")
         return "Unknown"
+
+
+stream_resolver = StreamResolver(RESOLVE_CACHE_TTL, RESOLVE_EXPIRY_MARGIN)
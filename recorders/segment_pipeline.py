@@ -0,0 +1,86 @@
+import os
+import csv
+import glob
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, List, Set
+
+from recorders.keyframe_index import is_index_file
+
+logger = logging.getLogger(__name__)
+
+
+def _read_segment_list(list_path: str) -> List[str]:
+    """
+    Reads the segment names ffmpeg has written to a `-segment_list` CSV manifest.
+
+    ffmpeg only appends an entry once the segment file is closed, so every
+    name returned here is safe to move/upload. A trailing line without a
+    newline may still be in the middle of being written and is ignored.
+
+    Args:
+        list_path: Path to the CSV manifest
+
+    Returns:
+        Segment paths (joined with the manifest directory) in write order
+    """
+    if not os.path.exists(list_path):
+        return []
+
+    try:
+        with open(list_path, "r", newline="") as f:
+            content = f.read()
+    except OSError as e:
+        logger.warning(f"[Segment Watcher] Could not read segment list {list_path}: {e}")
+        return []
+
+    complete_lines = content.split("\n")[:-1]
+    base_dir = os.path.dirname(list_path)
+    segments = []
+    for row in csv.reader(complete_lines):
+        if row and row[0]:
+            segments.append(os.path.join(base_dir, row[0]))
+    return segments
+
+
+async def watch_segments(list_path: str, segment_glob: str, is_finished: Callable[[], bool],
+                         poll_interval: float = 2.0) -> AsyncIterator[str]:
+    """
+    Yields each segment closed by ffmpeg's segment muxer, in order, exactly once.
+
+    Closed segments are detected from the `-segment_list` manifest. As a
+    fallback (older ffmpeg builds buffer the manifest), a segment is also
+    considered closed as soon as a newer segment file exists next to it.
+    Once `is_finished()` returns True every remaining segment is flushed.
+
+    Args:
+        list_path: Path of the CSV manifest passed to `-segment_list`
+        segment_glob: Glob matching the segment files ffmpeg writes
+        is_finished: Returns True once the ffmpeg process has exited
+        poll_interval: Seconds between checks while recording
+
+    Yields:
+        Path of each finished segment file
+    """
+    yielded: Set[str] = set()
+
+    while True:
+        finished = is_finished()
+        on_disk = sorted(path for path in glob.glob(segment_glob) if not is_index_file(path))
+
+        if finished:
+            closed = on_disk
+        else:
+            closed = set(_read_segment_list(list_path))
+            closed.update(on_disk[:-1])
+            closed = sorted(closed)
+
+        for segment in closed:
+            if segment not in yielded and os.path.exists(segment):
+                yielded.add(segment)
+                yield segment
+
+        if finished:
+            return
+
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,288 @@
+import os
+import time
+import shutil
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import aiofiles
+
+from recorders.hls_engine import HLSError
+from recorders.ingest_hub import ingest_hub
+from recorders.recorder_utils import resolve_stream
+from config import TIMESHIFT_DIR, TIMESHIFT_MINUTES
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 10
+# How long a clip whose end is in the future waits for a stream that went quiet
+LIVE_GRACE_SECONDS = 30
+
+
+class TimeshiftError(Exception):
+    """Raised when a clip can't be cut from a channel's buffer."""
+
+
+class TimeshiftBuffer:
+    """
+    Rolling on-disk window of one channel's last `window` seconds.
+
+    Attaches to the channel's shared pull in the ingest hub, so buffering a
+    channel costs nothing extra while it's also being recorded. Every HLS
+    segment is written as its own numbered file, and an in-memory index maps
+    each one to the wall-clock span it covers. Segments older than the
+    window are deleted as new ones arrive.
+
+    Wall-clock times are anchored at arrival: consecutive segments are kept
+    back to back, and the timeline re-anchors after a gap or reconnect.
+    """
+
+    def __init__(self, name: str, url: str, directory: str, window: float,
+                 refresh_url: Optional[Callable[[str], Awaitable[Optional[str]]]] = None):
+        self.name = name
+        self.url = url
+        self.directory = directory
+        self.window = window
+        self.refresh_url = refresh_url
+
+        self.extension = ".ts"
+        self.init_data: Optional[bytes] = None
+        self.error: Optional[str] = None
+        self.segments: deque = deque()
+        self.bytes = 0
+
+        self._counter = 0
+        self._arrived = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.error is None and self._task is not None and not self._task.done()
+
+    @property
+    def oldest(self) -> Optional[float]:
+        return self.segments[0]['start'] if self.segments else None
+
+    @property
+    def newest(self) -> Optional[float]:
+        return self.segments[-1]['end'] if self.segments else None
+
+    def start(self):
+        # A fresh index can't vouch for files left by an earlier run
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    # ── Ring maintenance ──
+
+    async def _append(self, segment: Dict[str, any], data: bytes):
+        self._counter += 1
+        path = os.path.join(self.directory, f"{self._counter:08d}{self.extension}")
+        async with aiofiles.open(path, "wb") as segment_file:
+            await segment_file.write(data)
+
+        end = time.time()
+        start = end - segment['duration']
+        if self.segments:
+            previous_end = self.segments[-1]['end']
+            # Keep the timeline contiguous unless arrival says a gap or reconnect happened
+            if abs(start - previous_end) < max(2.0, segment['duration']):
+                start = previous_end
+                end = start + segment['duration']
+        self.segments.append({'n': self._counter, 'path': path, 'start': start, 'end': end,
+                              'duration': segment['duration'], 'size': len(data)})
+        self.bytes += len(data)
+        self._evict(end)
+
+        self._arrived.set()
+        self._arrived = asyncio.Event()
+
+    def _evict(self, now: float):
+        while self.segments and self.segments[0]['end'] < now - self.window:
+            entry = self.segments.popleft()
+            self.bytes -= entry['size']
+            try:
+                os.remove(entry['path'])
+            except OSError:
+                pass
+
+    def _entry(self, n: int) -> Optional[Dict[str, any]]:
+        if not self.segments:
+            return None
+        index = n - self.segments[0]['n']
+        return self.segments[index] if 0 <= index < len(self.segments) else None
+
+    async def _run(self):
+        url = self.url
+        reconnecting = False
+        while True:
+            source = queue = None
+            try:
+                stream_url = await resolve_stream(url, fresh=reconnecting)
+                source, queue = await ingest_hub.attach(stream_url)
+                self.extension = source.extension
+                self.init_data = source.init_data
+                self.error = None
+                logger.info(f"[Timeshift] Buffering {self.name} ({self.window / 60:g} min)")
+                while True:
+                    event = await queue.get()
+                    if event[0] == 'segment':
+                        await self._append(event[1], event[2])
+                    elif event[0] == 'end':
+                        self.error = event[1] or "Stream ended"
+                        break
+            except asyncio.CancelledError:
+                raise
+            except HLSError as e:
+                self.error = str(e)
+            except Exception as e:
+                logger.error(f"[Timeshift] Buffer of {self.name} failed: {e}")
+                self.error = str(e)
+            finally:
+                if source is not None:
+                    ingest_hub.detach(source, queue)
+
+            logger.warning(f"[Timeshift] {self.name} disconnected ({self.error}), retrying in {RECONNECT_DELAY}s")
+            await asyncio.sleep(RECONNECT_DELAY)
+            reconnecting = True
+            if self.refresh_url:
+                url = await self.refresh_url(self.url) or self.url
+
+    # ── Clips ──
+
+    async def clip(self, start_ts: float, end_ts: float, output_path: str,
+                   on_progress: Optional[Callable[[float], None]] = None) -> Dict[str, float]:
+        """
+        Copies the buffered segments covering [start_ts, end_ts] into one file.
+
+        Cuts on segment boundaries, so the clip may start and end up to one
+        segment early/late. If `end_ts` is still in the future, the clip
+        follows the live buffer until it gets there.
+
+        Args:
+            start_ts: Wall-clock start (epoch seconds)
+            end_ts: Wall-clock end (epoch seconds)
+            output_path: File to write
+            on_progress: Called with the clip's media seconds after each segment
+
+        Returns:
+            Dict with the clip's real start, end, media duration and missing seconds
+
+        Raises:
+            TimeshiftError: If nothing buffered overlaps the requested window
+        """
+        if not self.segments or self.segments[-1]['end'] <= start_ts and end_ts <= time.time():
+            raise TimeshiftError(f"{self.name} has nothing buffered for that time")
+        if end_ts <= self.segments[0]['start']:
+            raise TimeshiftError(
+                f"{self.name} is only buffered from {time.strftime('%H:%M:%S', time.localtime(self.oldest))}")
+
+        first = next((entry for entry in self.segments if entry['end'] > start_ts), None)
+        n = first['n'] if first else self._counter + 1
+        clip_start = first['start'] if first else None
+        clip_end = clip_start
+        media_time = 0.0
+        missing = 0.0
+
+        async with aiofiles.open(output_path, "wb") as output:
+            if self.init_data:
+                await output.write(self.init_data)
+            while True:
+                entry = self._entry(n)
+                if entry is None:
+                    if self.segments and n < self.segments[0]['n']:
+                        n = self.segments[0]['n']  # Evicted before we got to it
+                        continue
+                    if time.time() >= end_ts + LIVE_GRACE_SECONDS or (time.time() >= end_ts and not self.connected):
+                        break
+                    arrived = self._arrived
+                    try:
+                        await asyncio.wait_for(arrived.wait(), LIVE_GRACE_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if entry['start'] >= end_ts:
+                    break
+                if clip_start is None:
+                    clip_start = entry['start']
+                if clip_end is not None and entry['start'] - clip_end > 1:
+                    missing += entry['start'] - clip_end
+                try:
+                    async with aiofiles.open(entry['path'], "rb") as segment_file:
+                        await output.write(await segment_file.read())
+                except FileNotFoundError:
+                    missing += entry['duration']
+                media_time += entry['duration']
+                clip_end = entry['end']
+                n += 1
+                if on_progress:
+                    on_progress(media_time)
+
+        if media_time == 0:
+            raise TimeshiftError(f"No segments of {self.name} fell inside that window")
+        return {'start': clip_start, 'end': clip_end, 'duration': media_time, 'missing': missing}
+
+    def stats(self) -> Dict[str, any]:
+        return {
+            'name': self.name,
+            'connected': self.connected,
+            'seconds': (self.newest - self.oldest) if self.segments else 0,
+            'segments': len(self.segments),
+            'bytes': self.bytes,
+            'error': self.error,
+        }
+
+
+class TimeshiftManager:
+    """Keeps a TimeshiftBuffer running for each opted-in channel."""
+
+    def __init__(self, directory: str, window: float):
+        self.directory = directory
+        self.window = window
+        self.buffers: Dict[str, TimeshiftBuffer] = {}
+
+    def start(self, channels: List[Dict[str, str]],
+              refresh_url: Optional[Callable[[str], Awaitable[Optional[str]]]] = None):
+        """
+        Starts buffering channels.
+
+        Args:
+            channels: Dicts with the channel's `name` and `url` (m3u_manager channel info)
+            refresh_url: Returns a fresh URL for a channel whose stream dropped
+        """
+        for channel in channels:
+            key = channel['name'].lower()
+            if key in self.buffers:
+                continue
+            safe_name = "".join(c if c.isalnum() else "_" for c in channel['name'])
+            buffer = TimeshiftBuffer(channel['name'], channel['url'], os.path.join(self.directory, safe_name),
+                                     self.window, refresh_url)
+            buffer.start()
+            self.buffers[key] = buffer
+
+    def get(self, identifier: str) -> Optional[TimeshiftBuffer]:
+        """Buffer by channel name, exact match first, then substring."""
+        identifier = identifier.lower()
+        if identifier in self.buffers:
+            return self.buffers[identifier]
+        return next((buffer for key, buffer in self.buffers.items() if identifier in key), None)
+
+    async def stop(self):
+        for buffer in self.buffers.values():
+            await buffer.stop()
+
+    def stats(self) -> List[Dict[str, any]]:
+        """Buffered span, size and health per channel, for /status."""
+        return [buffer.stats() for buffer in self.buffers.values()]
+
+
+timeshift = TimeshiftManager(TIMESHIFT_DIR, TIMESHIFT_MINUTES * 60)
@@ -0,0 +1,208 @@
+import os
+import asyncio
+from typing import Optional
+
+import aiofiles
+
+TS_PACKET = 188
+SYNC_BYTE = 0x47
+PTS_WRAP = 1 << 33
+# Stream types of video elementary streams (MPEG-1/2, MPEG-4, H.264, HEVC, AVS, VC-1)
+VIDEO_STREAM_TYPES = {0x01, 0x02, 0x10, 0x1B, 0x24, 0x42, 0xD1, 0xEA}
+READ_CHUNK = 1024 * 1024
+
+
+def _pid(packet: bytes) -> int:
+    return ((packet[1] & 0x1F) << 8) | packet[2]
+
+
+def _payload_offset(packet: bytes) -> int:
+    """Start of the payload in a packet (after the adaptation field, if any)."""
+    if packet[3] & 0x20:
+        return 5 + packet[4]
+    return 4
+
+
+def _random_access(packet: bytes) -> bool:
+    """Whether the adaptation field flags this packet as a random access point (a keyframe)."""
+    return bool(packet[3] & 0x20) and packet[4] > 0 and bool(packet[5] & 0x40)
+
+
+def _pes_pts(packet: bytes) -> Optional[int]:
+    """PTS of the PES packet starting in this TS packet, in 90 kHz ticks."""
+    start = _payload_offset(packet)
+    pes = packet[start:start + 14]
+    if len(pes) < 14 or pes[:3] != b"\x00\x00\x01" or not pes[7] & 0x80:
+        return None
+    p = pes[9:14]
+    return ((p[0] >> 1) & 0x07) << 30 | p[1] << 22 | (p[2] >> 1) << 15 | p[3] << 7 | p[4] >> 1
+
+
+def _section(packet: bytes) -> bytes:
+    """PSI section starting in a packet (PAT/PMT fit in one packet in practice)."""
+    start = _payload_offset(packet)
+    pointer = packet[start]
+    return packet[start + 1 + pointer:]
+
+
+class TSPartWriter:
+    """
+    Writes an MPEG-TS stream into numbered part files, rolling over on keyframes.
+
+    A new part starts at the first video keyframe (a random-access packet
+    starting a PES) once the current part has reached `split_bytes` or
+    holds `split_duration` seconds by PTS, and opens with the latest
+    PAT/PMT so it plays on its own. Audio-only streams roll at any PES
+    start. Parts are named `<output_base>_<n:03d>.ts`, the same as the
+    segment muxer and the native engine, and each closed part is appended
+    to the CSV `segment_list_path` manifest that the upload pipeline follows.
+    """
+
+    def __init__(self, output_base: str, segment_start: int = 0, split_duration: Optional[float] = None,
+                 split_bytes: Optional[int] = None, segment_list_path: Optional[str] = None):
+        self.output_base = output_base
+        self.split_duration = split_duration
+        self.split_bytes = split_bytes
+        self.segment_list_path = segment_list_path
+        self.parts = 0
+
+        self._part_index = segment_start - 1
+        self._file = None
+        self._path: Optional[str] = None
+        self._part_bytes = 0
+        self._part_start_pts: Optional[int] = None
+        self._last_pts: Optional[int] = None
+        self._elapsed = 0.0  # Media seconds in closed parts
+        self._pmt_pids = set()
+        self._pat: Optional[bytes] = None
+        self._pmts = {}
+        self._cut_pid: Optional[int] = None
+        self._cut_on_any_pes = False
+
+    # ── PSI ──
+
+    def _read_pat(self, packet: bytes):
+        section = _section(packet)
+        if len(section) < 12 or section[0] != 0x00:
+            return
+        end = min(3 + (((section[1] & 0x0F) << 8) | section[2]) - 4, len(section))
+        self._pmt_pids = {
+            ((section[i + 2] & 0x1F) << 8) | section[i + 3]
+            for i in range(8, end - 3, 4)
+            if (section[i] << 8 | section[i + 1]) != 0  # Program 0 is the network PID
+        }
+        self._pat = bytes(packet)
+
+    def _read_pmt(self, packet: bytes):
+        section = _section(packet)
+        if len(section) < 16 or section[0] != 0x02:
+            return
+        self._pmts[_pid(packet)] = bytes(packet)
+        end = min(3 + (((section[1] & 0x0F) << 8) | section[2]) - 4, len(section))
+        i = 12 + (((section[10] & 0x0F) << 8) | section[11])
+        first_pid = None
+        while i + 5 <= end:
+            stream_type = section[i]
+            pid = ((section[i + 1] & 0x1F) << 8) | section[i + 2]
+            if stream_type in VIDEO_STREAM_TYPES:
+                self._cut_pid, self._cut_on_any_pes = pid, False
+                return
+            if first_pid is None:
+                first_pid = pid
+            i += 5 + (((section[i + 3] & 0x0F) << 8) | section[i + 4])
+        if first_pid is not None:
+            self._cut_pid, self._cut_on_any_pes = first_pid, True  # Radio: every audio frame is a cut point
+
+    # ── Parts ──
+
+    def _part_seconds(self) -> float:
+        if self._part_start_pts is None or self._last_pts is None:
+            return 0.0
+        return ((self._last_pts - self._part_start_pts) % PTS_WRAP) / 90000
+
+    def _should_roll(self, pending: int) -> bool:
+        """Whether to start a new part here, with `pending` bytes of the current part not yet written."""
+        size = self._part_bytes + pending
+        if self._file is None or size == 0:
+            return False
+        if self.split_bytes and size >= self.split_bytes:
+            return True
+        return bool(self.split_duration) and self._part_seconds() >= self.split_duration
+
+    async def _open_part(self):
+        self._part_index += 1
+        self._path = f"{self.output_base}_{self._part_index:03d}.ts"
+        self._file = await aiofiles.open(self._path, "wb")
+        self._part_bytes = 0
+        self._part_start_pts = None
+        header = (self._pat or b"") + b"".join(self._pmts.values())
+        if header:
+            await self._file.write(header)
+            self._part_bytes += len(header)
+
+    async def _close_part(self):
+        if self._file is None:
+            return
+        await self._file.close()
+        self._file = None
+        self.parts += 1
+        start = self._elapsed
+        self._elapsed += self._part_seconds()
+        if self.segment_list_path:
+            async with aiofiles.open(self.segment_list_path, "a") as manifest:
+                await manifest.write(f"{os.path.basename(self._path)},{start:.3f},{self._elapsed:.3f}\n")
+
+    async def _write(self, data: bytes):
+        if data:
+            await self._file.write(data)
+            self._part_bytes += len(data)
+
+    # ── Stream ──
+
+    async def run(self, reader: asyncio.StreamReader):
+        """Consumes the stream until EOF; the last part is closed when it ends."""
+        buffer = b""
+        try:
+            while True:
+                chunk = await reader.read(READ_CHUNK)
+                if not chunk:
+                    break
+                buffer += chunk
+                if self._file is None:
+                    await self._open_part()
+                pending_from = 0
+                position = 0
+                while position + TS_PACKET <= len(buffer):
+                    if buffer[position] != SYNC_BYTE:
+                        # Lost sync: pass the byte through and look for the next packet start
+                        position += 1
+                        continue
+                    packet = buffer[position:position + TS_PACKET]
+                    pid = _pid(packet)
+                    unit_start = bool(packet[1] & 0x40)
+                    if unit_start:
+                        if pid == 0:
+                            self._read_pat(packet)
+                        elif pid in self._pmt_pids:
+                            self._read_pmt(packet)
+                        elif pid == self._cut_pid:
+                            pts = _pes_pts(packet)
+                            if self._cut_on_any_pes or _random_access(packet):
+                                if pts is not None:
+                                    self._last_pts = pts
+                                if self._should_roll(position - pending_from):
+                                    await self._write(buffer[pending_from:position])
+                                    pending_from = position
+                                    await self._close_part()
+                                    await self._open_part()
+                                if self._part_start_pts is None:
+                                    self._part_start_pts = pts
+                            elif pts is not None:
+                                self._last_pts = pts
+                    position += TS_PACKET
+                await self._write(buffer[pending_from:position])
+                buffer = buffer[position:]
+            if buffer and self._file is not None:
+                await self._write(buffer)
+        finally:
+            await self._close_part()
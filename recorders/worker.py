@@ -0,0 +1,146 @@
+"""
+Recording worker process.
+
+Run by WorkerPool as `python -m recorders.worker <socket_path>`. Listens on a
+Unix socket for the bot process and runs SupervisedCapture jobs on its own
+event loop, so captures (native HLS fetching, shared ingest fan-out, ffmpeg
+supervision) use another core instead of the bot's loop.
+
+Protocol: one JSON object per line in each direction.
+
+    bot -> worker   {"op": "start", "job_id", "stream_url", "output_base", "duration", "options"}
+                    {"op": "terminate", "job_id"}
+                    {"op": "resolved", "job_id", "url"}
+    worker -> bot   {"event": "telemetry", "job_id", "stats", "error"}
+                    {"event": "resolve", "job_id"}      (capture needs a fresh URL to reconnect)
+                    {"event": "exit", "job_id", "returncode", "output_path", "gaps", "truncated",
+                     "downshifts", "error"}
+
+The worker exits, stopping its captures, when the bot closes the connection.
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+from typing import Dict
+
+from recorders.capture import SupervisedCapture
+from recorders.recorder_utils import close_http_session
+
+logger = logging.getLogger(__name__)
+
+RESOLVE_TIMEOUT = 60
+
+
+class WorkerServer:
+    """Runs the captures requested over one bot connection."""
+
+    def __init__(self):
+        self.captures: Dict[int, SupervisedCapture] = {}
+        self.resolves: Dict[int, asyncio.Future] = {}
+        self.jobs = set()
+        self.writer = None
+        self.closed = asyncio.Event()
+
+    def send(self, message: Dict[str, any]):
+        if self.writer and not self.writer.is_closing():
+            self.writer.write((json.dumps(message) + "\n").encode())
+
+    async def _resolve(self, job_id: int) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self.resolves[job_id] = future
+        self.send({'event': 'resolve', 'job_id': job_id})
+        try:
+            return await asyncio.wait_for(future, RESOLVE_TIMEOUT)
+        finally:
+            self.resolves.pop(job_id, None)
+
+    async def _run_job(self, message: Dict[str, any]):
+        job_id = message['job_id']
+        capture = SupervisedCapture(
+            message['stream_url'], message['output_base'], message['duration'],
+            lambda: self._resolve(job_id), **message.get('options', {})
+        )
+        self.captures[job_id] = capture
+        try:
+            await capture.start()
+        except Exception as e:
+            logger.error(f"[Worker] Job {job_id} failed to start: {e}")
+            self.captures.pop(job_id, None)
+            self.send({'event': 'exit', 'job_id': job_id, 'returncode': 1, 'error': str(e)})
+            return
+
+        async def stream_telemetry():
+            while True:
+                tail = capture.telemetry.stderr_tail
+                self.send({'event': 'telemetry', 'job_id': job_id,
+                           'stats': capture.telemetry.snapshot(), 'error': tail[-1] if tail else None})
+                await asyncio.sleep(1)
+
+        pump = asyncio.create_task(stream_telemetry())
+        try:
+            return_code = await capture.wait()
+        finally:
+            pump.cancel()
+            self.captures.pop(job_id, None)
+        tail = capture.telemetry.stderr_tail
+        self.send({
+            'event': 'exit', 'job_id': job_id, 'returncode': return_code,
+            'output_path': capture.output_path, 'gaps': capture.gaps, 'truncated': capture.truncated,
+            'downshifts': capture.downshifts, 'stats': capture.telemetry.snapshot(),
+            'error': tail[-1] if tail else None,
+        })
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if self.writer is not None:
+            writer.close()  # One bot connection per worker
+            return
+        self.writer = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                op = message.get('op')
+                if op == 'start':
+                    task = asyncio.create_task(self._run_job(message))
+                    self.jobs.add(task)
+                    task.add_done_callback(self.jobs.discard)
+                elif op == 'terminate' and message['job_id'] in self.captures:
+                    self.captures[message['job_id']].terminate()
+                elif op == 'resolved':
+                    future = self.resolves.get(message['job_id'])
+                    if future and not future.done():
+                        future.set_result(message.get('url'))
+        finally:
+            for capture in list(self.captures.values()):
+                capture.terminate()
+            self.closed.set()
+
+
+async def main(socket_path: str):
+    worker = WorkerServer()
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = await asyncio.start_unix_server(worker.handle, path=socket_path)
+    logger.info(f"[Worker] Listening on {socket_path}")
+    try:
+        await worker.closed.wait()
+        # Let terminated captures finalise their files
+        if worker.jobs:
+            await asyncio.wait(worker.jobs, timeout=15)
+    finally:
+        server.close()
+        await close_http_session()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - worker %(process)d - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    asyncio.run(main(sys.argv[1]))
@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import itertools
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from recorders.ffmpeg_progress import CaptureTelemetry
+from config import RECORDING_WORKERS, WORKER_SOCKET_DIR
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 15
+
+
+class RemoteCapture:
+    """
+    A SupervisedCapture running in a worker process.
+
+    Same surface as SupervisedCapture (`start()`, `wait()`, `terminate()`,
+    `returncode`, `output_path`, `gaps`, `truncated`, `downshifts` and a
+    live `telemetry`), so the recorder and cancel handler don't care where
+    the capture runs. Reconnect URLs are still resolved in the bot process,
+    which owns the M3U sources.
+    """
+
+    def __init__(self, pool: "WorkerPool", stream_url: str, output_base: str, duration: float,
+                 resolve: Callable[[], Awaitable[str]], **options):
+        self.pool = pool
+        self.stream_url = stream_url
+        self.output_base = output_base
+        self.duration = duration
+        self.resolve = resolve
+        self.options = options
+        self.job_id: Optional[int] = None
+
+        self.telemetry = CaptureTelemetry(stall_timeout=options.get('stall_timeout', 20.0))
+        self.returncode: Optional[int] = None
+        self.output_path: Optional[str] = None
+        self.gaps: List[Dict[str, float]] = []
+        self.truncated = False
+        self.downshifts = 0
+
+        self._worker: Optional[Dict[str, any]] = None
+        self._done = asyncio.Event()
+
+    async def start(self):
+        await self.pool.submit(self)
+
+    async def wait(self) -> int:
+        await self._done.wait()
+        return self.returncode
+
+    def terminate(self):
+        if self._worker and self.returncode is None:
+            self.pool.send(self._worker, {'op': 'terminate', 'job_id': self.job_id})
+
+    def _apply_stats(self, snapshot: Dict[str, any], error: Optional[str]):
+        for key in self.telemetry.stats:
+            if key in snapshot:
+                self.telemetry.stats[key] = snapshot[key]
+        now = time.monotonic()
+        self.telemetry.last_update = now
+        self.telemetry.last_advance = now - snapshot.get('stalled_for', 0)
+        if error and (not self.telemetry.stderr_tail or self.telemetry.stderr_tail[-1] != error):
+            self.telemetry.log_error(error)
+
+    def _finish(self, message: Dict[str, any]):
+        if message.get('stats'):
+            self._apply_stats(message['stats'], message.get('error'))
+        elif message.get('error'):
+            self.telemetry.log_error(message['error'])
+        self.returncode = message.get('returncode', 1)
+        self.output_path = message.get('output_path')
+        self.gaps = message.get('gaps') or []
+        self.truncated = message.get('truncated', False)
+        self.downshifts = message.get('downshifts', 0)
+        self.telemetry.finished = True
+        self._done.set()
+
+
+class WorkerPool:
+    """
+    Pool of recording worker processes (`recorders.worker`) reached over Unix sockets.
+
+    Workers are spawned on first use. Jobs for a channel go to the worker
+    already capturing it, so shared ingest keeps working; other jobs go to
+    the least-loaded worker. A worker that dies fails its running jobs and
+    is respawned for the next one.
+    """
+
+    def __init__(self, size: int, socket_dir: str):
+        self.size = size
+        self.socket_dir = socket_dir
+        self._workers: List[Optional[Dict[str, any]]] = [None] * size
+        self._captures: Dict[int, RemoteCapture] = {}
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._closing = False
+
+    async def _spawn(self, index: int) -> Dict[str, any]:
+        os.makedirs(self.socket_dir, exist_ok=True)
+        socket_path = os.path.join(self.socket_dir, f"worker-{index}.sock")
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "recorders.worker", socket_path, cwd=project_root
+        )
+
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(socket_path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if process.returncode is not None or time.monotonic() > deadline:
+                    if process.returncode is None:
+                        process.kill()
+                    raise RuntimeError(f"Recording worker {index} failed to start")
+                await asyncio.sleep(0.2)
+
+        worker = {'index': index, 'process': process, 'writer': writer, 'jobs': set()}
+        worker['reader_task'] = asyncio.create_task(self._read_events(worker, reader))
+        logger.info(f"[Worker Pool] Started worker {index} (pid {process.pid})")
+        return worker
+
+    def send(self, worker: Dict[str, any], message: Dict[str, any]):
+        if not worker['writer'].is_closing():
+            worker['writer'].write((json.dumps(message) + "\n").encode())
+
+    async def _read_events(self, worker: Dict[str, any], reader: asyncio.StreamReader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                capture = self._captures.get(message.get('job_id'))
+                if capture is None:
+                    continue
+                event = message.get('event')
+                if event == 'telemetry':
+                    capture._apply_stats(message['stats'], message.get('error'))
+                elif event == 'resolve':
+                    asyncio.create_task(self._answer_resolve(worker, capture))
+                elif event == 'exit':
+                    self._release(worker, capture)
+                    capture._finish(message)
+        except Exception as e:
+            logger.error(f"[Worker Pool] Lost worker {worker['index']}: {e}")
+        finally:
+            if self._workers[worker['index']] is worker:
+                self._workers[worker['index']] = None
+            for job_id in list(worker['jobs']):
+                capture = self._captures.get(job_id)
+                if capture:
+                    self._release(worker, capture)
+                    if self._closing:
+                        # Deliberate shutdown: interrupted like a terminated capture, not failed
+                        capture._finish({'returncode': -15, 'error': "Recording worker stopped for shutdown"})
+                    else:
+                        capture._finish({'returncode': 1, 'error': "Recording worker exited"})
+
+    async def _answer_resolve(self, worker: Dict[str, any], capture: RemoteCapture):
+        try:
+            url = await capture.resolve()
+        except Exception as e:
+            logger.warning(f"[Worker Pool] Re-resolving for job {capture.job_id} failed: {e}")
+            url = None
+        self.send(worker, {'op': 'resolved', 'job_id': capture.job_id, 'url': url})
+
+    def _release(self, worker: Dict[str, any], capture: RemoteCapture):
+        worker['jobs'].discard(capture.job_id)
+        self._captures.pop(capture.job_id, None)
+
+    def _pick(self, stream_url: str) -> int:
+        for index, worker in enumerate(self._workers):
+            if worker and any(self._captures[job].stream_url == stream_url for job in worker['jobs']):
+                return index
+        return min(range(self.size), key=lambda i: len(self._workers[i]['jobs']) if self._workers[i] else 0)
+
+    async def submit(self, capture: RemoteCapture):
+        """Starts `capture` on a worker, spawning it if needed."""
+        async with self._lock:
+            index = self._pick(capture.stream_url)
+            if self._workers[index] is None:
+                self._workers[index] = await self._spawn(index)
+            worker = self._workers[index]
+            capture.job_id = next(self._ids)
+            capture._worker = worker
+            worker['jobs'].add(capture.job_id)
+            self._captures[capture.job_id] = capture
+        self.send(worker, {
+            'op': 'start', 'job_id': capture.job_id, 'stream_url': capture.stream_url,
+            'output_base': capture.output_base, 'duration': capture.duration, 'options': capture.options,
+        })
+
+    def stats(self) -> List[int]:
+        """Running jobs per worker (-1 = not started), for /status."""
+        return [len(worker['jobs']) if worker else -1 for worker in self._workers]
+
+    async def close(self):
+        """Disconnects from every worker; each stops its captures and exits."""
+        self._closing = True
+        for worker in self._workers:
+            if worker is None:
+                continue
+            worker['writer'].close()
+            try:
+                await asyncio.wait_for(worker['process'].wait(), 20)
+            except asyncio.TimeoutError:
+                worker['process'].kill()
+        self._workers = [None] * self.size
+
+
+def create_capture(stream_url: str, output_base: str, duration: float,
+                   resolve: Callable[[], Awaitable[str]], **options):
+    """SupervisedCapture in-process, or a RemoteCapture when RECORDING_WORKERS is set."""
+    if worker_pool:
+        return RemoteCapture(worker_pool, stream_url, output_base, duration, resolve, **options)
+    from recorders.capture import SupervisedCapture
+    return SupervisedCapture(stream_url, output_base, duration, resolve, **options)
+
+
+worker_pool = WorkerPool(RECORDING_WORKERS, WORKER_SOCKET_DIR) if RECORDING_WORKERS > 0 else None
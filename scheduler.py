@@ -1,19 +1,227 @@
+import os
+import glob
+import time
 import asyncio
+import itertools
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pytz import timezone
 from recorder import start_recording
-from typing import Dict, Optional
+from typing import Awaitable, Callable, Dict, List, Optional
 from telethon.sync import TelegramClient
+from recorders.disk_budget import DiskBudget
+from utils.job_journal import job_journal
+from utils.utils import wait_until
+from cluster import cluster_store, job_key, is_frontend
+from config import ADMIN_ID, MAX_CONCURRENT_RECORDINGS, MAX_INGEST_MBPS, MAX_CONCURRENT_UPLOADS, ESTIMATED_STREAM_MBPS
+from config import RECORDINGS_DIR, DISK_HEADROOM_MB, UNLIMITED_RESERVE_HOURS, DISK_PREALLOCATE, CHANNEL_STATS_FILE
+from config import SCHEDULE_LEAD_SECONDS
 
 # key = message_id, value = {'task', 'process', 'user_id', 'status_msg_id'}
 scheduled_jobs: Dict[int, Dict[str, any]] = {}
 
+
+class AdmissionController:
+    """
+    Central job queue that decides when a recording may start capturing.
+
+    A job is admitted only while the number of running captures and their
+    combined ingest bitrate stay under the configured limits; otherwise it
+    waits its turn. ADMIN_ID users are queued ahead of everyone else, FIFO
+    within the same priority. Recordings of a channel that is already being
+    captured add no ingest, since the upstream pull is shared. With a
+    DiskBudget, a job also waits until its estimated footprint fits in
+    RECORDINGS_DIR. Uploads get their own concurrency limit via `upload_slot()`.
+    """
+
+    def __init__(self, max_recordings: int = 0, max_ingest_mbps: float = 0,
+                 max_uploads: int = 0, estimated_mbps: float = 5.0,
+                 priority_users: Optional[List[int]] = None, disk: Optional[DiskBudget] = None):
+        self.max_recordings = max_recordings
+        self.max_ingest_mbps = max_ingest_mbps
+        self.estimated_mbps = estimated_mbps
+        self.disk = disk
+        self.priority_users = set(priority_users or [])
+        self._uploads = asyncio.Semaphore(max_uploads) if max_uploads else None
+        self._waiting: List[Dict[str, any]] = []
+        self._running: Dict[int, Dict[str, any]] = {}
+        self._changed = asyncio.Event()
+        self._order = itertools.count()
+
+    def _ingest_mbps(self) -> float:
+        """Current ingest, counting each channel once."""
+        per_channel = {}
+        for job in self._running.values():
+            per_channel[job['channel_key']] = max(per_channel.get(job['channel_key'], 0), job['mbps'])
+        return sum(per_channel.values())
+
+    def _fits(self, ticket: Dict[str, any]) -> bool:
+        # Raises DiskBudgetError if the job could never fit, even on an idle disk
+        if self.disk and not self.disk.check(ticket['reserve_bytes']):
+            return False
+        if not self._running:
+            return True  # Always let one job through, whatever the limits
+        if self.max_recordings and len(self._running) >= self.max_recordings:
+            return False
+        if self.max_ingest_mbps:
+            if any(job['channel_key'] == ticket['channel_key'] for job in self._running.values()):
+                return True
+            return self._ingest_mbps() + ticket['mbps'] <= self.max_ingest_mbps
+        return True
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def position(self, job_id: int) -> int:
+        """1-based queue position of a waiting job, 0 if it isn't waiting."""
+        for index, ticket in enumerate(self._waiting, start=1):
+            if ticket['job_id'] == job_id:
+                return index
+        return 0
+
+    async def admit(self, job_id: int, user_id: int, channel_key: str, duration: float = 0,
+                    on_wait: Optional[Callable[[int, int], Awaitable[None]]] = None,
+                    placeholder_path: Optional[str] = None):
+        """
+        Waits until the job may start capturing.
+
+        Args:
+            job_id: Unique job key (the command's message id)
+            user_id: Requesting user, for priority
+            channel_key: Source URL, so jobs sharing an upstream aren't double-counted
+            duration: Recording length in seconds (0 = unlimited), for the disk reservation
+            on_wait: Called with (position, queue length) whenever the position changes
+            placeholder_path: File to preallocate the disk reservation in, if enabled
+
+        Raises:
+            DiskBudgetError: If the recording can't fit in RECORDINGS_DIR at all
+        """
+        mbps = await self.disk.estimate_mbps(channel_key) if self.disk else self.estimated_mbps
+        ticket = {
+            'job_id': job_id,
+            'channel_key': channel_key,
+            'mbps': mbps,
+            'reserve_bytes': self.disk.reservation_bytes(mbps, duration) if self.disk else 0,
+            'priority': 0 if user_id in self.priority_users else 1,
+            'order': next(self._order),
+        }
+        self._waiting.append(ticket)
+        self._waiting.sort(key=lambda t: (t['priority'], t['order']))
+        self._notify()
+
+        last_position = None
+        try:
+            while True:
+                if self._waiting[0] is ticket and self._fits(ticket):
+                    break
+                position = self.position(job_id)
+                if on_wait and position != last_position:
+                    last_position = position
+                    await on_wait(position, len(self._waiting))
+                changed = self._changed
+                if self._waiting[0] is ticket and self._fits(ticket):
+                    break
+                await changed.wait()
+        except BaseException:
+            self._waiting.remove(ticket)
+            self._notify()
+            raise
+
+        self._waiting.remove(ticket)
+        self._running[job_id] = {'channel_key': channel_key, 'mbps': mbps}
+        if self.disk:
+            self.disk.reserve(job_id, ticket['reserve_bytes'], channel_key, placeholder_path)
+        print(f"[Scheduler] [INFO] Admitted job {job_id} ({len(self._running)} running, {len(self._waiting)} waiting)")
+        self._notify()
+
+    def update_progress(self, job_id: int, stats: Dict[str, float]):
+        """Replaces a running job's estimates with its measured bitrate and bytes written."""
+        if job_id not in self._running:
+            return
+        mbps = stats.get('bitrate_kbps', 0) / 1000
+        if mbps > 0:
+            self._running[job_id]['mbps'] = mbps
+        if self.disk:
+            self.disk.update(job_id, stats.get('total_size', 0), stats.get('out_time', 0))
+
+    def release(self, job_id: int):
+        """Frees a job's capture slot and disk reservation; safe to call more than once."""
+        if self.disk:
+            self.disk.release(job_id)
+        if self._running.pop(job_id, None) is not None:
+            self._notify()
+
+    @asynccontextmanager
+    async def upload_slot(self):
+        """Holds one of the concurrent upload slots for the duration of an upload."""
+        if self._uploads is None:
+            yield
+            return
+        async with self._uploads:
+            yield
+
+    def stats(self) -> Dict[str, float]:
+        """Running/waiting counts and ingest, for /status."""
+        return {
+            'running': len(self._running),
+            'waiting': len(self._waiting),
+            'ingest_mbps': round(self._ingest_mbps(), 1),
+            'max_recordings': self.max_recordings,
+            'max_ingest_mbps': self.max_ingest_mbps,
+        }
+
+
+disk_budget = DiskBudget(
+    RECORDINGS_DIR, CHANNEL_STATS_FILE,
+    headroom_bytes=DISK_HEADROOM_MB * 1024 * 1024,
+    default_mbps=ESTIMATED_STREAM_MBPS,
+    unlimited_horizon=UNLIMITED_RESERVE_HOURS * 3600,
+    preallocate=DISK_PREALLOCATE,
+)
+
+admission = AdmissionController(
+    max_recordings=MAX_CONCURRENT_RECORDINGS,
+    max_ingest_mbps=MAX_INGEST_MBPS,
+    max_uploads=MAX_CONCURRENT_UPLOADS,
+    estimated_mbps=ESTIMATED_STREAM_MBPS,
+    priority_users=ADMIN_ID,
+    disk=disk_budget,
+)
+
 def get_ist_datetime(date_time_str: str) -> datetime:
     """Parse string datetime and convert to IST timezone"""
     ist = timezone("Asia/Kolkata")
     dt = datetime.strptime(date_time_str, "%d-%m-%Y %H:%M:%S")
     return ist.localize(dt)
 
+async def _enqueue_cluster_job(url: str, duration: str, channel: str, title: str, chat_id: int,
+                               message_id: int, user_id: int, start_at: float,
+                               split_duration_sec: Optional[int] = None):
+    """Front-end role: hand the job to the recorder nodes instead of recording here."""
+    key = job_key(chat_id, message_id)
+    await cluster_store.enqueue(key, url, duration_to_seconds(duration), channel, title, chat_id, message_id,
+                                user_id, start_at, split_duration_sec, priority=0 if user_id in ADMIN_ID else 1)
+    scheduled_jobs[message_id] = {
+        'task': None,
+        'process': None,
+        'user_id': user_id,
+        'status_msg_id': None,
+        'chat_id': chat_id,
+        'cluster': key,
+    }
+    print(f"[Cluster] [INFO] Queued {key} for recorder nodes")
+
+def duration_to_seconds(duration: str) -> int:
+    """'HH:MM:SS' or plain seconds to seconds; 0 means unlimited"""
+    try:
+        if ":" in duration:
+            h, m, s = map(int, duration.split(":"))
+            return h * 3600 + m * 60 + s
+        return int(duration)
+    except ValueError:
+        return 0
+
 async def start_recording_instantly(
     telethon_client: TelegramClient,
     url: str, 
@@ -23,10 +231,18 @@ async def start_recording_instantly(
     chat_id: int, 
     message_id: int,
     user_id: int,
-    split_duration_sec: int = None
+    split_duration_sec: int = None,
+    start_at: Optional[float] = None
 ):
-    """Start recording immediately"""
-    task = asyncio.create_task(start_recording(telethon_client, url, duration, channel, title, chat_id, message_id, scheduled_jobs, split_duration_sec))
+    """Start recording immediately (or, with `start_at`, warm up now and capture from then)"""
+    if message_id and is_frontend():
+        await _enqueue_cluster_job(url, duration, channel, title, chat_id, message_id, user_id,
+                                   time.time(), split_duration_sec)
+        return None
+    if message_id:
+        job_journal.add(message_id, 'queued', url, channel, title, duration_to_seconds(duration),
+                        chat_id, user_id, time.time(), split_duration_sec)
+    task = asyncio.create_task(start_recording(telethon_client, url, duration, channel, title, chat_id, message_id, scheduled_jobs, split_duration_sec, admission=admission, user_id=user_id, start_at=start_at))
     
     if message_id:
         scheduled_jobs[message_id] = {
@@ -34,6 +250,7 @@ async def start_recording_instantly(
             'process': None, 
             'user_id': user_id,
             'status_msg_id': None,  # Will be set by recorder when it sends the status message
+            'chat_id': chat_id,
         }
     
     return task
@@ -56,12 +273,23 @@ async def schedule_recording(
 
     if delay < 0:
         print("Start time is in the past. Starting immediately.")
-        delay = 0
+
+    if message_id and is_frontend():
+        await _enqueue_cluster_job(url, duration, channel, title, chat_id, message_id, user_id,
+                                   target_time.timestamp())
+        print(f"Recording scheduled at {target_time} IST for {duration}")
+        return None
+
+    if message_id:
+        job_journal.add(message_id, 'scheduled', url, channel, title, duration_to_seconds(duration),
+                        chat_id, user_id, target_time.timestamp())
 
     async def delayed_recording():
-        if delay > 0:
-            await asyncio.sleep(delay)
-        await start_recording(telethon_client, url, duration, channel, title, chat_id, message_id, scheduled_jobs)
+        # Wake early so the stream is resolved and checked before the target; the recorder
+        # starts capturing just ahead of it and trims the pre-roll
+        await wait_until(target_time.timestamp() - SCHEDULE_LEAD_SECONDS)
+        await start_recording(telethon_client, url, duration, channel, title, chat_id, message_id, scheduled_jobs,
+                              admission=admission, user_id=user_id, start_at=target_time.timestamp())
 
     task = asyncio.create_task(delayed_recording())
     
@@ -71,6 +299,7 @@ async def schedule_recording(
             'process': None, 
             'user_id': user_id,
             'status_msg_id': None,
+            'chat_id': chat_id,
         }
 
     print(f"Recording scheduled at {target_time} IST for {duration}")
@@ -80,6 +309,9 @@ def cancel_scheduled_recording(message_id: int):
     """Cancel a scheduled recording by its message ID"""
     if message_id in scheduled_jobs:
         job = scheduled_jobs[message_id]
+        # Cluster job: the node running it stops on its next heartbeat
+        if job.get('cluster'):
+            asyncio.create_task(cluster_store.request_cancel(job['cluster']))
         # Cancel the async task
         if job.get('task'):
             job['task'].cancel()
@@ -90,5 +322,133 @@ def cancel_scheduled_recording(message_id: int):
             except ProcessLookupError:
                 pass  # Process already terminated
         del scheduled_jobs[message_id]
+        job_journal.transition(job.get('chat_id'), message_id, 'cancelled')
         return True
     return False
+
+async def interrupt_recordings(timeout: float = 30):
+    """
+    Shutdown: cancels every local recording while it's still registered in `scheduled_jobs`.
+
+    The recorder then treats it as interrupted rather than cancelled and
+    keeps its journal entry and files, so it resumes on the next start.
+    Must run before the upload manager and worker pool are closed, or the
+    recordings see their captures fail first.
+    """
+    tasks = [job['task'] for job in scheduled_jobs.values() if job.get('task') and not job['task'].done()]
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.wait(tasks, timeout=timeout)
+
+
+# ━━━ Recovery after restart ━━━
+
+RECOVERABLE_EXTENSIONS = ('.mkv', '.ts', '.mp4')
+MIN_RESUME_SECONDS = 30  # Don't restart a recording with less than this left
+
+
+def _job_files(job: Dict[str, any]) -> List[str]:
+    """Files an interrupted job left behind: its temp capture files and the part it was uploading."""
+    files = sorted(glob.glob(f"{job['temp_base']}*")) if job.get('temp_base') else []
+    if job.get('current_file') and os.path.exists(job['current_file']):
+        files.append(job['current_file'])
+    return files
+
+
+async def _deliver_orphans(telethon_client: TelegramClient, job: Dict[str, any], files: List[str]) -> int:
+    """Uploads what an interrupted job had captured and removes everything else; returns files sent."""
+    from uploader import send_video
+    from recorders.recorder_utils import get_video_duration
+    from utils.utils import format_bytes
+
+    sent = 0
+    media = [f for f in files if f.endswith(RECOVERABLE_EXTENSIONS) and os.path.getsize(f) > 0]
+    for index, path in enumerate(media, start=1):
+        label = f" part {index}" if len(media) > 1 else ""
+        safe_title = "".join(c if c not in '<>:"/\\|?*' else '_' for c in job['title'] or "recording")
+        final_path = os.path.join(RECORDINGS_DIR, f"{safe_title}{label}.recovered.{int(job['start_at'])}{os.path.splitext(path)[1]}")
+        os.replace(path, final_path)
+        duration = await get_video_duration(final_path) or 0
+        caption = (
+            f"`📁 Filename: {os.path.basename(final_path)}\n"
+            f"💾 File-Size: {await format_bytes(os.path.getsize(final_path))}`\n"
+            f"⚠️ Recovered after a bot restart\n☎️ @krinry"
+        )
+        try:
+            if await send_video(final_path, caption, duration=int(duration), chat_id=job['chat_id'],
+                                user_msg_id=job['job_id'], bot_client=telethon_client, user_id=job.get('user_id')):
+                sent += 1
+        except Exception as e:
+            print(f"[Scheduler] [ERROR] Recovery upload of {final_path} failed: {e}")
+        if os.path.exists(final_path):
+            os.remove(final_path)
+    for path in files:
+        if path not in media and os.path.exists(path):
+            os.remove(path)
+    return sent
+
+
+def _clean_unowned_temp_files(owned: List[str]):
+    """Removes leftover temp files no journaled job owns; unowned media is kept for /upload."""
+    for path in glob.glob(os.path.join(RECORDINGS_DIR, "temp_*")):
+        if path in owned:
+            continue
+        if path.endswith(RECOVERABLE_EXTENSIONS) and os.path.getsize(path) > 0:
+            print(f"[Scheduler] [WARNING] Keeping orphaned recording with no journal entry: {path}")
+            continue
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"[Scheduler] [WARNING] Could not remove {path}: {e}")
+
+
+async def recover_jobs(telethon_client: TelegramClient):
+    """
+    Startup pass over the job journal.
+
+    Re-arms schedules still in the future, restarts recordings whose window
+    is still open for the remaining time, uploads whatever interrupted jobs
+    had already captured, and cleans up temp files nobody owns.
+    """
+    ist = timezone("Asia/Kolkata")
+    now = time.time()
+    jobs = job_journal.unfinished()
+
+    # Collect leftovers before restarted jobs start writing new temp files
+    orphans = {(job['chat_id'], job['job_id']): _job_files(job) for job in jobs}
+    _clean_unowned_temp_files([path for files in orphans.values() for path in files])
+    rearmed = set()
+
+    for job in jobs:
+        job_id = job['job_id']
+        key = (job['chat_id'], job_id)
+        began = job['started_at'] or job['start_at']
+        end_at = began + job['duration_sec'] if job['duration_sec'] else None
+
+        if job['state'] == 'scheduled' and job['start_at'] > now:
+            start_time_str = datetime.fromtimestamp(job['start_at'], ist).strftime("%d-%m-%Y %H:%M:%S")
+            await schedule_recording(telethon_client, job['url'], start_time_str, str(job['duration_sec']),
+                                     job['channel'], job['title'], job['chat_id'], job['user_id'], job_id)
+            print(f"[Scheduler] [INFO] Re-armed schedule {job_id} for {start_time_str}")
+            rearmed.add(key)
+        elif job['state'] != 'uploading' and (end_at is None or end_at - now >= MIN_RESUME_SECONDS):
+            remaining = int(end_at - now) if end_at else 0
+            await start_recording_instantly(telethon_client, job['url'], str(remaining), job['channel'], job['title'],
+                                            job['chat_id'], job_id, job['user_id'], job['split_duration_sec'])
+            print(f"[Scheduler] [INFO] Resumed recording {job_id} for {remaining or 'unlimited'}s")
+            rearmed.add(key)
+        elif not orphans[key]:
+            job_journal.transition(job['chat_id'], job_id, 'failed', 'Window passed while the bot was down', error='Interrupted by restart')
+
+    for job in jobs:
+        key = (job['chat_id'], job['job_id'])
+        files = orphans[key]
+        if not files:
+            continue
+        sent = await _deliver_orphans(telethon_client, job, files)
+        print(f"[Scheduler] [INFO] Recovered {sent} file(s) of interrupted job {job['job_id']}")
+        if key not in rearmed:
+            # Not restarted, so the recovery upload is all there is
+            job_journal.transition(job['chat_id'], job['job_id'], 'done' if sent else 'failed', 'Recovered after restart',
+                                   error=None if sent else 'Interrupted by restart')
@@ -2,20 +2,27 @@ import os
 import time
 import asyncio
 import subprocess
-from typing import Optional, List, Dict
+from typing import Callable, Optional, List, Dict
 from telethon.sync import TelegramClient
-from telethon.tl.types import DocumentAttributeVideo
+from telethon.tl.types import DocumentAttributeVideo, InputFileBig
 from telethon.sessions import StringSession
-from telethon.errors.rpcerrorlist import FloodWaitError, MessageNotModifiedError
+from telethon.errors.rpcerrorlist import FloodWaitError, MessageNotModifiedError, FilePartMissingError, FilePartsInvalidError
 from config import API_ID, API_HASH, SESSION_NAME, STORE_CHANNEL_ID, BOT_TOKEN, SESSION_STRING
-from captions import caption_uploaded
+from config import UPLOAD_CONNECTIONS, UPLOAD_MIN_CONNECTIONS, UPLOAD_MAX_CONNECTIONS, UPLOAD_PART_RETRIES
+from config import UPLOAD_SESSION_STRINGS, UPLOAD_SLOTS_PER_SESSION
+from captions import caption_uploaded, dashboard_upload_line, dashboard_upload_queued_line
+from features.live_dashboard import live_dashboard
+from utils.telegram_gateway import telegram_gateway, NOTICE, PROGRESS
+from uploaders.parallel_upload import ParallelUploader, BIG_FILE_SIZE
+from uploaders.session_pool import UploadSessionPool
+from uploaders.upload_state import upload_state
+from recorders.keyframe_index import ClipError, split_by_size
 
 # Constants
 MAX_FILE_SIZE = 2 * 1024 * 1024 * 1024  # 2 GB
 
 class UploadManager:
     _instance = None
-    _lock = asyncio.Semaphore(1)
     _active_uploads = set()
 
     def __new__(cls):
@@ -34,20 +41,61 @@ class UploadManager:
             self.progress_data = {}
             self.last_update = {}
             self._speed_data = {}  # For speed tracking
-            self.telethon_client = TelegramClient(StringSession(SESSION_STRING), API_ID, API_HASH)
+            # FloodWaits surface as errors (no sleeping inside the call) so the gateway and uploaders handle them
+            self.telethon_client = TelegramClient(StringSession(SESSION_STRING), API_ID, API_HASH, flood_sleep_threshold=0)
+            # Extra accounts upload in parallel with the main one; each must be a member of STORE_CHANNEL_ID
+            clients = [self.telethon_client] + [
+                TelegramClient(StringSession(session), API_ID, API_HASH, flood_sleep_threshold=0)
+                for session in UPLOAD_SESSION_STRINGS
+            ]
+            self.session_pool = UploadSessionPool(
+                clients, UPLOAD_SLOTS_PER_SESSION,
+                make_uploader=lambda client: ParallelUploader(
+                    client, UPLOAD_CONNECTIONS, UPLOAD_MIN_CONNECTIONS,
+                    UPLOAD_MAX_CONNECTIONS, UPLOAD_PART_RETRIES, state_store=upload_state
+                )
+            )
 
     async def init_client(self):
-        if not self.telethon_client.is_connected():
-            await self.telethon_client.start()
+        await self.session_pool.start()
+
+    async def close(self):
+        """Disconnects the extra upload connections and sessions on shutdown."""
+        await self.session_pool.close()
+
+    async def tail_upload(self, file_path: str, is_complete: Callable[[], bool],
+                          should_abort: Optional[Callable[[], bool]] = None,
+                          start_offset: int = 0, prefix_size: int = 0) -> Optional[Dict[str, any]]:
+        """
+        Uploads a recording while it's still being written, with the main session.
+
+        Runs outside the upload pool: it trickles at the stream's bitrate for
+        the whole recording, and shouldn't hold a lane meanwhile. Pass the
+        result's `file` to send_video(uploaded_file=...) once the recording is done.
+
+        Returns:
+            Dict with `file` (InputFileBig) and `size`, or None if the live upload was given up
+        """
+        uploader = ParallelUploader(
+            self.telethon_client, UPLOAD_CONNECTIONS, UPLOAD_MIN_CONNECTIONS,
+            UPLOAD_MAX_CONNECTIONS, UPLOAD_PART_RETRIES
+        )
+        try:
+            return await uploader.upload_growing(
+                file_path, is_complete, should_abort, start_offset, prefix_size, max_size=MAX_FILE_SIZE
+            )
+        finally:
+            await uploader.close()
 
     def upload_progress_callback(self, current: int, total: int, chat_id: int, file_name: str):
         """Wrapper to safely call async progress updates from sync context"""
         # Speed tracking (pure sync — no async work)
+        key = (chat_id, file_name)
         now = time.time()
-        if chat_id not in self._speed_data:
-            self._speed_data[chat_id] = {'last_bytes': 0, 'last_time': now, 'start_time': now, 'last_console': 0, 'last_tg_update': 0, 'speed': 0.0}
+        if key not in self._speed_data:
+            self._speed_data[key] = {'last_bytes': 0, 'last_time': now, 'start_time': now, 'last_console': 0, 'last_tg_update': 0, 'speed': 0.0}
         
-        sd = self._speed_data[chat_id]
+        sd = self._speed_data[key]
         td = now - sd['last_time']
         if td > 0.5:
             sd['speed'] = (current - sd['last_bytes']) / td / 1048576
@@ -80,13 +128,14 @@ class UploadManager:
 
     async def async_upload_progress_callback(self, current: int, total: int, chat_id: int, file_name: str):
         """Enhanced progress callback with better error handling"""
+        key = (chat_id, file_name)
         current_time = asyncio.get_event_loop().time()
         
         # Throttle updates to every 10 seconds
-        if chat_id in self.last_update and current_time - self.last_update[chat_id] < 5:
+        if key in self.last_update and current_time - self.last_update[key] < 5:
             return
         
-        self.last_update[chat_id] = current_time
+        self.last_update[key] = current_time
         percent = min(100, (current / total) * 100)
         uploaded_mb = current / 1024 / 1024
         total_mb = total / 1024 / 1024
@@ -95,8 +144,8 @@ class UploadManager:
         bar = '⬢' * int(percent/5) + '⬡' * (20 - int(percent/5))
         
         # Get speed from sync tracker
-        speed = self._speed_data.get(chat_id, {}).get('speed', 0)
-        elapsed = time.time() - self._speed_data.get(chat_id, {}).get('start_time', time.time())
+        speed = self._speed_data.get(key, {}).get('speed', 0)
+        elapsed = time.time() - self._speed_data.get(key, {}).get('start_time', time.time())
         if percent > 0 and percent < 100:
             eta_str = f"{int((elapsed / percent * 100) - elapsed)}s"
         else:
@@ -112,29 +161,41 @@ class UploadManager:
             f"**⚡ Status:** Uploading..."
         )
 
+        await self._show_status(chat_id, file_name, progress_text,
+                                dashboard_upload_line(file_name, current, total, speed))
+
+    async def _show_status(self, chat_id: int, file_name: str, text: str, dashboard_line: str):
+        """Shows an upload's progress/queue text on its status message, or on the chat's live dashboard."""
+        key = (chat_id, file_name)
         try:
-            if chat_id not in self.progress_data:
+            if key not in self.progress_data:
+                return
+            dashboard_job = self.progress_data[key].get('dashboard_job')
+            if live_dashboard and dashboard_job is not None:
+                # The chat's dashboard batches this with its other jobs instead of a per-upload edit
+                live_dashboard.update(self.progress_data[key]['edit_client'], chat_id, dashboard_job, dashboard_line)
                 return
-            edit_client = self.progress_data[chat_id].get('edit_client', self.telethon_client)
-            if self.progress_data[chat_id]['msg_id'] is not None:
+            edit_client = self.progress_data[key].get('edit_client', self.telethon_client)
+            if self.progress_data[key]['msg_id'] is not None:
                 # Edit the existing progress/status message
-                await edit_client.edit_message(
-                    entity=chat_id,
-                    message=self.progress_data[chat_id]['msg_id'],
-                    text=progress_text,
+                await telegram_gateway.edit_message(
+                    edit_client, chat_id, self.progress_data[key]['msg_id'],
+                    text=text,
                     parse_mode='md',
+                    priority=PROGRESS
                 )
-            elif not self.progress_data[chat_id].get('status_msg_id'):
+            elif not self.progress_data[key].get('status_msg_id'):
                 # No status message from bot — send a NEW progress message (fallback)
-                message = await self.telethon_client.send_message(
-                    entity=chat_id,
-                    message=progress_text,
-                    reply_to=self.progress_data[chat_id].get('user_msg_id'),
+                message = await telegram_gateway.send_message(
+                    self.telethon_client, chat_id,
+                    message=text,
+                    reply_to=self.progress_data[key].get('user_msg_id'),
+                    priority=PROGRESS
                 )
-                self.progress_data[chat_id]['msg_id'] = message.id
+                self.progress_data[key]['msg_id'] = message.id
         except FloodWaitError as fwe:
+            # The gateway drops progress edits on FloodWait; the next update replaces this one
             print(f"[Uploader] [WARNING] FloodWaitError while updating upload progress: {fwe}")
-            await asyncio.sleep(fwe.seconds)
         except MessageNotModifiedError:
             pass
         except Exception as e:
@@ -142,9 +203,10 @@ class UploadManager:
 
     async def send_uploaded_message(self, chat_id: int, file_name: str, success: bool = True, error_msg: str = None):
         """Enhanced final message with better formatting"""
+        key = (chat_id, file_name)
         try:
-            edit_client = self.progress_data.get(chat_id, {}).get('edit_client', self.telethon_client)
-            msg_id = self.progress_data.get(chat_id, {}).get('msg_id')
+            edit_client = self.progress_data.get(key, {}).get('edit_client', self.telethon_client)
+            msg_id = self.progress_data.get(key, {}).get('msg_id')
 
             if success:
                 final_text = (
@@ -162,11 +224,11 @@ class UploadManager:
             if msg_id is not None:
                 # Edit the existing status/progress message
                 try:
-                    await edit_client.edit_message(
-                        entity=chat_id,
-                        message=msg_id,
+                    await telegram_gateway.edit_message(
+                        edit_client, chat_id, msg_id,
                         text=final_text,
                         parse_mode='md',
+                        priority=NOTICE
                     )
                 except MessageNotModifiedError:
                     pass
@@ -174,78 +236,75 @@ class UploadManager:
                     print(f"[Uploader] [ERROR] Final message edit failed: {edit_err}")
             else:
                 # No message to edit — send new one as fallback
-                await self.telethon_client.send_message(
-                    entity=chat_id,
+                await telegram_gateway.send_message(
+                    self.telethon_client, chat_id,
                     message=final_text,
-                    reply_to=self.progress_data.get(chat_id, {}).get('user_msg_id'),
+                    reply_to=self.progress_data.get(key, {}).get('user_msg_id'),
                 )
         except Exception as e:
             print(f"[Uploader] [ERROR] Final message error: {e}")
         finally:
-            self.progress_data.pop(chat_id, None)
-            self.last_update.pop(chat_id, None)
-            self._speed_data.pop(chat_id, None)
+            self.progress_data.pop(key, None)
+            self.last_update.pop(key, None)
+            self._speed_data.pop(key, None)
 
     async def _split_video(self, file_path: str) -> List[str]:
-        """Splits a video file into parts smaller than MAX_FILE_SIZE."""
-        parts = []
-        file_size = os.path.getsize(file_path)
-        if file_size <= MAX_FILE_SIZE:
-            return [file_path]
-
-        part_size = MAX_FILE_SIZE - 50 * 1024 * 1024
-        num_parts = -(-file_size // part_size)
+        """Splits a video file into parts smaller than MAX_FILE_SIZE, in one pass over the file."""
         base_name, ext = os.path.splitext(file_path)
-
-        for i in range(num_parts):
-            part_path = f"{base_name}.part{i+1}{ext}"
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-i", file_path,
-                "-c", "copy",
-                "-map", "0",
-                "-segment_time", str(int(i * part_size / (file_size/os.path.getsize(file_path)))),
-                "-f", "segment",
-                "-segment_format_options", "movflags=+faststart",
-                "-reset_timestamps", "1",
-                part_path
-            ]
-            process = await asyncio.create_subprocess_exec(*cmd)
-            await process.wait()
-            if process.returncode == 0:
-                parts.append(part_path)
-            else:
-                for part in parts:
-                    if os.path.exists(part):
-                        os.remove(part)
-                return []
-        return parts
+        try:
+            return await split_by_size(file_path, MAX_FILE_SIZE - 50 * 1024 * 1024, f"{base_name}.part{{n}}{ext}")
+        except ClipError as e:
+            print(f"[Uploader] [ERROR] Splitting {os.path.basename(file_path)} failed: {e}")
+            return []
+
+    async def _store_video(self, client, file, caption: str, duration: Optional[int], thumb: Optional[str]):
+        """Posts an uploaded file as a video in the store channel."""
+        entity = await telegram_gateway.call(client, None, lambda: client.get_entity(STORE_CHANNEL_ID))
+
+        message = await telegram_gateway.send_message(
+            client, entity,
+            message=caption,
+            file=file,
+            attributes=[
+                DocumentAttributeVideo(
+                    duration=duration or 0,
+                    w=0,
+                    h=0,
+                    supports_streaming=True
+                )
+            ],
+            thumb=thumb
+        )
+        return message
 
     async def _send_video_telethon_user_session(self, file_path: str, caption: str, thumbnail: Optional[str] = None, 
                                                 duration: Optional[int] = None, chat_id: int = 0, 
                                                 user_msg_id: Optional[int] = None,
-                                                bot_client=None, status_msg_id: Optional[int] = None) -> Optional[int]:
-        """Uploads video using Telethon with user session"""
+                                                bot_client=None, status_msg_id: Optional[int] = None,
+                                                dashboard_job=None, user_id: Optional[int] = None,
+                                                uploaded_file: Optional[InputFileBig] = None) -> Optional[int]:
+        """Uploads video using Telethon with a user session from the upload pool"""
         file_name = os.path.basename(file_path) if file_path else "Unknown File"
+        key = (chat_id, file_name)
         try:
             # If bot_client + status_msg_id provided, edit the recording message directly
             # Otherwise, uploader sends its own messages (fallback)
-            self.progress_data[chat_id] = {
+            self.progress_data[key] = {
                 'msg_id': status_msg_id,  # Edit this message (None = will send new)
                 'user_msg_id': user_msg_id,
                 'file': file_name,
                 'edit_client': bot_client if bot_client else self.telethon_client,
                 'status_msg_id': status_msg_id,
+                'dashboard_job': dashboard_job,  # Report progress on the chat's live dashboard under this key
             }
-            self._speed_data.pop(chat_id, None)  # Reset speed
+            self._speed_data.pop(key, None)  # Reset speed
 
             if not os.path.exists(file_path):
                 await self.send_uploaded_message(chat_id, file_name, False, "File not found")
                 return None
 
             file_size = os.path.getsize(file_path)
-            if file_size > MAX_FILE_SIZE:
+            if file_size > MAX_FILE_SIZE and uploaded_file is None:
                 parts = await self._split_video(file_path)
                 if not parts:
                     await self.send_uploaded_message(chat_id, file_name, False, "Failed to split video")
@@ -255,7 +314,8 @@ class UploadManager:
                 for i, part_path in enumerate(parts):
                     part_caption = f"{caption} (Part {i+1}/{len(parts)})"
                     message_id = await self._send_video_telethon_user_session(
-                        part_path, part_caption, thumbnail, duration, chat_id, user_msg_id
+                        part_path, part_caption, thumbnail, duration, chat_id, user_msg_id,
+                        dashboard_job=dashboard_job, user_id=user_id
                     )
                     if message_id:
                         message_ids.append(message_id)
@@ -263,51 +323,90 @@ class UploadManager:
                         os.remove(part_path)
                 return message_ids[0] if message_ids else None
 
-            if not self.telethon_client.is_connected():
-                await self.telethon_client.start()
-
             thumb = thumbnail if thumbnail and os.path.exists(thumbnail) else None
 
-            # Only hold the lock during the actual upload + send, not during split/recursion
-            async with self._lock:
-                result = await self.telethon_client.upload_file(
-                    file=file_path,
-                    part_size_kb=512,  # Max chunk size (512KB) = 4x fewer API calls than default 128KB
-                    file_size=file_size,  # Pre-provide size so Telethon skips stat() call
-                    progress_callback=lambda current, total: self.upload_progress_callback(current, total, chat_id, file_name)
+            async def show_queue_position(position, queue_length):
+                await self._show_status(
+                    chat_id, file_name,
+                    f"**📤 Upload queued:** `{file_name}`\n"
+                    f"**⏸ Position:** #{position} of {queue_length}\n"
+                    f"**⚡ Status:** Waiting for a free upload session...",
+                    dashboard_upload_queued_line(file_name, position, queue_length)
                 )
 
-                entity = await self.telethon_client.get_entity(STORE_CHANNEL_ID)
-
-                message = await self.telethon_client.send_message(
-                    entity=entity,
-                    message=caption,
-                    file=result,
-                    attributes=[
-                        DocumentAttributeVideo(
-                            duration=duration or 0,
-                            w=0,
-                            h=0,
-                            supports_streaming=True
-                        )
-                    ],
-                    thumb=thumb
-                )
+            if uploaded_file is not None:
+                # Sent while it was being recorded, by the main session: only the message is left
+                lane = None
+                uploaded_file = InputFileBig(uploaded_file.id, uploaded_file.parts, file_name)
+                message = await self._store_video(self.telethon_client, uploaded_file, caption, duration, thumb)
+            else:
+                # Only hold a lane during the actual upload + send, not during split/recursion
+                async with self.session_pool.lane(user_id or chat_id, on_wait=show_queue_position) as lane:
+                    client = lane.client
+                    if not client.is_connected():
+                        await client.start()
+                    progress_callback = lambda current, total: self.upload_progress_callback(current, total, chat_id, file_name)
+                    resumable = file_size > BIG_FILE_SIZE and UPLOAD_MAX_CONNECTIONS > 1
+
+                    async def upload():
+                        # Uploads bypass the gateway: they're long, cancellable transfers on this lane's
+                        # connections, and only the final send counts against the message rate limits
+                        if resumable:
+                            # Parts go out over several connections at once; a retry only sends missing parts
+                            return await lane.uploader.upload(file_path, progress_callback)
+                        for _ in range(3):
+                            try:
+                                return await client.upload_file(
+                                    file=file_path,
+                                    part_size_kb=512,  # Max chunk size (512KB) = 4x fewer API calls than default 128KB
+                                    file_size=file_size,  # Pre-provide size so Telethon skips stat() call
+                                    progress_callback=progress_callback
+                                )
+                            except FloodWaitError as fwe:
+                                # The client doesn't sleep through FloodWaits itself (flood_sleep_threshold=0)
+                                print(f"[Uploader] [WARNING] FloodWait {fwe.seconds}s uploading {file_name}")
+                                await asyncio.sleep(fwe.seconds)
+                        raise ConnectionError(f"{file_name} kept hitting FloodWaits")
+
+                    result = await upload()
+                    try:
+                        message = await self._store_video(client, result, caption, duration, thumb)
+                    except (FilePartMissingError, FilePartsInvalidError) as e:
+                        if not (resumable and upload_state):
+                            raise
+                        # Parts kept from an earlier attempt expired on Telegram's side: send the whole file again
+                        print(f"[Uploader] [WARNING] {file_name}: resumed upload was rejected ({e}), starting over")
+                        await lane.uploader.forget(file_path)
+                        result = await upload()
+                        message = await self._store_video(client, result, caption, duration, thumb)
+                    if resumable:
+                        await lane.uploader.forget(file_path)
 
             # Forward to user's chat using cached media reference (instant — no re-upload)
             if chat_id and str(chat_id) != str(STORE_CHANNEL_ID):
                 try:
-                    await self.telethon_client.send_message(
-                        entity=chat_id,
+                    media = message.media
+                    if lane is not None and not lane.primary:
+                        # File references are per account: the main session (the one in the user's chat) looks it up itself
+                        store = await telegram_gateway.call(
+                            self.telethon_client, None, lambda: self.telethon_client.get_entity(STORE_CHANNEL_ID)
+                        )
+                        stored = await telegram_gateway.call(
+                            self.telethon_client, store,
+                            lambda: self.telethon_client.get_messages(store, ids=message.id)
+                        )
+                        media = stored.media
+                    await telegram_gateway.send_message(
+                        self.telethon_client, chat_id,
                         message=caption,
-                        file=message.media,
+                        file=media,
                         reply_to=user_msg_id
                     )
                     print(f"[Uploader] [INFO] ✅ Forwarded to user chat {chat_id}")
                 except Exception as fwd_err:
                     print(f"[Uploader] [WARNING] Forward to user failed: {fwd_err}")
 
-            # Send completion message outside the lock so it doesn't block other uploads
+            # Send completion message outside the lane so it doesn't block other uploads
             await self.send_uploaded_message(chat_id, file_name, True)
             return message.id
 
@@ -320,15 +419,19 @@ class UploadManager:
             return None
         finally:
             # Always cleanup to prevent stale data from blocking future operations
-            self.progress_data.pop(chat_id, None)
-            self.last_update.pop(chat_id, None)
-            self._speed_data.pop(chat_id, None)
+            if live_dashboard and dashboard_job is not None:
+                live_dashboard.remove(chat_id, dashboard_job)
+            self.progress_data.pop(key, None)
+            self.last_update.pop(key, None)
+            self._speed_data.pop(key, None)
 
     async def send_video(self, file_path: str, caption: str, thumbnail: Optional[str] = None, 
                         duration: Optional[int] = None, chat_id: int = 0, 
                         user_msg_id: Optional[int] = None,
-                        bot_client=None, status_msg_id: Optional[int] = None) -> Optional[int]:
-        """Main entry point for video upload, always uses Telethon."""
+                        bot_client=None, status_msg_id: Optional[int] = None,
+                        dashboard_job=None, user_id: Optional[int] = None,
+                        uploaded_file: Optional[InputFileBig] = None) -> Optional[int]:
+        """Main entry point for video upload, always uses Telethon. Uploads are fair-shared per `user_id` (default: the chat)."""
         if not file_path or not isinstance(file_path, str) or len(file_path) < 2:
             print(f"[Uploader] [ERROR] Invalid file_path received: {file_path}")
             await self.send_uploaded_message(chat_id, "Invalid File", False, "Invalid file path provided")
@@ -341,7 +444,7 @@ class UploadManager:
 
         file_name = os.path.basename(file_path)
         print(f"[Uploader] [INFO] Uploading {file_name} using Telethon (user session).")
-        return await self._send_video_telethon_user_session(file_path, caption, thumbnail, duration, chat_id, user_msg_id, bot_client, status_msg_id)
+        return await self._send_video_telethon_user_session(file_path, caption, thumbnail, duration, chat_id, user_msg_id, bot_client, status_msg_id, dashboard_job, user_id, uploaded_file)
 
     async def upload_sequence(self, video_list: List[Dict[str, str]], chat_id: int, user_msg_id: Optional[int] = None) -> List[int]:
         """Process multiple videos in sequence"""
@@ -368,8 +471,10 @@ upload_manager = UploadManager()
 async def send_video(file_path: str, caption: str, thumbnail: Optional[str] = None, 
                     duration: Optional[int] = None, chat_id: int = 0, 
                     user_msg_id: Optional[int] = None,
-                    bot_client=None, status_msg_id: Optional[int] = None) -> Optional[int]:
-    """Public interface for single video upload"""
+                    bot_client=None, status_msg_id: Optional[int] = None,
+                    dashboard_job=None, user_id: Optional[int] = None,
+                    uploaded_file: Optional[InputFileBig] = None) -> Optional[int]:
+    """Public interface for single video upload; `uploaded_file` skips the upload (see UploadManager.tail_upload)"""
     return await upload_manager.send_video(
         file_path=file_path,
         caption=caption,
@@ -378,7 +483,10 @@ async def send_video(file_path: str, caption: str, thumbnail: Optional[str] = No
         chat_id=chat_id,
         user_msg_id=user_msg_id,
         bot_client=bot_client,
-        status_msg_id=status_msg_id
+        status_msg_id=status_msg_id,
+        dashboard_job=dashboard_job,
+        user_id=user_id,
+        uploaded_file=uploaded_file
     )
 
 async def upload_videos(video_list: List[Dict[str, str]], chat_id: int, user_msg_id: Optional[int] = None) -> List[int]:
@@ -0,0 +1,335 @@
+import os
+import time
+import asyncio
+import logging
+from copy import copy
+from typing import Callable, Dict, Optional
+
+from telethon import functions
+from telethon.helpers import generate_random_long
+from telethon.network import MTProtoSender
+from telethon.tl.alltlobjects import LAYER
+from telethon.tl.types import InputFileBig
+from telethon.errors.rpcerrorlist import FloodWaitError
+
+from uploaders.upload_state import file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+PART_SIZE = 512 * 1024
+# Telegram only accepts SaveBigFilePart for files over 10 MB
+BIG_FILE_SIZE = 10 * 1024 * 1024
+# Acknowledged parts are persisted in batches of this many
+ACK_BATCH = 16
+# Relative throughput change that counts as better/worse when tuning the connection count
+TUNE_THRESHOLD = 0.05
+
+
+def _read_part(file, part: int) -> bytes:
+    file.seek(part * PART_SIZE)
+    return file.read(PART_SIZE)
+
+
+def _read_tail_part(fd: int, part: int, start_offset: int, prefix_size: int) -> bytes:
+    """Part of the virtual file `bytes[:prefix_size] + bytes[start_offset:]` of a file descriptor."""
+    position = part * PART_SIZE
+    data = b""
+    if position < prefix_size:
+        data = os.pread(fd, min(PART_SIZE, prefix_size - position), position)
+        position += len(data)
+    if len(data) < PART_SIZE:
+        data += os.pread(fd, PART_SIZE - len(data), start_offset + position - prefix_size)
+    return data
+
+
+class ParallelUploader:
+    """
+    Uploads big files over several MTProto connections at once.
+
+    Telethon's `upload_file` sends one part at a time over the client's main
+    connection. This opens extra senders to the account's own DC, reusing
+    its auth key, and runs a worker per sender pulling `SaveBigFilePart`
+    parts off a shared queue. Every `window` seconds the measured throughput
+    decides whether another connection is put to work (the last change
+    helped) or one is parked (throughput fell), between `min_connections`
+    and `max_connections`; the level reached carries over to the next file.
+    A failed part is retried on its own, honouring FloodWaits, on a freshly
+    reconnected sender.
+
+    With a `state_store`, acknowledged parts are persisted as they land, so
+    uploading the same (unchanged) file again, after a failure or a restart,
+    reuses its `file_id` and sends only the missing parts.
+    """
+
+    def __init__(self, client, connections: int = 4, min_connections: int = 1, max_connections: int = 8,
+                 retries: int = 5, window: float = 5.0, state_store=None):
+        self.client = client
+        self.state_store = state_store
+        self.min_connections = max(1, min_connections)
+        self.max_connections = max(self.min_connections, max_connections)
+        self.connections = min(max(connections, self.min_connections), self.max_connections)
+        self.retries = retries
+        self.window = window
+        self._senders: Dict[int, MTProtoSender] = {}
+        self._connecting: Dict[int, asyncio.Task] = {}
+        self.last_speed = 0.0
+
+    # ── Senders ──
+
+    async def _connect_sender(self) -> MTProtoSender:
+        client = self.client
+        dc = await client._get_dc(client.session.dc_id)
+        sender = MTProtoSender(client.session.auth_key, loggers=client._log)
+        await sender.connect(client._connection(
+            dc.ip_address, dc.port, dc.id,
+            loggers=client._log, proxy=client._proxy, local_addr=client._local_addr
+        ))
+        # Each connection has to announce the layer; a copy, since the client's own request object is shared
+        init = copy(client._init_request)
+        init.query = functions.help.GetConfigRequest()
+        await sender.send(functions.InvokeWithLayerRequest(LAYER, functions.InvokeWithoutUpdatesRequest(init)))
+        return sender
+
+    async def _sender(self, slot: int) -> MTProtoSender:
+        sender = self._senders.get(slot)
+        if sender is not None and sender.is_connected():
+            return sender
+        if slot not in self._connecting:
+            self._connecting[slot] = asyncio.create_task(self._connect_sender())
+        try:
+            sender = await self._connecting[slot]
+        finally:
+            self._connecting.pop(slot, None)
+        self._senders[slot] = sender
+        return sender
+
+    async def _drop_sender(self, slot: int):
+        sender = self._senders.pop(slot, None)
+        if sender is not None:
+            try:
+                await sender.disconnect()
+            except Exception:
+                pass
+
+    async def close(self):
+        """Disconnects the extra senders."""
+        for slot in list(self._senders):
+            await self._drop_sender(slot)
+
+    # ── Upload ──
+
+    async def _state_key(self, path: str) -> str:
+        fingerprint = await asyncio.to_thread(file_fingerprint, path)
+        # Uploaded parts belong to the account that sent them
+        return f"{fingerprint}:{self.client.session.auth_key.key_id}"
+
+    async def forget(self, path: str):
+        """Drops a file's saved progress: it's been sent, or Telegram no longer has its parts."""
+        if self.state_store:
+            self.state_store.forget(await self._state_key(path))
+
+    async def _send_part(self, slot: int, file_id: int, part: int, total_parts: int, data: bytes):
+        request = functions.upload.SaveBigFilePartRequest(file_id, part, total_parts, data)
+        for attempt in range(self.retries):
+            try:
+                sender = await self._sender(slot)
+                if await self.client._call(sender, request):
+                    return
+                raise ConnectionError(f"Part {part} was not saved")
+            except FloodWaitError as e:
+                logger.warning(f"[Uploader] FloodWait {e.seconds}s on part {part}")
+                await asyncio.sleep(e.seconds)
+            except Exception as e:
+                if attempt == self.retries - 1:
+                    raise
+                logger.warning(f"[Uploader] Part {part} failed ({e}), retrying on a new connection")
+                await self._drop_sender(slot)
+                await asyncio.sleep(min(2 ** attempt, 30))
+        raise ConnectionError(f"Part {part} kept hitting FloodWaits")
+
+    async def upload(self, path: str, progress_callback: Optional[Callable[[int, int], None]] = None) -> InputFileBig:
+        """
+        Uploads a file of more than BIG_FILE_SIZE bytes.
+
+        Args:
+            path: File to upload
+            progress_callback: Called with (bytes sent, total bytes) after every part
+
+        Returns:
+            InputFileBig to pass as `file=` when sending the message
+        """
+        size = os.path.getsize(path)
+        total_parts = -(-size // PART_SIZE)
+        file_id = generate_random_long()
+        done_parts = set()
+        fingerprint = None
+        if self.state_store:
+            fingerprint = await self._state_key(path)
+            saved = self.state_store.load(fingerprint)
+            if saved and saved['part_size'] == PART_SIZE and saved['total_parts'] == total_parts:
+                file_id, done_parts = saved['file_id'], saved['parts']
+                logger.info(f"[Uploader] Resuming {os.path.basename(path)}: "
+                            f"{len(done_parts)}/{total_parts} parts already uploaded")
+            else:
+                self.state_store.begin(fingerprint, file_id, PART_SIZE, total_parts, size)
+        acked = []
+
+        def flush_acks():
+            if fingerprint and acked:
+                self.state_store.ack(fingerprint, acked)
+                acked.clear()
+
+        pending: asyncio.Queue = asyncio.Queue()
+        for part in range(total_parts):
+            if part not in done_parts:
+                pending.put_nowait(part)
+        resumed_bytes = sum(min(PART_SIZE, size - part * PART_SIZE) for part in done_parts)
+        progress = {'sent': resumed_bytes, 'active': max(1, min(self.connections, pending.qsize()))}
+
+        async def worker(slot: int):
+            with open(path, "rb") as file:
+                while not pending.empty():
+                    if slot >= progress['active']:
+                        await asyncio.sleep(0.5)  # Parked by the tuner
+                        continue
+                    part = pending.get_nowait()
+                    data = await asyncio.to_thread(_read_part, file, part)
+                    await self._send_part(slot, file_id, part, total_parts, data)
+                    progress['sent'] += len(data)
+                    acked.append(part)
+                    if len(acked) >= ACK_BATCH:
+                        flush_acks()
+                    if progress_callback:
+                        progress_callback(progress['sent'], size)
+
+        async def tune():
+            """Hill-climbs the number of active connections on measured throughput."""
+            last_sent, last_rate, direction = progress['sent'], None, 1
+            while True:
+                await asyncio.sleep(self.window)
+                rate = (progress['sent'] - last_sent) / self.window
+                last_sent = progress['sent']
+                if last_rate is None or rate > last_rate * (1 + TUNE_THRESHOLD):
+                    step = direction
+                elif rate < last_rate * (1 - TUNE_THRESHOLD):
+                    direction = -direction
+                    step = direction
+                else:
+                    step = 0  # Plateau: more connections wouldn't help
+                last_rate = rate
+                progress['active'] = min(max(progress['active'] + step, self.min_connections), self.max_connections)
+
+        started = time.monotonic()
+        workers = [asyncio.create_task(worker(slot)) for slot in range(min(self.max_connections, pending.qsize()))]
+        tuner = asyncio.create_task(tune())
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            tuner.cancel()
+            for task in workers:
+                task.cancel()
+            # Whatever landed is kept, so the next attempt at this file skips it
+            flush_acks()
+        elapsed = time.monotonic() - started
+        sent = size - resumed_bytes
+        self.connections = progress['active']
+        self.last_speed = sent / elapsed if elapsed > 0 else 0.0
+        logger.info(f"[Uploader] {os.path.basename(path)}: {sent / 1048576:.1f} MB in {elapsed:.0f}s "
+                    f"({self.last_speed / 1048576:.2f} MB/s, {self.connections} connections)")
+        return InputFileBig(file_id, total_parts, os.path.basename(path))
+
+    async def upload_growing(self, path: str, is_complete: Callable[[], bool],
+                             should_abort: Optional[Callable[[], bool]] = None,
+                             start_offset: int = 0, prefix_size: int = 0, max_size: Optional[int] = None,
+                             poll_interval: float = 1.0) -> Optional[Dict[str, any]]:
+        """
+        Uploads a file while its writer is still appending to it.
+
+        Full parts are sent as soon as they're on disk, announced with a
+        total part count of -1; once `is_complete()` turns true the size is
+        final, and the remaining parts (always including the last) carry the
+        real count. The file is followed through one open descriptor, so the
+        writer may rename it when it finishes. Nothing is sent until the file
+        is past BIG_FILE_SIZE. Only the first `prefix_size` bytes and then
+        everything from `start_offset` on are uploaded, so a leading range
+        (e.g. a pre-roll after an fMP4 init segment) can be skipped.
+
+        Args:
+            path: File being written; must only ever be appended to
+            is_complete: True once the writer has closed the file for good
+            should_abort: True if the file is going to be replaced, so the upload is pointless
+            start_offset: Byte offset where the uploaded content resumes after the prefix
+            prefix_size: Leading bytes always included (the init segment)
+            max_size: Give up once the uploaded size would exceed this
+            poll_interval: Seconds between size checks
+
+        Returns:
+            Dict with the InputFileBig as `file` and the uploaded `size`, or None
+            if the upload was given up (aborted, too big, or finished too small)
+        """
+        file_id = generate_random_long()
+        fd = os.open(path, os.O_RDONLY)
+        ready: asyncio.Queue = asyncio.Queue()
+        state = {'total_parts': -1, 'size': 0, 'sent': 0}
+        workers_count = self.connections
+
+        async def follow() -> bool:
+            next_part = 0
+            while True:
+                complete = is_complete()  # Checked before the size, so a complete file's size is final
+                size = prefix_size + max(0, os.fstat(fd).st_size - start_offset)
+                if should_abort and should_abort():
+                    logger.info(f"[Uploader] {os.path.basename(path)} is being replaced, dropping its live upload")
+                    return False
+                if max_size and size > max_size:
+                    logger.info(f"[Uploader] {os.path.basename(path)} outgrew {max_size / 1048576:.0f} MB, dropping its live upload")
+                    return False
+                if complete:
+                    if size <= BIG_FILE_SIZE:
+                        return False
+                    state['size'] = size
+                    state['total_parts'] = -(-size // PART_SIZE)
+                    for part in range(next_part, state['total_parts']):
+                        ready.put_nowait(part)
+                    break
+                if size > BIG_FILE_SIZE:
+                    while (next_part + 1) * PART_SIZE <= size:
+                        ready.put_nowait(next_part)
+                        next_part += 1
+                await asyncio.sleep(poll_interval)
+            for _ in range(workers_count):
+                ready.put_nowait(None)
+            return True
+
+        async def worker(slot: int):
+            while True:
+                part = await ready.get()
+                if part is None:
+                    return
+                data = await asyncio.to_thread(_read_tail_part, fd, part, start_offset, prefix_size)
+                await self._send_part(slot, file_id, part, state['total_parts'], data)
+                state['sent'] += len(data)
+
+        started = time.monotonic()
+        follower = asyncio.create_task(follow())
+        tasks = [follower] + [asyncio.create_task(worker(slot)) for slot in range(workers_count)]
+        try:
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()  # Re-raises a failed part or follower
+                if follower.done() and not follower.result():
+                    return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            os.close(fd)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"[Uploader] {os.path.basename(path)}: {state['size'] / 1048576:.1f} MB uploaded live "
+                    f"over {elapsed:.0f}s")
+        return {
+            'file': InputFileBig(file_id, state['total_parts'], os.path.basename(path)),
+            'size': state['size'],
+        }
@@ -0,0 +1,157 @@
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from uploaders.parallel_upload import ParallelUploader
+
+logger = logging.getLogger(__name__)
+
+
+class UploadLane:
+    """One upload slot: a user session's client plus the ParallelUploader it runs files through."""
+
+    def __init__(self, session: int, client, uploader: ParallelUploader):
+        self.session = session
+        self.client = client
+        self.uploader = uploader
+        self.busy = False
+
+    @property
+    def primary(self) -> bool:
+        """Whether this lane belongs to the main SESSION_STRING account."""
+        return self.session == 0
+
+
+class UploadSessionPool:
+    """
+    Hands out upload lanes (session x slot) to files, fair-sharing between users.
+
+    Every configured user session gets `slots_per_session` lanes, each with
+    its own ParallelUploader, so N sessions upload N x slots files at once
+    (and each file still goes out over several connections). A file waits
+    for a free lane in a queue ordered by round: a user's k-th concurrent
+    upload is in round k, so a user's batch of ten parts doesn't hold up the
+    single file of the next user. Within a round it's FIFO.
+    A free lane is taken from the least busy session.
+    """
+
+    def __init__(self, clients: List, slots_per_session: int = 1,
+                 make_uploader: Callable[[object], ParallelUploader] = ParallelUploader):
+        self.clients = clients
+        self.lanes = [UploadLane(session, client, make_uploader(client))
+                      for session, client in enumerate(clients)
+                      for _ in range(max(1, slots_per_session))]
+        self._waiting: List[Dict[str, any]] = []
+        self._active_by_user: Dict[int, int] = {}
+        self._changed = asyncio.Event()
+        self._order = itertools.count()
+        self.completed = 0
+
+    @property
+    def primary_client(self):
+        return self.clients[0]
+
+    async def start(self):
+        """Connects every session that isn't connected yet."""
+        for index, client in enumerate(self.clients):
+            if not client.is_connected():
+                await client.start()
+            if index:
+                logger.info(f"[Upload Pool] Session {index + 1} connected")
+
+    async def close(self):
+        """Disconnects the uploaders' extra connections and the extra sessions."""
+        for lane in self.lanes:
+            await lane.uploader.close()
+        for client in self.clients[1:]:
+            if client.is_connected():
+                await client.disconnect()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _queue_order(self) -> List[Dict[str, any]]:
+        seen: Dict[int, int] = {}
+        rounds = {}
+        for ticket in sorted(self._waiting, key=lambda t: t['order']):
+            user = ticket['user_id']
+            rounds[id(ticket)] = self._active_by_user.get(user, 0) + seen.get(user, 0)
+            seen[user] = seen.get(user, 0) + 1
+        return sorted(self._waiting, key=lambda t: (rounds[id(t)], t['order']))
+
+    def _free_lane(self) -> Optional[UploadLane]:
+        load: Dict[int, int] = {}
+        for lane in self.lanes:
+            load[lane.session] = load.get(lane.session, 0) + lane.busy
+        free = [lane for lane in self.lanes if not lane.busy]
+        return min(free, key=lambda lane: load[lane.session]) if free else None
+
+    def position(self, ticket: Dict[str, any]) -> int:
+        """1-based position of a waiting ticket in dispatch order, 0 if it isn't waiting."""
+        for index, waiting in enumerate(self._queue_order(), start=1):
+            if waiting is ticket:
+                return index
+        return 0
+
+    @asynccontextmanager
+    async def lane(self, user_id: int, on_wait: Optional[Callable[[int, int], Awaitable[None]]] = None):
+        """
+        Holds a free upload lane for the duration of one file.
+
+        Args:
+            user_id: Owner of the upload, for fair sharing
+            on_wait: Called with (position, queue length) whenever the position changes while queued
+
+        Yields:
+            The UploadLane to upload and send the file with
+        """
+        ticket = {'user_id': user_id, 'order': next(self._order)}
+        self._waiting.append(ticket)
+        self._notify()
+
+        last_position = None
+        try:
+            while True:
+                lane = self._free_lane()
+                if lane and self._queue_order()[0] is ticket:
+                    break
+                position = self.position(ticket)
+                if on_wait and position != last_position:
+                    last_position = position
+                    await on_wait(position, len(self._waiting))
+                changed = self._changed
+                lane = self._free_lane()
+                if lane and self._queue_order()[0] is ticket:
+                    break
+                await changed.wait()
+        except BaseException:
+            self._waiting.remove(ticket)
+            self._notify()
+            raise
+
+        self._waiting.remove(ticket)
+        lane.busy = True
+        self._active_by_user[user_id] = self._active_by_user.get(user_id, 0) + 1
+        self._notify()
+        try:
+            yield lane
+        finally:
+            lane.busy = False
+            self.completed += 1
+            self._active_by_user[user_id] -= 1
+            if not self._active_by_user[user_id]:
+                del self._active_by_user[user_id]
+            self._notify()
+
+    def stats(self) -> Dict[str, any]:
+        """Session, lane and queue counts, for /status."""
+        return {
+            'sessions': len(self.clients),
+            'lanes': len(self.lanes),
+            'busy': sum(lane.busy for lane in self.lanes),
+            'waiting': len(self._waiting),
+            'completed': self.completed,
+        }
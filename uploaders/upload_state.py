@@ -0,0 +1,143 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, Optional
+
+from config import JOB_JOURNAL_PATH, UPLOAD_RESUME_HOURS
+
+# Bytes hashed from each end of a file for its fingerprint
+FINGERPRINT_SAMPLE = 64 * 1024
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    Identifies a file's content cheaply: size, mtime and its first and last 64 KB.
+
+    Survives renames and moves (shutil.move keeps the mtime), but changes
+    as soon as the file is rewritten or appended to.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE))
+        if stat.st_size > FINGERPRINT_SAMPLE:
+            f.seek(max(FINGERPRINT_SAMPLE, stat.st_size - FINGERPRINT_SAMPLE))
+            digest.update(f.read(FINGERPRINT_SAMPLE))
+    return digest.hexdigest()
+
+
+class UploadStateStore:
+    """
+    Durable progress of big-file uploads, so a retry or a restart only sends missing parts.
+
+    Telegram keeps the parts of an unfinished upload under its random
+    `file_id` for a while, so an upload resumed with the same id, part size
+    and part count only has to send what wasn't acknowledged. Stored per
+    file fingerprint in SQLite (WAL, next to the job journal); entries
+    older than `max_age` seconds are treated as expired on Telegram's side.
+    Opened (and pruned) on first use, like the journal.
+    """
+
+    def __init__(self, path: str, max_age: float = 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._connection is None:
+            with self._open_lock:
+                if self._connection is None:
+                    self._connection = self._open()
+        return self._connection
+
+    def _open(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                fingerprint TEXT PRIMARY KEY,
+                file_id INTEGER NOT NULL,
+                part_size INTEGER NOT NULL,
+                total_parts INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS upload_parts (
+                fingerprint TEXT NOT NULL,
+                part INTEGER NOT NULL,
+                PRIMARY KEY (fingerprint, part)
+            );
+        """)
+        with conn:
+            # Called with _lock possibly held, so the expired entries are pruned without prune()
+            cutoff = time.time() - self.max_age
+            conn.execute(
+                "DELETE FROM upload_parts WHERE fingerprint IN (SELECT fingerprint FROM uploads WHERE created_at < ?)",
+                (cutoff,)
+            )
+            conn.execute("DELETE FROM uploads WHERE created_at < ?", (cutoff,))
+        return conn
+
+    def load(self, fingerprint: str) -> Optional[Dict[str, any]]:
+        """Saved upload of a file: `file_id`, `part_size`, `total_parts`, `size` and acknowledged `parts`."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id, part_size, total_parts, size, created_at FROM uploads WHERE fingerprint=?",
+                (fingerprint,)
+            ).fetchone()
+            if row is None or time.time() - row[4] > self.max_age:
+                return None
+            parts = {part for (part,) in self._conn.execute(
+                "SELECT part FROM upload_parts WHERE fingerprint=?", (fingerprint,)
+            )}
+        return {'file_id': row[0], 'part_size': row[1], 'total_parts': row[2], 'size': row[3], 'parts': parts}
+
+    def begin(self, fingerprint: str, file_id: int, part_size: int, total_parts: int, size: int):
+        """Starts tracking a new upload of a file, replacing any earlier one."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM upload_parts WHERE fingerprint=?", (fingerprint,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (fingerprint, file_id, part_size, total_parts, size, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (fingerprint, file_id, part_size, total_parts, size, time.time())
+            )
+
+    def ack(self, fingerprint: str, parts: Iterable[int]):
+        """Records parts Telegram has confirmed."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO upload_parts (fingerprint, part) VALUES (?, ?)",
+                ((fingerprint, part) for part in parts)
+            )
+
+    def forget(self, fingerprint: str):
+        """Drops a file's upload state once it's been sent (or its parts expired)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM upload_parts WHERE fingerprint=?", (fingerprint,))
+            self._conn.execute("DELETE FROM uploads WHERE fingerprint=?", (fingerprint,))
+
+    def prune(self):
+        """Deletes uploads too old to resume."""
+        cutoff = time.time() - self.max_age
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM upload_parts WHERE fingerprint IN (SELECT fingerprint FROM uploads WHERE created_at < ?)",
+                (cutoff,)
+            )
+            self._conn.execute("DELETE FROM uploads WHERE created_at < ?", (cutoff,))
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+upload_state = UploadStateStore(JOB_JOURNAL_PATH, UPLOAD_RESUME_HOURS * 3600) if UPLOAD_RESUME_HOURS > 0 else None
@@ -0,0 +1,183 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from config import JOB_JOURNAL_PATH
+
+# Terminal states: nothing left to recover
+FINAL_STATES = ("done", "failed", "cancelled")
+
+
+class JobJournal:
+    """
+    Durable record of every recording job and its state transitions.
+
+    Backed by a local SQLite file in WAL mode, so each transition is on disk
+    before the bot moves on and survives crashes and redeploys. `jobs` holds
+    the latest state of each job, `events` the full history. Jobs are keyed
+    by (chat id, message id of the command): message ids are only unique
+    within a chat.
+
+    States: scheduled -> queued -> recording -> uploading -> done,
+    or failed / cancelled at any point.
+
+    The database is opened on first use, so importing the journal doesn't create it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._connection is None:
+            with self._open_lock:
+                if self._connection is None:
+                    self._connection = self._open()
+        return self._connection
+
+    def _open(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        migrating = self._retire_v1(conn)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                url TEXT NOT NULL,
+                channel TEXT,
+                title TEXT,
+                duration_sec INTEGER NOT NULL,
+                split_duration_sec INTEGER,
+                chat_id INTEGER NOT NULL,
+                user_id INTEGER,
+                start_at REAL NOT NULL,
+                started_at REAL,
+                temp_base TEXT,
+                current_file TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (chat_id, job_id)
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                chat_id INTEGER NOT NULL,
+                job_id INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                detail TEXT,
+                at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+        """)
+        if migrating:
+            self._import_v1(conn)
+        return conn
+
+    @staticmethod
+    def _retire_v1(conn: sqlite3.Connection) -> bool:
+        """Moves aside a journal written when jobs were keyed by message id alone."""
+        columns = {row[1]: row[5] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if not columns or columns.get("chat_id"):
+            return False  # New journal, or chat_id is already part of the primary key
+        with conn:
+            conn.execute("ALTER TABLE jobs RENAME TO jobs_v1")
+            conn.execute("ALTER TABLE events RENAME TO events_v1")
+            conn.execute("DROP INDEX IF EXISTS idx_jobs_state")
+        return True
+
+    @staticmethod
+    def _import_v1(conn: sqlite3.Connection):
+        """Copies the retired journal into the (chat_id, job_id) keyed tables."""
+        columns = ("job_id, state, url, channel, title, duration_sec, split_duration_sec, chat_id, user_id, "
+                   "start_at, started_at, temp_base, current_file, error, created_at, updated_at")
+        with conn:
+            conn.execute(f"INSERT OR IGNORE INTO jobs ({columns}) SELECT {columns} FROM jobs_v1")
+            conn.execute("""
+                INSERT INTO events (chat_id, job_id, state, detail, at)
+                SELECT jobs_v1.chat_id, events_v1.job_id, events_v1.state, events_v1.detail, events_v1.at
+                FROM events_v1 JOIN jobs_v1 ON jobs_v1.job_id = events_v1.job_id
+            """)
+            conn.execute("DROP TABLE jobs_v1")
+            conn.execute("DROP TABLE events_v1")
+
+    def _log_event(self, chat_id: int, job_id: int, state: str, detail: Optional[str], now: float):
+        self._conn.execute(
+            "INSERT INTO events (chat_id, job_id, state, detail, at) VALUES (?, ?, ?, ?, ?)",
+            (chat_id, job_id, state, detail, now)
+        )
+
+    def add(self, job_id: int, state: str, url: str, channel: str, title: str, duration_sec: int,
+            chat_id: int, user_id: int, start_at: float, split_duration_sec: Optional[int] = None):
+        """Records a new job, or re-arms the same chat's job (e.g. after recovery)."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO jobs (job_id, state, url, channel, title, duration_sec, split_duration_sec,
+                                  chat_id, user_id, start_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(chat_id, job_id) DO UPDATE SET
+                    state=excluded.state, url=excluded.url, duration_sec=excluded.duration_sec,
+                    start_at=excluded.start_at, started_at=NULL, temp_base=NULL,
+                    current_file=NULL, error=NULL, updated_at=excluded.updated_at
+            """, (job_id, state, url, channel, title, duration_sec, split_duration_sec,
+                  chat_id, user_id, start_at, now, now))
+            self._log_event(chat_id, job_id, state, None, now)
+
+    def transition(self, chat_id: int, job_id: Optional[int], state: str, detail: Optional[str] = None, **fields):
+        """
+        Moves a job to `state`, optionally updating columns such as temp_base or error.
+
+        Unknown job ids are ignored, so callers don't need to check first.
+        """
+        if job_id is None:
+            return
+        now = time.time()
+        columns = ", ".join(f"{name}=?" for name in fields)
+        assignments = f"state=?, updated_at=?{', ' + columns if columns else ''}"
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE chat_id=? AND job_id=?",
+                (state, now, *fields.values(), chat_id, job_id)
+            )
+            if cursor.rowcount:
+                self._log_event(chat_id, job_id, state, detail, now)
+
+    def set_current_file(self, chat_id: int, job_id: Optional[int], path: Optional[str]):
+        """Remembers the renamed file being uploaded, which no longer matches temp_base."""
+        if job_id is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET current_file=? WHERE chat_id=? AND job_id=?", (path, chat_id, job_id))
+
+    def get(self, chat_id: int, job_id: int) -> Optional[Dict[str, any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE chat_id=? AND job_id=?", (chat_id, job_id)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self) -> List[Dict[str, any]]:
+        """Jobs that were pending or in flight when the bot last stopped."""
+        placeholders = ", ".join("?" for _ in FINAL_STATES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE state NOT IN ({placeholders}) ORDER BY start_at",
+                FINAL_STATES
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+job_journal = JobJournal(JOB_JOURNAL_PATH)
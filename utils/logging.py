@@ -3,6 +3,7 @@ from datetime import datetime
 from pytz import timezone
 from telethon.sync import TelegramClient
 from config import LOG_CHANNEL
+from utils.telegram_gateway import telegram_gateway, BULK
 
 async def log_to_channel(telethon_client: TelegramClient, user_id: int, username: str, command: str, start_time_str: str, filename: str):
     """Async function to log events to Telegram channel using Telethon."""
@@ -21,10 +22,11 @@ async def log_to_channel(telethon_client: TelegramClient, user_id: int, username
             f"⏱️ **Scheduled Time:** `{start_time_str}`"
         )
 
-        await telethon_client.send_message(
-            entity=LOG_CHANNEL,
+        await telegram_gateway.send_message(
+            telethon_client, LOG_CHANNEL,
             message=log_message,
-            parse_mode="markdown" # Telethon handles MarkdownV2 automatically
+            parse_mode="markdown", # Telethon handles MarkdownV2 automatically
+            priority=BULK
         )
     except Exception as e:
         print(f"Failed to log to channel: {e}")
@@ -0,0 +1,315 @@
+import time
+import heapq
+import asyncio
+import itertools
+from typing import Awaitable, Callable, Dict, List, Optional
+from telethon.errors.rpcerrorlist import FloodWaitError
+from config import GATEWAY_GLOBAL_RATE, GATEWAY_GLOBAL_BURST, GATEWAY_CHAT_RATE, GATEWAY_CHAT_BURST, GATEWAY_MAX_FLOOD_WAIT
+
+# Priority classes, most urgent first
+REPLY = 0      # Direct answers to a user's command (/rec, /cancel, ...)
+NOTICE = 1     # Lifecycle messages: recording started/finished, upload done, file delivery
+PROGRESS = 2   # Periodic progress edits; coalesced and dropped on FloodWait
+BULK = 3       # Broadcasts and other mass sends
+
+CLASS_NAMES = {REPLY: "reply", NOTICE: "notice", PROGRESS: "progress", BULK: "bulk"}
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `burst` saved up."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, needed: float, now: float) -> float:
+        """Seconds until `needed` tokens are available (0 = now)."""
+        self._refill(now)
+        if self.tokens >= needed or self.rate <= 0:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class TelegramGateway:
+    """
+    Single path for outgoing Telegram API calls.
+
+    Calls queue by priority class and are dispatched when both the client's
+    global token bucket and the target chat's bucket allow it. Progress
+    edits must leave one chat token spare, so a user's reply never waits
+    behind them. A newer edit of a message that is still queued replaces the
+    older one instead of queueing twice.
+
+    A FloodWait pauses only the failing class (and less urgent ones) in that
+    chat. Progress edits are not retried: the FloodWaitError goes back to
+    the caller, who will have a newer edit soon. Replies and notices are
+    retried once the wait is over, unless the wait exceeds `max_flood_wait`.
+    """
+
+    def __init__(self, global_rate: float = 25, global_burst: float = 30,
+                 chat_rate: float = 1, chat_burst: float = 3, max_flood_wait: float = 300):
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_flood_wait = max_flood_wait
+
+        self._queue: List = []
+        self._seq = itertools.count()
+        self._edits: Dict[tuple, Dict[str, any]] = {}
+        self._global_buckets: Dict[int, TokenBucket] = {}
+        self._chat_buckets: Dict[tuple, TokenBucket] = {}
+        self._blocked: Dict[tuple, float] = {}
+        self._in_flight = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self.sent = {name: 0 for name in CLASS_NAMES.values()}
+        self.coalesced = 0
+        self.flood_waits = 0
+        self.flood_seconds = 0
+        self.max_queue_delay = {name: 0.0 for name in CLASS_NAMES.values()}
+
+    # ━━━ Public calls ━━━
+
+    async def send_message(self, client, entity, *args, priority: int = NOTICE, **kwargs):
+        return await self.call(client, entity, lambda: client.send_message(entity, *args, **kwargs), priority)
+
+    async def reply(self, event, *args, priority: int = REPLY, **kwargs):
+        """`event.reply()` through the gateway."""
+        return await self.call(event.client, event.chat_id, lambda: event.reply(*args, **kwargs), priority)
+
+    async def edit(self, event, *args, priority: int = REPLY, **kwargs):
+        """`event.edit()` (a button press answering in place) through the gateway."""
+        return await self.call(event.client, event.chat_id, lambda: event.edit(*args, **kwargs), priority)
+
+    async def edit_message(self, client, entity, message, *args, priority: int = PROGRESS, **kwargs):
+        """Edits a message; a queued edit of the same message is replaced by this one."""
+        key = (id(client), self._chat_key(entity), getattr(message, 'id', message))
+        return await self.call(client, entity, lambda: client.edit_message(entity, message, *args, **kwargs),
+                               priority, coalesce_key=key)
+
+    async def forward_messages(self, client, entity, messages, *args, priority: int = NOTICE, **kwargs):
+        return await self.call(client, entity, lambda: client.forward_messages(entity, messages, *args, **kwargs),
+                               priority)
+
+    async def call(self, client, entity, make_call: Callable[[], Awaitable[any]], priority: int = NOTICE,
+                   coalesce_key: Optional[tuple] = None):
+        """
+        Queues an arbitrary API call.
+
+        Args:
+            client: Telethon client making the call; rate limits are per client
+            entity: Target chat, or None for calls that aren't chat-bound
+            make_call: Creates the coroutine; called once per attempt
+            priority: REPLY, NOTICE, PROGRESS or BULK
+            coalesce_key: Queued calls with the same key collapse into the latest one
+
+        Returns:
+            The call's result. Superseded edits return the result of the edit that replaced them.
+            A caller cancelled while waiting takes its queued or running call down with it
+            (coalesced edits stay, their message may have other waiters).
+        """
+        if coalesce_key is not None and coalesce_key in self._edits:
+            request = self._edits[coalesce_key]
+            request['make_call'] = make_call
+            self.coalesced += 1
+            if priority < request['priority']:
+                # A lifecycle edit overtaking a queued progress edit keeps its urgency
+                request['priority'] = priority
+                self._push(request)
+            return await asyncio.shield(request['future'])
+
+        request = {
+            'client': client, 'chat': (id(client), self._chat_key(entity)) if entity is not None else None,
+            'make_call': make_call, 'priority': priority, 'coalesce_key': coalesce_key,
+            'future': asyncio.get_running_loop().create_future(), 'queued_at': time.monotonic(),
+            'done': False,
+        }
+        if coalesce_key is not None:
+            self._edits[coalesce_key] = request
+        self._push(request)
+        try:
+            return await asyncio.shield(request['future'])
+        except asyncio.CancelledError:
+            if coalesce_key is None:
+                self._abandon(request)
+            raise
+
+    def _abandon(self, request: Dict[str, any]):
+        """Drops a call nobody waits for anymore: unqueued if pending, cancelled if running."""
+        request['done'] = True
+        task = request.get('task')
+        if task and not task.done():
+            task.cancel()
+        if not request['future'].done():
+            request['future'].cancel()
+
+    # ━━━ Dispatching ━━━
+
+    @staticmethod
+    def _chat_key(entity):
+        return getattr(entity, 'id', entity)
+
+    def _push(self, request: Dict[str, any]):
+        heapq.heappush(self._queue, (request['priority'], next(self._seq), request))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+
+    def _buckets(self, request: Dict[str, any]):
+        client_id = id(request['client'])
+        global_bucket = self._global_buckets.setdefault(
+            client_id, TokenBucket(self.global_rate, self.global_burst))
+        chat_bucket = None
+        if request['chat'] is not None:
+            chat_bucket = self._chat_buckets.setdefault(
+                request['chat'], TokenBucket(self.chat_rate, self.chat_burst))
+        return global_bucket, chat_bucket
+
+    def _wait_time(self, request: Dict[str, any], now: float) -> float:
+        blocked = self._blocked.get((request['chat'], request['priority']), 0) - now
+        global_bucket, chat_bucket = self._buckets(request)
+        wait = max(blocked, global_bucket.wait_time(1, now))
+        if chat_bucket:
+            # Background traffic keeps a token in reserve for replies
+            needed = 2 if request['priority'] >= PROGRESS and self.chat_burst >= 2 else 1
+            wait = max(wait, chat_bucket.wait_time(needed, now))
+        return max(wait, 0.0)
+
+    async def _dispatch(self):
+        while self._queue:
+            now = time.monotonic()
+            ready = None
+            deferred = []
+            next_wake = None
+            while self._queue:
+                item = heapq.heappop(self._queue)
+                request = item[2]
+                if request['done'] or item[0] != request['priority']:
+                    continue  # Already sent, or re-queued under a higher priority
+                wait = self._wait_time(request, now)
+                if wait == 0:
+                    ready = request
+                    break
+                deferred.append(item)
+                next_wake = wait if next_wake is None else min(next_wake, wait)
+            for item in deferred:
+                heapq.heappush(self._queue, item)
+
+            if ready is not None:
+                global_bucket, chat_bucket = self._buckets(ready)
+                global_bucket.take(now)
+                if chat_bucket:
+                    chat_bucket.take(now)
+                ready['done'] = True
+                if ready['coalesce_key'] is not None and self._edits.get(ready['coalesce_key']) is ready:
+                    del self._edits[ready['coalesce_key']]
+                name = CLASS_NAMES.get(ready['priority'], "bulk")
+                self.max_queue_delay[name] = max(self.max_queue_delay[name], now - ready['queued_at'])
+                task = asyncio.create_task(self._execute(ready))
+                ready['task'] = task
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+                continue
+
+            if next_wake is None:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), next_wake)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, request: Dict[str, any]):
+        future = request['future']
+        try:
+            result = await request['make_call']()
+        except FloodWaitError as fwe:
+            self._on_flood(request, fwe)
+            if request['priority'] >= PROGRESS or fwe.seconds > self.max_flood_wait:
+                if not future.done():
+                    future.set_exception(fwe)
+                return
+            # Retry after the wait, unless a newer edit of the same message is queued by now
+            newer = self._edits.get(request['coalesce_key']) if request['coalesce_key'] is not None else None
+            if newer is not None:
+                newer['future'].add_done_callback(lambda done: self._chain(done, future))
+                return
+            request['done'] = False
+            request['queued_at'] = time.monotonic()
+            if request['coalesce_key'] is not None:
+                self._edits[request['coalesce_key']] = request
+            self._push(request)
+            return
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        name = CLASS_NAMES.get(request['priority'], "bulk")
+        self.sent[name] += 1
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _chain(source: asyncio.Future, target: asyncio.Future):
+        if target.done():
+            return
+        if source.cancelled():
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+
+    def _on_flood(self, request: Dict[str, any], fwe: FloodWaitError):
+        self.flood_waits += 1
+        self.flood_seconds += fwe.seconds
+        until = time.monotonic() + fwe.seconds
+        # Block the failing class and everything less urgent in that chat; replies keep flowing
+        for priority in range(request['priority'], BULK + 1):
+            key = (request['chat'], priority)
+            self._blocked[key] = max(self._blocked.get(key, 0), until)
+        print(f"[Gateway] [WARNING] FloodWait {fwe.seconds}s on a {CLASS_NAMES.get(request['priority'])} "
+              f"call to {request['chat'][1] if request['chat'] else 'global'}")
+
+    # ━━━ Metrics ━━━
+
+    def stats(self) -> Dict[str, any]:
+        """Queue depth per class, in-flight calls and FloodWait counters, for /status."""
+        now = time.monotonic()
+        depth = {name: 0 for name in CLASS_NAMES.values()}
+        for priority, _, request in self._queue:
+            if not request['done'] and priority == request['priority']:
+                depth[CLASS_NAMES.get(priority, "bulk")] += 1
+        self._blocked = {key: until for key, until in self._blocked.items() if until > now}
+        return {
+            'queued': depth,
+            'in_flight': len(self._in_flight),
+            'sent': dict(self.sent),
+            'coalesced': self.coalesced,
+            'flood_waits': self.flood_waits,
+            'flood_seconds': self.flood_seconds,
+            'blocked_chats': len({chat for chat, _ in self._blocked}),
+            'max_queue_delay': {name: round(delay, 1) for name, delay in self.max_queue_delay.items()},
+        }
+
+
+telegram_gateway = TelegramGateway(
+    global_rate=GATEWAY_GLOBAL_RATE,
+    global_burst=GATEWAY_GLOBAL_BURST,
+    chat_rate=GATEWAY_CHAT_RATE,
+    chat_burst=GATEWAY_CHAT_BURST,
+    max_flood_wait=GATEWAY_MAX_FLOOD_WAIT,
+)
@@ -1,9 +1,28 @@
 import os
+import time
 import asyncio
 from datetime import timedelta
 from typing import List
 import aiofiles
 
+async def wait_until(target_ts: float, max_chunk: float = 30) -> None:
+    """
+    Sleep until a wall-clock time.
+
+    Sleeps on the event loop's monotonic clock in chunks of at most
+    `max_chunk` seconds and re-reads the wall clock after each one, so a
+    suspend or NTP step can't push the wake-up later than one chunk.
+
+    Args:
+        target_ts: Epoch seconds to wake at.
+        max_chunk: Longest single sleep.
+    """
+    while True:
+        remaining = target_ts - time.time()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(remaining, max_chunk))
+
 async def format_bytes(size: int) -> str:
     """
     Convert bytes to a human-readable format (KB, MB, GB, etc.).
@@ -84,52 +103,25 @@ async def get_video_duration(file_path: str) -> float:
 async def split_video(file_path: str, max_size: int = 2 * 1024 * 1024 * 1024) -> List[str]:
     """
     Split a video file into smaller parts if it exceeds the max size.
-    
+
+    Cuts on keyframes in a single pass over the file (see keyframe_index.split_by_size).
+
     Args:
         file_path: Path to the video file.
         max_size: Maximum size for each part in bytes (default: 2GB).
-        
+
     Returns:
         List of paths to the split video parts.
     """
+    from recorders.keyframe_index import ClipError, split_by_size
+
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
-    size = os.path.getsize(file_path)
-    if size <= max_size:
-        return [file_path]
-
-    base_name = os.path.splitext(file_path)[0]
-    parts = []
-
+    base_name, ext = os.path.splitext(file_path)
     try:
-        total_duration = await get_video_duration(file_path)
-        num_parts = (size // max_size) + 1
-        part_duration = total_duration / num_parts
-
-        for i in range(num_parts):
-            start = i * part_duration
-            out_file = f"{base_name}_part{i+1}.mp4"
-            cmd = [
-                "ffmpeg", "-i", file_path, "-ss", str(int(start)), "-t",
-                str(int(part_duration)), "-c", "copy", out_file
-            ]
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            await proc.communicate()
-            if proc.returncode != 0:
-                raise RuntimeError(f"ffmpeg error while splitting part {i+1}")
-            parts.append(out_file)
-
-        return parts
-    except Exception as e:
-        # Clean up any partially created files
-        for part in parts:
-            if os.path.exists(part):
-                os.remove(part)
+        return await split_by_size(file_path, max_size, f"{base_name}_part{{n}}{ext}")
+    except ClipError as e:
         raise RuntimeError(f"Failed to split video: {str(e)}")
 
 async def cleanup_files(file_paths: List[str]) -> None: